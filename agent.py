@@ -4,12 +4,17 @@ Agent do wykonywania zadań AI Devs 3 Reloaded
 Refaktoryzacja zgodna z zaleceniami SonarQube
 """
 import json
+import multiprocessing
 import os
 import platform
 import re
 import subprocess
 import sys
-from typing import Tuple, List, Dict, Optional, Any
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Tuple, List, Dict, Optional, Any
 
 from dotenv import load_dotenv
 from langchain_core.tools import tool
@@ -27,6 +32,7 @@ ERROR_INVALID_SECRET = "Niepoprawny numer sekretu. Wybierz w zakresie 1-9."
 ERROR_TASK_FAILED = "🛑 Zadanie zakończone z błędem."
 ERROR_SECRET_FAILED = "🛑 Sekret zakończony z błędem."
 ERROR_CRITICAL_SYSTEM = "🛑 Krytyczny błąd systemu."
+ERROR_TIMEOUT = "⏱️ Przekroczono limit czasu ({seconds}s)."
 NOT_SET_VALUE = "(niewartość)"
 FLAGS_JSON = "flags.json"
 SECRETS_JSON = "secrets.json"
@@ -59,6 +65,27 @@ class Config:
         "zsh": {"indicator": "zsh", "platform": "unix"},
         "fish": {"indicator": "fish", "platform": "unix"},
     }
+    
+    # Tryb ciepłego startu: moduły importowane raz w procesie fork-servera,
+    # a każde zadanie to tani fork z już zaimportowanymi bibliotekami
+    WARM_START_ENV = "AGENT_WARM_START"
+    WARM_PRELOAD_MODULES = [
+        "dotenv", "requests", "bs4", "numpy",
+        "openai", "anthropic",
+        "langchain_core", "langchain_openai", "langgraph.graph",
+        "torch", "whisper", "sentence_transformers",
+    ]
+    
+    # Tryb wsadowy: run_task 1-24 / run_secret 1,3,5-7
+    BATCH_WORKERS_ENV = "AGENT_BATCH_WORKERS"
+    BATCH_TIMEOUT_ENV = "AGENT_TASK_TIMEOUT"
+    DEFAULT_BATCH_WORKERS = 4
+    DEFAULT_TASK_TIMEOUT = 900
+    # Zadania współdzielące katalog danych lub port webhooka - w paczce idą po kolei
+    BATCH_EXCLUSIVE_GROUPS = [
+        {"8", "10", "20"},  # katalog fabryka/
+        {"18", "23"},       # port 3001 + ngrok
+    ]
 
 
 class ShellDetector:
@@ -117,6 +144,150 @@ class EnvironmentCleaner:
         print()
 
 
+def _warm_worker_init() -> None:
+    """Importuje ciężkie biblioteki w procesie workera (pomija brakujące)"""
+    for module_name in Config.WARM_PRELOAD_MODULES:
+        try:
+            __import__(module_name)
+        except Exception:
+            pass
+
+
+class _PipeLineWriter:
+    """Strumień stdout workera - zbiera całość i odsyła pełne linie na bieżąco"""
+    
+    def __init__(self, conn) -> None:
+        self.conn = conn
+        self.chunks: List[str] = []
+        self.pending = ""
+    
+    def write(self, text: str) -> int:
+        self.chunks.append(text)
+        self.pending += text
+        while "\n" in self.pending:
+            line, self.pending = self.pending.split("\n", 1)
+            self.conn.send(("line", line))
+        return len(text)
+    
+    def flush(self) -> None:
+        pass
+    
+    def getvalue(self) -> str:
+        if self.pending:
+            self.conn.send(("line", self.pending))
+            self.pending = ""
+        return "".join(self.chunks)
+
+
+def _warm_worker_entry(script: str, env: Dict[str, str], conn) -> None:
+    """Uruchamia skrypt jako __main__ w procesie sforkowanym z fork-servera"""
+    import contextlib
+    import io
+    import runpy
+    import traceback
+    
+    os.environ.clear()
+    os.environ.update(env)
+    sys.argv = [script]
+    
+    stdout_buf, stderr_buf = _PipeLineWriter(conn), io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(stdout_buf), contextlib.redirect_stderr(stderr_buf):
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                returncode = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+    
+    conn.send(("done", (returncode, stdout_buf.getvalue(), stderr_buf.getvalue())))
+    conn.close()
+
+
+class WarmWorker:
+    """Uruchamianie zadań w rozgrzanych procesach (fork-server z preloadem)"""
+    
+    _context = None
+    
+    @staticmethod
+    def enabled() -> bool:
+        """Czy tryb ciepłego startu jest włączony"""
+        value = os.getenv(Config.WARM_START_ENV, "").strip().lower()
+        return value in {"1", "true", "yes", "tak"}
+    
+    @classmethod
+    def get_context(cls):
+        """Zwraca kontekst multiprocessing - forkserver z preloadem albo spawn"""
+        if cls._context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                cls._context = multiprocessing.get_context("forkserver")
+                cls._context.set_forkserver_preload(Config.WARM_PRELOAD_MODULES)
+            else:
+                # Windows nie ma fork - zostaje spawn (bez zysku z preloadu)
+                cls._context = multiprocessing.get_context("spawn")
+        return cls._context
+    
+    @classmethod
+    def warm_up(cls) -> None:
+        """Startuje fork-server, żeby importy odbyły się przed pierwszym zadaniem"""
+        ctx = cls.get_context()
+        process = ctx.Process(target=_warm_worker_init)
+        process.start()
+        process.join()
+    
+    @staticmethod
+    def _collect(reader, process, timeout: Optional[float],
+                 on_line: Optional[Callable[[str], None]]) -> Optional[Tuple[int, str, str]]:
+        """Odbiera linie i wynik z workera; None oznacza przekroczenie czasu"""
+        deadline = time.monotonic() + timeout if timeout else None
+        lines: List[str] = []
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and (remaining <= 0 or not reader.poll(remaining)):
+                process.kill()
+                return None
+            try:
+                kind, payload = reader.recv()
+            except EOFError:
+                # Worker padł zanim odesłał wynik (np. segfault w bibliotece natywnej)
+                process.join()
+                return (process.exitcode or 1), "\n".join(lines), "Worker zakończył się bez wyniku."
+            if kind == "done":
+                return payload
+            lines.append(payload)
+            if on_line:
+                on_line(payload)
+    
+    @classmethod
+    def run_script(cls, script: str, env: Dict[str, str], timeout: Optional[float] = None,
+                   on_line: Optional[Callable[[str], None]] = None) -> subprocess.CompletedProcess:
+        """Uruchamia skrypt w rozgrzanym workerze, semantyka jak subprocess.run(check=True)"""
+        ctx = cls.get_context()
+        reader, writer = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_warm_worker_entry, args=(script, env, writer))
+        process.start()
+        writer.close()
+        
+        try:
+            result = cls._collect(reader, process, timeout, on_line)
+        finally:
+            reader.close()
+        process.join()
+        
+        args = [sys.executable, script]
+        if result is None:
+            raise subprocess.TimeoutExpired(args, timeout)
+        returncode, stdout, stderr = result
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, args, output=stdout, stderr=stderr)
+        return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+
 class TaskExecutor:
     """Wykonywanie zadań i sekretów"""
     
@@ -142,8 +313,13 @@ class TaskExecutor:
         return output, False
     
     @staticmethod
-    def run_script(script: str, env: Dict[str, str]) -> subprocess.CompletedProcess:
+    def run_script(script: str, env: Dict[str, str], timeout: Optional[float] = None,
+                   on_line: Optional[Callable[[str], None]] = None) -> subprocess.CompletedProcess:
         """Uruchamia skrypt Python"""
+        if WarmWorker.enabled():
+            return WarmWorker.run_script(script, env, timeout, on_line)
+        if on_line:
+            return TaskExecutor.run_script_streaming(script, env, timeout, on_line)
         return subprocess.run(
             [sys.executable, script],
             env=env,
@@ -151,11 +327,62 @@ class TaskExecutor:
             text=True,
             encoding="utf-8",
             errors="replace",
-            check=True
+            check=True,
+            timeout=timeout
+        )
+    
+    @staticmethod
+    def run_script_streaming(script: str, env: Dict[str, str], timeout: Optional[float],
+                             on_line: Callable[[str], None]) -> subprocess.CompletedProcess:
+        """Uruchamia skrypt Python i przekazuje linie stdout na bieżąco"""
+        args = [sys.executable, script]
+        process = subprocess.Popen(
+            args,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace"
         )
+        
+        stderr_chunks: List[str] = []
+        stderr_thread = threading.Thread(
+            target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True
+        )
+        stderr_thread.start()
+        
+        timed_out = threading.Event()
+        
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            process.kill()
+        
+        timer = threading.Timer(timeout, kill_on_timeout) if timeout else None
+        if timer:
+            timer.start()
+        
+        stdout_lines: List[str] = []
+        try:
+            for line in process.stdout:
+                stdout_lines.append(line)
+                on_line(line.rstrip("\n"))
+            process.wait()
+            stderr_thread.join()
+        finally:
+            if timer:
+                timer.cancel()
+        
+        stdout, stderr = "".join(stdout_lines), "".join(stderr_chunks)
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(args, timeout, output=stdout, stderr=stderr)
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, args, output=stdout, stderr=stderr)
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
     
     @classmethod
-    def execute(cls, script_name: str) -> Tuple[Any, bool, bool]:
+    def execute(cls, script_name: str, timeout: Optional[float] = None,
+                on_line: Optional[Callable[[str], None]] = None) -> Tuple[Any, bool, bool]:
         """Wykonuje skrypt i zwraca (output, flag_found, error)"""
         if not os.path.exists(script_name):
             return (f"Plik {script_name} nie istnieje.", False, False)
@@ -163,7 +390,7 @@ class TaskExecutor:
         env = cls.prepare_env()
         
         try:
-            result = cls.run_script(script_name, env)
+            result = cls.run_script(script_name, env, timeout, on_line)
             output_full = result.stdout.rstrip() or "(Brak wyjścia)"
             output, flag_found = cls.extract_flags(output_full)
             return (output, flag_found, False)
@@ -172,23 +399,53 @@ class TaskExecutor:
             out_text = (e.stdout or "").rstrip()
             err_text = (e.stderr or "").rstrip()
             return ((out_text, err_text), False, True)
+        
+        except subprocess.TimeoutExpired as e:
+            out_text = _as_text(e.stdout).rstrip()
+            err_text = _as_text(e.stderr).rstrip()
+            timeout_msg = ERROR_TIMEOUT.format(seconds=timeout)
+            return ((out_text, f"{err_text}\n{timeout_msg}".strip()), False, True)
+
+
+def _as_text(data: Optional[str | bytes]) -> str:
+    """Zamienia wyjście procesu (str/bytes/None) na tekst"""
+    if data is None:
+        return ""
+    if isinstance(data, bytes):
+        return data.decode("utf-8", errors="replace")
+    return data
 
 
 class Logger:
     """Logowanie wyników do JSON"""
     
+    _lock = threading.Lock()
+    
     @staticmethod
     def append_to_json(entry: Dict[str, Any], log_file: str = FLAGS_JSON) -> None:
-        """Dodaje wpis do pliku JSON"""
-        data = Logger.load_existing_data(log_file)
-        
-        if Logger.is_duplicate(entry, data):
-            return
-        
-        data.append(entry)
-        
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        """Dodaje wpis do pliku JSON (bezpieczne dla wielu wątków, zapis atomowy)"""
+        with Logger._lock:
+            data = Logger.load_existing_data(log_file)
+            
+            if Logger.is_duplicate(entry, data):
+                return
+            
+            data.append(entry)
+            Logger.write_atomic(data, log_file)
+    
+    @staticmethod
+    def write_atomic(data: List[Dict[str, Any]], log_file: str) -> None:
+        """Zapisuje do pliku tymczasowego i podmienia go - przerwany zapis nie psuje JSON"""
+        directory = os.path.dirname(os.path.abspath(log_file))
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, log_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
     
     @staticmethod
     def load_existing_data(log_file: str) -> List[Dict[str, Any]]:
@@ -218,6 +475,150 @@ class Logger:
         return False
 
 
+class BatchRunner:
+    """Równoległe uruchamianie wielu zadań/sekretów w ograniczonej puli procesów"""
+    
+    TASK_TYPES = {
+        "zadanie": {"prefix": "zad", "log_file": FLAGS_JSON, "completed": completed_tasks},
+        "sekret": {"prefix": "sec", "log_file": SECRETS_JSON, "completed": completed_secrets},
+    }
+    
+    _print_lock = threading.Lock()
+    
+    @staticmethod
+    def _env_number(name: str, default: int) -> int:
+        """Czyta dodatnią liczbę całkowitą ze zmiennej środowiskowej"""
+        try:
+            value = int(os.getenv(name, "") or default)
+        except ValueError:
+            return default
+        return value if value > 0 else default
+    
+    @staticmethod
+    def build_jobs(task_type: str, keys: List[str]) -> List[List[str]]:
+        """Grupuje klucze w łańcuchy - zadania z jednej grupy wyłącznej idą po kolei"""
+        if task_type != "zadanie":
+            return [[key] for key in keys]
+        
+        jobs: List[List[str]] = []
+        grouped: Dict[int, List[str]] = {}
+        for key in keys:
+            group_index = next(
+                (i for i, group in enumerate(Config.BATCH_EXCLUSIVE_GROUPS) if key in group), None
+            )
+            if group_index is None:
+                jobs.append([key])
+            elif group_index in grouped:
+                grouped[group_index].append(key)
+            else:
+                grouped[group_index] = [key]
+                jobs.append(grouped[group_index])
+        return jobs
+    
+    @classmethod
+    def _print(cls, message: str) -> None:
+        with cls._print_lock:
+            print(message, flush=True)
+    
+    @classmethod
+    def _run_one(cls, task_type: str, key: str, timeout: float) -> str:
+        """Uruchamia pojedynczy skrypt ze strumieniowaniem stdout z prefiksem"""
+        script = f"{cls.TASK_TYPES[task_type]['prefix']}{key}.py"
+        tag = script[:-3]
+        cls._print(f"▶️  [{tag}] start")
+        output, flag_found, error = TaskExecutor.execute(
+            script, timeout=timeout, on_line=lambda line: cls._print(f"[{tag}] {line}")
+        )
+        return cls.record_result(task_type, key, output, flag_found, error)
+    
+    @classmethod
+    def _run_chain(cls, task_type: str, chain: List[str], timeout: float) -> Dict[str, str]:
+        return {key: cls._run_one(task_type, key, timeout) for key in chain}
+    
+    @classmethod
+    def record_result(cls, task_type: str, key: str, output: Any, flag_found: bool, error: bool) -> str:
+        """Zapisuje wynik jednego skryptu (z wątku puli) i zwraca status do podsumowania"""
+        settings = cls.TASK_TYPES[task_type]
+        tag = f"{settings['prefix']}{key}"
+        
+        if error:
+            stdout_text, stderr_text = output if isinstance(output, tuple) else ("", str(output))
+            Logger.append_to_json({
+                task_type: key,
+                "flagi": [],
+                "debug_output": f"STDOUT:\n{stdout_text}\nSTDERR:\n{stderr_text}"
+            }, settings["log_file"])
+            last_error_line = stderr_text.strip().splitlines()[-1] if stderr_text.strip() else ""
+            cls._print(f"🛑 [{tag}] błąd: {last_error_line}")
+            return "🛑 błąd"
+        
+        if flag_found:
+            flags_list = output if isinstance(output, list) else [str(output)]
+            settings["completed"].add(key)
+            Logger.append_to_json({task_type: key, "flagi": flags_list}, settings["log_file"])
+            cls._print(f"[{tag}] {format_flag_message(output)}")
+            return f"🏁 {', '.join(flags_list)}"
+        
+        return "⚪ brak flagi"
+    
+    @classmethod
+    def run(cls, task_type: str, keys: List[str]) -> Dict[str, str]:
+        """Uruchamia paczkę i zwraca {klucz: status}"""
+        workers = cls._env_number(Config.BATCH_WORKERS_ENV, Config.DEFAULT_BATCH_WORKERS)
+        timeout = cls._env_number(Config.BATCH_TIMEOUT_ENV, Config.DEFAULT_TASK_TIMEOUT)
+        jobs = cls.build_jobs(task_type, keys)
+        
+        label = "zadań" if task_type == "zadanie" else "sekretów"
+        cls._print(f"🚀 Paczka {len(keys)} {label}: {', '.join(keys)} "
+                   f"(równolegle: {workers}, limit: {timeout}s)")
+        
+        started = time.monotonic()
+        statuses: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(cls._run_chain, task_type, chain, timeout) for chain in jobs]
+            for future in as_completed(futures):
+                statuses.update(future.result())
+        
+        cls._print(f"📋 Podsumowanie ({time.monotonic() - started:.1f}s):")
+        for key in keys:
+            cls._print(f"   {cls.TASK_TYPES[task_type]['prefix']}{key}: {statuses.get(key, '?')}")
+        return statuses
+
+
+def parse_batch_argument(arg: str, valid: set) -> Optional[List[str]]:
+    """
+    Parsuje listę/zakres numerów: "1-24", "1,3,5-7", "2 4 6", "all".
+    Zwraca posortowaną listę kluczy albo None, gdy cokolwiek jest niepoprawne.
+    """
+    arg = arg.strip().lower()
+    if arg in {"all", "wszystkie"}:
+        return sorted(valid, key=int)
+    
+    keys = set()
+    for part in re.split(r"[,\s]+", arg):
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)-(\d+)", part)
+        if match:
+            low, high = int(match.group(1)), int(match.group(2))
+            if low > high:
+                return None
+            keys.update(str(i) for i in range(low, high + 1))
+        elif part.isdigit():
+            keys.add(str(int(part)))
+        else:
+            return None
+    
+    if not keys or not keys <= valid:
+        return None
+    return sorted(keys, key=int)
+
+
+def is_batch_argument(arg: str) -> bool:
+    """Czy argument opisuje więcej niż jeden skrypt"""
+    return bool(re.search(r"[-,\s]", arg.strip())) or arg.strip().lower() in {"all", "wszystkie"}
+
+
 class LLMFactory:
     """Fabryka do tworzenia klientów LLM"""
     
@@ -584,6 +985,7 @@ def process_command(cmd: str) -> bool:
         return handle_read_env_command(cmd)
     
     print("Nieznana komenda. Użyj: run_task N (1-24), run_secret N (1-9), read_env VAR, lub exit.")
+    print("Paczki: run_task 1-24 | run_task 1,3,5-7 | run_secret all")
     return True
 
 
@@ -597,6 +999,14 @@ def handle_run_task_command(cmd: str) -> bool:
     
     task_arg = extract_argument(parts[1])
     
+    if is_batch_argument(task_arg):
+        keys = parse_batch_argument(task_arg, VALID_TASKS)
+        if keys is None:
+            print(ERROR_INVALID_TASK)
+            return True
+        BatchRunner.run("zadanie", keys)
+        return True
+    
     if task_arg not in VALID_TASKS:
         print(ERROR_INVALID_TASK)
         return True  # Kontynuuj mimo nieprawidłowego numeru zadania
@@ -635,6 +1045,14 @@ def handle_run_secret_command(cmd: str) -> bool:
     
     secret_arg = extract_argument(parts[1])
     
+    if is_batch_argument(secret_arg):
+        keys = parse_batch_argument(secret_arg, VALID_SECRETS)
+        if keys is None:
+            print(ERROR_INVALID_SECRET)
+            return True
+        BatchRunner.run("sekret", keys)
+        return True
+    
     if secret_arg not in VALID_SECRETS:
         print(ERROR_INVALID_SECRET)
         return True  # Kontynuuj mimo nieprawidłowego numeru sekretu
@@ -730,6 +1148,11 @@ def main():
     os.environ["MODEL_NAME"] = model_name
     os.environ["LLM_ENGINE"] = engine
     
+    # Rozgrzanie fork-servera przed pierwszym zadaniem
+    if WarmWorker.enabled():
+        print("🔥 Tryb ciepłego startu - ładuję biblioteki do fork-servera…")
+        WarmWorker.warm_up()
+    
     # Inicjalizacja LLM
     try:
         llm = LLMFactory.create(engine, model_name)
@@ -755,6 +1178,7 @@ def main():
     builder.compile()
     
     print("🤖 Agent uruchomiony. Komendy: run_task N (1-24) | run_secret N (1-9) | read_env VAR | exit")
+    print("📦 Paczki równolegle: run_task 1-24 | run_task 1,3,5-7 | run_secret all")
     print("=" * 60)
     
     # Główna pętla
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Wspólny cache artefaktów (archiwa fabryki, dane laboratoryjne...) dla zadań zadN.py
+
+• Jedna lokalna kopia archiwum na URL - zadania nie pobierają fabryka.zip osobno
+• Warunkowe GET (If-None-Match / If-Modified-Since) - niezmienione archiwum to 304 bez treści
+• Wznawianie przerwanych pobrań (Range + If-Range) z pliku .part
+• Manifest z SHA-256 archiwum i listą rozpakowanych plików (w ARTIFACT_CACHE_DIR,
+  nie w katalogu docelowym) - rozpakowanie jest pomijane, gdy pliki docelowe
+  już odpowiadają archiwum
+• Selektywne rozpakowanie: tylko wybrane pliki (nazwy, wzorce glob albo funkcja)
+
+Sterowanie przez .env:
+    ARTIFACT_CACHE_DIR=.cache/artifacts
+"""
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import os
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows - bez blokady międzyprocesowej
+    fcntl = None
+
+DEFAULT_CACHE_DIR = ".cache/artifacts"
+CHUNK_SIZE = 1024 * 1024
+REQUEST_TIMEOUT = 60
+MANIFEST_NAME = "extract_manifest.json"
+
+MemberFilter = Union[None, Iterable[str], Callable[[str], bool]]
+
+_session = requests.Session()
+
+
+def cache_dir() -> Path:
+    path = Path(os.getenv("ARTIFACT_CACHE_DIR", DEFAULT_CACHE_DIR))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def artifact_path(url: str) -> Path:
+    """Lokalna ścieżka artefaktu: skrót URL + oryginalna nazwa pliku"""
+    name = Path(url.split("?", 1)[0]).name or "artifact"
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    return cache_dir() / f"{digest}-{name}"
+
+
+def file_sha256(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _read_json(path: Path) -> Dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _write_json(path: Path, data: Dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Blokada międzyprocesowa - równoległe zadania agenta nie pobierają tego samego pliku naraz"""
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _validators(meta: Dict) -> Dict[str, str]:
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def _resume_headers(part: Path, meta: Dict) -> Dict[str, str]:
+    if not part.exists() or not part.stat().st_size:
+        return {}
+    validator = meta.get("etag") or meta.get("last_modified")
+    if not validator:
+        return {}
+    return {"Range": f"bytes={part.stat().st_size}-", "If-Range": validator}
+
+
+def fetch(url: str, revalidate: bool = True) -> Path:
+    """
+    Zwraca lokalną kopię artefaktu spod URL.
+    revalidate=False: istniejąca kopia używana bez pytania serwera.
+    Gdy serwer jest niedostępny, a kopia istnieje - używana jest kopia.
+    """
+    path = artifact_path(url)
+    with _file_lock(path):
+        fetched = _fetch_locked(url, path, revalidate)
+        if fetched is None:
+            # Serwer odrzucił zakres (416) - .part usunięty, drugie podejście od zera
+            fetched = _fetch_locked(url, path, revalidate)
+    if fetched is None:
+        raise RuntimeError(f"Nie udało się pobrać {url}")
+    return fetched
+
+
+def _fetch_locked(url: str, path: Path, revalidate: bool) -> Optional[Path]:
+    meta_path = path.with_name(path.name + ".meta.json")
+    part = path.with_name(path.name + ".part")
+
+    meta = _read_json(meta_path)
+    complete = path.exists() and meta.get("complete")
+    if complete and not revalidate:
+        return path
+
+    headers = _validators(meta) if complete else _resume_headers(part, meta)
+    try:
+        response = _session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        if complete:
+            print(f"⚠️  Serwer niedostępny ({e}) - używam kopii {path.name}")
+            return path
+        raise
+
+    with response:
+        if response.status_code == 416:
+            # .part jest już pełny albo nieaktualny - pobieramy od nowa
+            part.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            return None
+        if complete and response.status_code == 304:
+            print(f"♻️  Artefakt aktualny (304): {path.name}")
+            return path
+        response.raise_for_status()
+
+        resumed = response.status_code == 206
+        if resumed:
+            print(f"⏯️  Wznawiam pobieranie od {part.stat().st_size} B: {url}")
+        else:
+            print(f"📥 Pobieranie {url}...")
+
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "complete": False,
+        }
+        _write_json(meta_path, meta)
+
+        with open(part, "ab" if resumed else "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+
+    os.replace(part, path)
+    meta.update(complete=True, size=path.stat().st_size, sha256=file_sha256(path))
+    _write_json(meta_path, meta)
+    print(f"✅ Zapisano artefakt {path.name} ({meta['size']} B)")
+    return path
+
+
+def _member_selector(members: MemberFilter) -> Callable[[str], bool]:
+    if members is None:
+        return lambda name: True
+    if callable(members):
+        return members
+    patterns = list(members)
+    return lambda name: any(
+        fnmatch.fnmatch(name, p) or fnmatch.fnmatch(Path(name).name, p) for p in patterns
+    )
+
+
+def _already_extracted(dest: Path, entry: Dict, archive_hash: str) -> bool:
+    if entry.get("sha256") != archive_hash:
+        return False
+    return all(
+        (dest / name).exists() and (dest / name).stat().st_size == size
+        for name, size in entry.get("members", {}).items()
+    )
+
+
+def extract(
+    archive: Path,
+    dest: Path,
+    members: MemberFilter = None,
+    pwd: Optional[str] = None,
+) -> List[Path]:
+    """
+    Rozpakowuje wybrane pliki archiwum ZIP do dest.
+    Manifest w ARTIFACT_CACHE_DIR zapamiętuje (dla pary archiwum + dest) SHA-256 archiwum
+    i rozmiary plików - jeśli się zgadzają, rozpakowanie jest pomijane. Katalog docelowy
+    zawiera wyłącznie pliki z archiwum.
+    """
+    dest.mkdir(parents=True, exist_ok=True)
+    manifest_path = cache_dir() / MANIFEST_NAME
+    entry_key = f"{archive.resolve()} -> {dest.resolve()}"
+    archive_hash = file_sha256(archive)
+    selector = _member_selector(members)
+
+    with zipfile.ZipFile(archive, "r") as zf:
+        infos = [i for i in zf.infolist() if not i.is_dir() and selector(i.filename)]
+        entry = _read_json(manifest_path).get(entry_key, {})
+        wanted = {i.filename: i.file_size for i in infos}
+        if wanted.items() <= entry.get("members", {}).items() and _already_extracted(dest, entry, archive_hash):
+            print(f"♻️  Pliki z {archive.name} już rozpakowane w {dest}")
+            return [dest / name for name in wanted]
+
+        print(f"📦 Rozpakowywanie {len(infos)} plików z {archive.name} do {dest}...")
+        for info in infos:
+            zf.extract(info, dest, pwd=pwd.encode() if pwd else None)
+
+    # Manifest współdzielony przez zadania - odczyt i zapis pod blokadą
+    with _file_lock(manifest_path):
+        manifest = _read_json(manifest_path)
+        entry = manifest.get(entry_key, {})
+        known = entry.get("members", {}) if entry.get("sha256") == archive_hash else {}
+        manifest[entry_key] = {"sha256": archive_hash, "members": {**known, **wanted}}
+        _write_json(manifest_path, manifest)
+    return [dest / name for name in wanted]
+
+
+def fetch_and_extract(
+    url: str,
+    dest: Path,
+    members: MemberFilter = None,
+    pwd: Optional[str] = None,
+) -> List[Path]:
+    """Pobiera (lub rewaliduje) archiwum we wspólnym cache i rozpakowuje wybrane pliki"""
+    return extract(fetch(url), dest, members=members, pwd=pwd)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Trwały cache odpowiedzi LLM (SQLite) dla zadań zadN.py
+
+Klucz to SHA-256 z (silnik, model, wiadomości, temperatura, parametry),
+więc identyczny prompt przy kolejnym uruchomieniu nie idzie do API.
+Wpisy wygasają po TTL, a po przekroczeniu limitu liczby wpisów / rozmiaru
+usuwane są najdawniej używane (LRU). Plik działa w trybie WAL, więc wiele
+zadań uruchomionych równolegle przez agent.py może dzielić jeden cache.
+
+Sterowanie przez .env:
+    LLM_CACHE=true               - włącza cache w llm_gateway.complete()
+    LLM_CACHE_PATH=.cache/llm_cache.sqlite3
+    LLM_CACHE_TTL=604800         - sekundy, 0 = bez wygasania
+    LLM_CACHE_MAX_ENTRIES=10000
+    LLM_CACHE_MAX_MB=200
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_PATH = ".cache/llm_cache.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_MB = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in {"1", "true", "yes", "tak"}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def enabled() -> bool:
+    """Czy cache ma być używany automatycznie przez llm_gateway"""
+    return _env_flag("LLM_CACHE")
+
+
+def make_key(*parts: Any) -> str:
+    """Klucz treściowy: SHA-256 z kanonicznego JSON-a części klucza"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Cache klucz → tekst w SQLite z TTL i eviction LRU"""
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_PATH,
+        ttl_seconds: int = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and created_at + self.ttl_seconds < now
+
+    def get(self, key: str) -> Optional[str]:
+        """Zwraca zapisaną wartość albo None (brak lub wygasła)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                self._bump("misses")
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self._bump("hits")
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """Zapisuje wartość i w razie potrzeby usuwa najdawniej używane wpisy"""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """Zwraca wartość z cache albo wylicza ją, zapisuje i zwraca"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def _bump(self, name: str) -> None:
+        self._conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def _evict(self) -> None:
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Usuwamy od najdawniej używanych aż zmieścimy się w obu limitach
+        to_delete = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+
+    def stats(self) -> Dict[str, int]:
+        """Statystyki: trafienia/chybienia w tym procesie i łącznie, liczba i rozmiar wpisów"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            persisted = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": persisted.get("hits", 0),
+            "total_misses": persisted.get("misses", 0),
+            "entries": count,
+            "bytes": total,
+        }
+
+    def clear(self) -> None:
+        """Usuwa wszystkie wpisy i statystyki"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM stats")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[LLMCache] = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """Wspólna instancja cache dla procesu (konfiguracja z .env)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_PATH),
+                ttl_seconds=_env_int("LLM_CACHE_TTL", DEFAULT_TTL),
+                max_entries=_env_int("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+                max_bytes=_env_int("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024,
+            )
+        return _default_cache
+
+
+@atexit.register
+def _report_stats() -> None:
+    if _default_cache is None:
+        return
+    stats = _default_cache.stats()
+    if stats["hits"] or stats["misses"]:
+        print(
+            f"📦 LLM cache: {stats['hits']} trafień / {stats['misses']} chybień "
+            f"({stats['entries']} wpisów, {stats['bytes'] / 1024:.0f} KB)",
+            file=sys.stderr,
+        )
+    _default_cache.close()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Wspólna bramka LLM dla zadań zadN.py
+Multi-engine: openai, lmstudio, anything, gemini, claude
+
+Jeden klient na silnik na proces: klienci OpenAI/Anthropic dostają wspólny
+httpx.Client z pulą połączeń keep-alive (HTTP/2, jeśli zainstalowano h2),
+więc kolejne wywołania nie płacą za nowe połączenie TCP/TLS.
+Udostępnia synchroniczne complete() i asynchroniczne acomplete().
+Klienci asynchroniczni żyją tyle co pętla zdarzeń: aclose() zamyka klientów
+bieżącej pętli, run() uruchamia korutynę i zamyka ich na końcu.
+Ustawienia puli (LLM_HTTP_TIMEOUT, LLM_POOL_*) czytane są przy tworzeniu
+klienta, więc działa też .env wczytany po imporcie modułu.
+Przy LLM_CACHE=true odpowiedzi trafiają do trwałego cache (llm_cache.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import os
+import sys
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar, Union
+
+import llm_cache
+
+SUPPORTED_ENGINES = {"openai", "lmstudio", "anything", "gemini", "claude"}
+OPENAI_COMPATIBLE_ENGINES = {"openai", "lmstudio", "anything"}
+
+DEFAULT_LOCAL_URL = "http://localhost:1234/v1"
+DEFAULT_LOCAL_KEY = "local"
+DEFAULT_MAX_TOKENS = 1000
+DEFAULT_TIMEOUT = 120.0
+
+# Pula połączeń - zadania wołają LLM najwyżej kilkanaście razy równolegle
+# (LLM_POOL_MAX_CONNECTIONS / LLM_POOL_MAX_KEEPALIVE w .env)
+DEFAULT_POOL_MAX_CONNECTIONS = 20
+DEFAULT_POOL_MAX_KEEPALIVE = 10
+POOL_KEEPALIVE_EXPIRY = 60.0
+
+ERROR_ANTHROPIC_MISSING = "❌ Musisz zainstalować anthropic: pip install anthropic"
+
+# Parametry transportowe - nie wpływają na treść odpowiedzi, więc nie są częścią klucza
+CACHE_IGNORED_PARAMS = {"timeout", "extra_headers"}
+
+Messages = Union[str, List[Dict[str, Any]]]
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_sync_clients: Dict[str, Any] = {}
+_http_clients: List[Any] = []
+# Pętla -> (klienci SDK po silniku, ich pule httpx); wpis znika razem z pętlą
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[Dict[str, Any], List[Any]]]" = (
+    weakref.WeakKeyDictionary()
+)
+_gemini_models: Dict[str, Any] = {}
+_gemini_configured = False
+
+
+# ── Konfiguracja silników ────────────────────────────────────────────────────
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """Zwraca silnik: argument > LLM_ENGINE > openai"""
+    value = (engine or os.getenv("LLM_ENGINE") or "openai").lower()
+    if value not in SUPPORTED_ENGINES:
+        raise ValueError(f"Nieobsługiwany silnik: {value}")
+    return value
+
+
+def endpoint_for(engine: str) -> Tuple[Optional[str], Optional[str]]:
+    """Zwraca (base_url, api_key) dla silników zgodnych z API OpenAI"""
+    if engine == "lmstudio":
+        return (
+            os.getenv("LMSTUDIO_API_URL", DEFAULT_LOCAL_URL),
+            os.getenv("LMSTUDIO_API_KEY", DEFAULT_LOCAL_KEY),
+        )
+    if engine == "anything":
+        return (
+            os.getenv("ANYTHING_API_URL", DEFAULT_LOCAL_URL),
+            os.getenv("ANYTHING_API_KEY", DEFAULT_LOCAL_KEY),
+        )
+    return os.getenv("OPENAI_API_URL") or None, os.getenv("OPENAI_API_KEY")
+
+
+def _claude_api_key() -> Optional[str]:
+    return os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
+
+
+# ── Pula połączeń HTTP ───────────────────────────────────────────────────────
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _http_timeout() -> float:
+    return float(os.getenv("LLM_HTTP_TIMEOUT", DEFAULT_TIMEOUT))
+
+
+def _pool_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", DEFAULT_POOL_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", DEFAULT_POOL_MAX_KEEPALIVE)),
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _new_http_client():
+    import httpx
+
+    client = httpx.Client(
+        http2=_http2_available(), limits=_pool_limits(), timeout=_http_timeout()
+    )
+    _http_clients.append(client)
+    return client
+
+
+def _new_async_http_client(http_clients: List[Any]):
+    import httpx
+
+    client = httpx.AsyncClient(
+        http2=_http2_available(), limits=_pool_limits(), timeout=_http_timeout()
+    )
+    http_clients.append(client)
+    return client
+
+
+# ── Klienci (jeden na silnik na proces) ──────────────────────────────────────
+def get_openai_client(engine: str = "openai"):
+    """Synchroniczny klient OpenAI (także LM Studio / Anything) ze wspólną pulą"""
+    with _lock:
+        if engine not in _sync_clients:
+            from openai import OpenAI
+
+            base_url, api_key = endpoint_for(engine)
+            _sync_clients[engine] = OpenAI(
+                api_key=api_key, base_url=base_url, http_client=_new_http_client()
+            )
+        return _sync_clients[engine]
+
+
+def get_anthropic_client():
+    """Synchroniczny klient Anthropic ze wspólną pulą"""
+    with _lock:
+        if "claude" not in _sync_clients:
+            try:
+                from anthropic import Anthropic
+            except ImportError:
+                print(ERROR_ANTHROPIC_MISSING, file=sys.stderr)
+                sys.exit(1)
+
+            _sync_clients["claude"] = Anthropic(
+                api_key=_claude_api_key(), http_client=_new_http_client()
+            )
+        return _sync_clients["claude"]
+
+
+def get_gemini_model(model_name: str):
+    """Model Gemini - genai.configure() raz na proces, model cache'owany po nazwie"""
+    global _gemini_configured
+    import google.generativeai as genai
+
+    with _lock:
+        if not _gemini_configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _gemini_configured = True
+        if model_name not in _gemini_models:
+            _gemini_models[model_name] = genai.GenerativeModel(model_name)
+        return _gemini_models[model_name]
+
+
+def _loop_clients() -> Tuple[Dict[str, Any], List[Any]]:
+    # httpx.AsyncClient jest związany z pętlą zdarzeń - osobni klienci na pętlę
+    return _async_clients.setdefault(asyncio.get_running_loop(), ({}, []))
+
+
+def get_async_openai_client(engine: str = "openai"):
+    """Asynchroniczny klient OpenAI (także LM Studio / Anything) dla bieżącej pętli"""
+    with _lock:
+        clients, http_clients = _loop_clients()
+        if engine not in clients:
+            from openai import AsyncOpenAI
+
+            base_url, api_key = endpoint_for(engine)
+            clients[engine] = AsyncOpenAI(
+                api_key=api_key, base_url=base_url,
+                http_client=_new_async_http_client(http_clients),
+            )
+        return clients[engine]
+
+
+def get_async_anthropic_client():
+    """Asynchroniczny klient Anthropic dla bieżącej pętli"""
+    with _lock:
+        clients, http_clients = _loop_clients()
+        if "claude" not in clients:
+            try:
+                from anthropic import AsyncAnthropic
+            except ImportError:
+                print(ERROR_ANTHROPIC_MISSING, file=sys.stderr)
+                sys.exit(1)
+
+            clients["claude"] = AsyncAnthropic(
+                api_key=_claude_api_key(), http_client=_new_async_http_client(http_clients)
+            )
+        return clients["claude"]
+
+
+# ── Normalizacja wiadomości ──────────────────────────────────────────────────
+def _to_messages(prompt: Messages, system: Optional[str]) -> List[Dict[str, Any]]:
+    messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else list(prompt)
+    if system:
+        messages = [{"role": "system", "content": system}] + messages
+    return messages
+
+
+def _split_system(messages: List[Dict[str, Any]]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """Claude przyjmuje prompt systemowy osobno, nie jako wiadomość"""
+    system_parts = [m["content"] for m in messages if m.get("role") == "system"]
+    rest = [m for m in messages if m.get("role") != "system"]
+    return ("\n\n".join(system_parts) or None), rest
+
+
+def _gemini_parts(messages: List[Dict[str, Any]]) -> List[Any]:
+    return [m["content"] for m in messages]
+
+
+def _openai_kwargs(model: str, messages: List[Dict[str, Any]], temperature: float,
+                   max_tokens: Optional[int], extra: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"model": model, "messages": messages, "temperature": temperature}
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    kwargs.update(extra)
+    return kwargs
+
+
+def _claude_kwargs(model: str, messages: List[Dict[str, Any]], temperature: float,
+                   max_tokens: Optional[int], extra: Dict[str, Any]) -> Dict[str, Any]:
+    system_text, rest = _split_system(messages)
+    kwargs: Dict[str, Any] = {
+        "model": model,
+        "messages": rest,
+        "temperature": temperature,
+        "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
+    }
+    if system_text:
+        kwargs["system"] = system_text
+    kwargs.update(extra)
+    return kwargs
+
+
+def _gemini_config(temperature: float, max_tokens: Optional[int]) -> Dict[str, Any]:
+    return {"temperature": temperature, "max_output_tokens": max_tokens or DEFAULT_MAX_TOKENS}
+
+
+# ── Cache odpowiedzi ─────────────────────────────────────────────────────────
+def _cache_key(engine: str, model: str, messages: List[Dict[str, Any]], temperature: float,
+               max_tokens: Optional[int], extra: Dict[str, Any],
+               use_cache: Optional[bool]) -> Optional[str]:
+    if not (llm_cache.enabled() if use_cache is None else use_cache):
+        return None
+    params = {k: v for k, v in extra.items() if k not in CACHE_IGNORED_PARAMS}
+    return llm_cache.make_key(engine, model, messages, temperature, max_tokens, params)
+
+
+# ── API publiczne ────────────────────────────────────────────────────────────
+def complete(
+    prompt: Messages,
+    model: str,
+    engine: Optional[str] = None,
+    temperature: float = 0,
+    max_tokens: Optional[int] = None,
+    system: Optional[str] = None,
+    use_cache: Optional[bool] = None,
+    **extra: Any,
+) -> str:
+    """
+    Wysyła prompt (tekst albo lista wiadomości) do wybranego silnika i zwraca tekst odpowiedzi.
+    max_tokens=None: bez limitu dla API OpenAI, DEFAULT_MAX_TOKENS dla Claude/Gemini.
+    use_cache=None: według LLM_CACHE z .env; True/False wymusza użycie cache lub jego pominięcie.
+    extra trafia bez zmian do API (np. stop, timeout).
+    """
+    engine = resolve_engine(engine)
+    messages = _to_messages(prompt, system)
+    key = _cache_key(engine, model, messages, temperature, max_tokens, extra, use_cache)
+    if key:
+        cached = llm_cache.get_cache().get(key)
+        if cached is not None:
+            return cached
+
+    if engine in OPENAI_COMPATIBLE_ENGINES:
+        resp = get_openai_client(engine).chat.completions.create(
+            **_openai_kwargs(model, messages, temperature, max_tokens, extra)
+        )
+        result = (resp.choices[0].message.content or "").strip()
+    elif engine == "claude":
+        resp = get_anthropic_client().messages.create(
+            **_claude_kwargs(model, messages, temperature, max_tokens, extra)
+        )
+        result = resp.content[0].text.strip()
+    else:
+        response = get_gemini_model(model).generate_content(
+            _gemini_parts(messages), generation_config=_gemini_config(temperature, max_tokens)
+        )
+        result = response.text.strip()
+
+    if key:
+        llm_cache.get_cache().set(key, result)
+    return result
+
+
+async def acomplete(
+    prompt: Messages,
+    model: str,
+    engine: Optional[str] = None,
+    temperature: float = 0,
+    max_tokens: Optional[int] = None,
+    system: Optional[str] = None,
+    use_cache: Optional[bool] = None,
+    **extra: Any,
+) -> str:
+    """Asynchroniczny odpowiednik complete() - nie blokuje pętli zdarzeń"""
+    engine = resolve_engine(engine)
+    messages = _to_messages(prompt, system)
+    key = _cache_key(engine, model, messages, temperature, max_tokens, extra, use_cache)
+    if key:
+        cached = llm_cache.get_cache().get(key)
+        if cached is not None:
+            return cached
+
+    if engine in OPENAI_COMPATIBLE_ENGINES:
+        resp = await get_async_openai_client(engine).chat.completions.create(
+            **_openai_kwargs(model, messages, temperature, max_tokens, extra)
+        )
+        result = (resp.choices[0].message.content or "").strip()
+    elif engine == "claude":
+        resp = await get_async_anthropic_client().messages.create(
+            **_claude_kwargs(model, messages, temperature, max_tokens, extra)
+        )
+        result = resp.content[0].text.strip()
+    else:
+        response = await get_gemini_model(model).generate_content_async(
+            _gemini_parts(messages), generation_config=_gemini_config(temperature, max_tokens)
+        )
+        result = response.text.strip()
+
+    if key:
+        llm_cache.get_cache().set(key, result)
+    return result
+
+
+async def aclose() -> None:
+    """Zamyka asynchroniczne pule połączeń bieżącej pętli (przed jej zamknięciem)"""
+    with _lock:
+        _, http_clients = _async_clients.pop(asyncio.get_running_loop(), ({}, []))
+    for client in http_clients:
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+
+def run(main: Awaitable[T]) -> T:
+    """asyncio.run(), które na końcu zamyka asynchronicznych klientów LLM tej pętli"""
+
+    async def _run() -> T:
+        try:
+            return await main
+        finally:
+            await aclose()
+
+    return asyncio.run(_run())
+
+
+@atexit.register
+def close() -> None:
+    """Zamyka synchroniczne pule połączeń (wywoływane automatycznie przy wyjściu)"""
+    with _lock:
+        for client in _http_clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+        _http_clients.clear()
+        _sync_clients.clear()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Lekka ekstrakcja tekstu z PDF, obrazów (OCR) i nagrań (Whisper) w puli procesów
+
+Moduł nie importuje nic ciężkiego (torch, sentence_transformers, chromadb,
+langgraph), więc procesy robocze startują szybko i nie powielają pamięci
+skryptu głównego. Procesy robocze nie importują też ponownie skryptu
+__main__ (forkserver/spawn robią to domyślnie) - startują wyłącznie
+z tego modułu.
+
+Do puli trafiają tylko zadania, na których zrównoleglenie się opłaca:
+PDF i obrazy po jednym pliku, nagrania jako jedna partia
+(whisper_service.transcribe_many - jeden model na proces).
+Teksty i JSON dekoduje wywołujący, bez puli.
+
+Sterowanie przez .env:
+    EXTRACT_WORKERS=4
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Iterator, List, Tuple
+
+import fitz  # PyMuPDF
+
+import whisper_service
+
+try:
+    import pytesseract
+    from PIL import Image
+
+    HAS_OCR = True
+except ImportError:
+    HAS_OCR = False
+
+PDF_EXTENSIONS = (".pdf",)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a")
+OCR_LANGUAGES = "pol+eng"
+AUDIO_LANGUAGE = "pl"
+
+# Domyślny limit procesów - przy małych źródłach start procesu kosztuje więcej niż ekstrakcja
+DEFAULT_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+_whisper_available = True
+
+
+def is_media(filename: str) -> bool:
+    """Plik wart osobnego procesu: PDF, obraz (gdy jest OCR) albo nagranie"""
+    return filename.endswith(PDF_EXTENSIONS + AUDIO_EXTENSIONS) or (
+        HAS_OCR and filename.endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def pdf_text(content: bytes) -> str:
+    """Tekst PDF strona po stronie; strony bez warstwy tekstowej przez OCR"""
+    try:
+        doc = fitz.open(stream=content, filetype="pdf")
+        text_parts = []
+
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            text = page.get_text()
+
+            if text.strip():
+                clean_text = re.sub(r"\s+", " ", text).strip()
+                text_parts.append(f"--- Page {page_num + 1} ---\n{clean_text}")
+            elif HAS_OCR:
+                ocr_text = image_text(page.get_pixmap().tobytes("png"))
+                if ocr_text.strip():
+                    text_parts.append(f"--- Page {page_num + 1} (OCR) ---\n{ocr_text}")
+
+        doc.close()
+        return "\n\n".join(text_parts)
+    except Exception as e:
+        logger.error(f"PDF processing error: {e}")
+        return ""
+
+
+def image_text(content: bytes) -> str:
+    """OCR obrazu (skala szarości, polski i angielski)"""
+    if not HAS_OCR:
+        return ""
+
+    try:
+        img = Image.open(BytesIO(content))
+        if img.mode != "L":
+            img = img.convert("L")
+        return pytesseract.image_to_string(img, lang=OCR_LANGUAGES).strip()
+    except Exception as e:
+        logger.error(f"Image OCR failed: {e}")
+        return ""
+
+
+def transcribe_audio(contents: List[bytes]) -> List[str]:
+    """Transkrypcje partii nagrań jednym modelem; przy błędzie partii - plik po pliku"""
+    global _whisper_available
+    if not _whisper_available or not contents:
+        return [""] * len(contents)
+
+    try:
+        return whisper_service.transcribe_many(contents, language=AUDIO_LANGUAGE)
+    except ImportError as e:
+        _whisper_available = False
+        logger.warning(f"⚠️  Whisper not available: {e}")
+        return [""] * len(contents)
+    except Exception as e:
+        logger.error(f"Batch audio transcription failed, retrying per file: {e}")
+
+    texts = []
+    for content in contents:
+        try:
+            texts.append(whisper_service.transcribe(content, language=AUDIO_LANGUAGE))
+        except Exception as e:
+            logger.error(f"Audio transcription failed: {e}")
+            texts.append("")
+    return texts
+
+
+def extract_file(job: Tuple[str, bytes]) -> str:
+    """Tekst jednego pliku PDF lub obrazu (zadanie puli)"""
+    filename, content = job
+    if filename.endswith(PDF_EXTENSIONS):
+        return pdf_text(content)
+    if filename.endswith(IMAGE_EXTENSIONS):
+        return image_text(content)
+    return ""
+
+
+def _pool_context():
+    # fork po starcie wątków torch/chromadb w procesie głównym grozi zakleszczeniem
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+@contextmanager
+def _without_main_import() -> Iterator[None]:
+    """Na czas startu procesów ukrywa ścieżkę skryptu __main__ - inaczej
+    multiprocessing uruchomiłby w każdym procesie cały skrypt od nowa"""
+    main = sys.modules["__main__"]
+    saved = {name: main.__dict__[name] for name in ("__file__", "__spec__") if name in main.__dict__}
+    main.__dict__.pop("__file__", None)
+    main.__dict__["__spec__"] = None
+    try:
+        yield
+    finally:
+        main.__dict__.pop("__spec__", None)
+        main.__dict__.update(saved)
+
+
+def extract_all(jobs: List[Tuple[str, bytes]], workers: int) -> List[str]:
+    """Teksty plików PDF/obrazów/nagrań w kolejności zadań.
+    Pula startuje tylko przy co najmniej dwóch zadaniach (partia nagrań to jedno zadanie)."""
+    audio = [i for i, (filename, _) in enumerate(jobs) if filename.endswith(AUDIO_EXTENSIONS)]
+    files = [i for i, (filename, _) in enumerate(jobs) if not filename.endswith(AUDIO_EXTENSIONS)]
+    tasks = len(files) + bool(audio)
+    workers = min(workers, tasks)
+
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+                # Procesy startują przy pierwszym submit - tu ukrywamy __main__
+                with _without_main_import():
+                    # Partia nagrań idzie pierwsza - zwykle trwa najdłużej
+                    audio_future = pool.submit(transcribe_audio, [jobs[i][1] for i in audio]) if audio else None
+                    file_texts = pool.map(extract_file, [jobs[i] for i in files])
+                audio_texts = audio_future.result() if audio_future else []
+                return _merge(len(jobs), audio, audio_texts, files, list(file_texts))
+        except Exception as e:
+            logger.warning(f"⚠️  Parallel extraction failed, falling back to serial: {e}")
+
+    return _merge(
+        len(jobs),
+        audio,
+        transcribe_audio([jobs[i][1] for i in audio]),
+        files,
+        [extract_file(jobs[i]) for i in files],
+    )
+
+
+def _merge(
+    size: int, audio: List[int], audio_texts: List[str], files: List[int], file_texts: List[str]
+) -> List[str]:
+    texts = [""] * size
+    for i, text in zip(audio, audio_texts):
+        texts[i] = text
+    for i, text in zip(files, file_texts):
+        texts[i] = text
+    return texts
@@ -299,10 +299,9 @@ class AudioProcessor:
     def _transcribe_with_whisper_local(self, audio_path: Path, language: str) -> str:
         """Transcribe audio using local whisper."""
         try:
-            import whisper
-            model = whisper.load_model("base")
-            result = model.transcribe(str(audio_path), language=language)
-            text = result["text"].strip()
+            import whisper_service
+            # Model ładowany raz na proces, transkrypcja cache'owana po hashu nagrania
+            text = whisper_service.transcribe(audio_path, language=language, model_name="base")
             print(f"✅ Lokalna transkrypcja whisper: {text}")
             return text
         except Exception as e:
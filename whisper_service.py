@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Wspólna usługa transkrypcji Whisper dla zadań zadN.py / secN.py
+
+Model ładowany jest raz na proces (dla danej nazwy modelu), a transkrypcje
+trafiają do trwałego magazynu (SQLite, llm_cache.LLMCache) pod kluczem
+SHA-256 nagrania + model + język - identyczne nagranie nie jest
+transkrybowane drugi raz, także przez inne zadanie czy inny silnik.
+Model ładowany jest dopiero przy braku transkrypcji w magazynie.
+transcribe_many() przetwarza listę plików jednym załadowanym modelem
+i pomija duplikaty treści.
+
+Sterowanie przez .env:
+    WHISPER_MODEL=base
+    TRANSCRIPT_CACHE_PATH=.cache/transcripts.sqlite3
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import llm_cache
+
+DEFAULT_MODEL = "base"
+DEFAULT_CACHE_PATH = ".cache/transcripts.sqlite3"
+# Transkrypcje nie wygasają - to funkcja treści nagrania
+TRANSCRIPT_MAX_ENTRIES = 100_000
+
+Audio = Union[str, Path, bytes]
+
+_lock = threading.RLock()
+_models: Dict[str, Any] = {}
+_store: Optional[llm_cache.LLMCache] = None
+
+
+def default_model_name() -> str:
+    return os.getenv("WHISPER_MODEL", DEFAULT_MODEL)
+
+
+def get_model(model_name: Optional[str] = None):
+    """Model Whisper - ładowany przy pierwszym użyciu, potem współdzielony w procesie"""
+    name = model_name or default_model_name()
+    with _lock:
+        if name not in _models:
+            import whisper
+
+            print(f"🎧 Ładowanie lokalnego modelu Whisper: '{name}'...")
+            _models[name] = whisper.load_model(name)
+            print("✅ Model Whisper załadowany.")
+        return _models[name]
+
+
+def get_store() -> llm_cache.LLMCache:
+    """Trwały magazyn transkrypcji wspólny dla wszystkich zadań"""
+    global _store
+    with _lock:
+        if _store is None:
+            _store = llm_cache.LLMCache(
+                path=os.getenv("TRANSCRIPT_CACHE_PATH", DEFAULT_CACHE_PATH),
+                ttl_seconds=0,
+                max_entries=TRANSCRIPT_MAX_ENTRIES,
+            )
+        return _store
+
+
+def _read_audio(audio: Audio) -> bytes:
+    return audio if isinstance(audio, bytes) else Path(audio).read_bytes()
+
+
+def audio_hash(audio: Audio) -> str:
+    """SHA-256 treści nagrania (niezależny od nazwy i położenia pliku)"""
+    return hashlib.sha256(_read_audio(audio)).hexdigest()
+
+
+def transcript_key(digest: str, model: str, language: Optional[str], **options: Any) -> str:
+    return llm_cache.make_key("transcript", digest, model, language, options)
+
+
+def cached_transcript(
+    audio: Audio,
+    model: str,
+    language: Optional[str],
+    compute: Callable[[], str],
+    digest: Optional[str] = None,
+) -> str:
+    """Transkrypcja z magazynu albo wyliczona przez compute() i zapisana.
+    Działa dla każdego backendu (lokalny Whisper, API OpenAI, endpoint lokalny)."""
+    key = transcript_key(digest or audio_hash(audio), model, language)
+    return get_store().get_or_compute(key, compute)
+
+
+def _transcribe_now(audio: Audio, language: Optional[str], model_name: str, options: Dict[str, Any]) -> str:
+    model = get_model(model_name)
+    if isinstance(audio, bytes):
+        with tempfile.NamedTemporaryFile(suffix=".audio", delete=False) as tmp:
+            tmp.write(audio)
+            path = tmp.name
+    else:
+        path = str(audio)
+
+    try:
+        # Model nie jest bezpieczny wątkowo - jedna transkrypcja naraz w procesie
+        with _lock:
+            result = model.transcribe(path, language=language, **options)
+        return result.get("text", "").strip()
+    finally:
+        if isinstance(audio, bytes):
+            os.unlink(path)
+
+
+def transcribe(
+    audio: Audio,
+    language: Optional[str] = None,
+    model_name: Optional[str] = None,
+    **options: Any,
+) -> str:
+    """Transkrybuje plik lub bajty nagrania lokalnym Whisperem (z cache po hashu treści)"""
+    name = model_name or default_model_name()
+    data = _read_audio(audio)
+    key = transcript_key(hashlib.sha256(data).hexdigest(), name, language, **options)
+    return get_store().get_or_compute(
+        key, lambda: _transcribe_now(audio, language, name, options)
+    )
+
+
+
+def transcribe_many(
+    audios: List[Audio],
+    language: Optional[str] = None,
+    model_name: Optional[str] = None,
+    **options: Any,
+) -> List[str]:
+    """Transkrybuje listę nagrań jednym modelem; wyniki w kolejności wejścia,
+    nagrania o identycznej treści transkrybowane są raz, a model ładowany
+    jest tylko, gdy któregoś nagrania brak w magazynie"""
+    name = model_name or default_model_name()
+    store = get_store()
+    keys = [
+        transcript_key(audio_hash(audio), name, language, **options) for audio in audios
+    ]
+
+    results: Dict[str, str] = {}
+    for audio, key in zip(audios, keys):
+        if key in results:
+            continue
+        cached = store.get(key)
+        if cached is None:
+            cached = _transcribe_now(audio, language, name, options)
+            store.set(key, cached)
+        results[key] = cached
+
+    return [results[key] for key in keys]
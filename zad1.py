@@ -22,6 +22,8 @@ import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+import llm_gateway
+
 # POPRAWKA SONARA: Linia 186, 225 - CRITICAL - stałe zamiast duplikacji literałów
 HTML_PARSER = "html.parser"
 DIGIT_REGEX = r"(\d{1,4})"
@@ -106,9 +108,7 @@ if ENGINE == "openai":
     if not OPENAI_API_KEY:
         print("❌ Brak OPENAI_API_KEY", file=sys.stderr)
         sys.exit(1)
-    from openai import OpenAI
-
-    client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_URL)
+    client = llm_gateway.get_openai_client("openai")
 
 elif ENGINE == "lmstudio":
     LMSTUDIO_API_KEY = os.getenv("LMSTUDIO_API_KEY", "local")
@@ -118,9 +118,7 @@ elif ENGINE == "lmstudio":
     )
     print(f"[DEBUG] LMStudio URL: {LMSTUDIO_API_URL}")
     print(f"[DEBUG] LMStudio Model: {MODEL_NAME}")
-    from openai import OpenAI
-
-    client = OpenAI(api_key=LMSTUDIO_API_KEY, base_url=LMSTUDIO_API_URL, timeout=60)
+    client = llm_gateway.get_openai_client("lmstudio").with_options(timeout=60)
 
 elif ENGINE == "anything":
     ANYTHING_API_KEY = os.getenv("ANYTHING_API_KEY", "local")
@@ -130,20 +128,10 @@ elif ENGINE == "anything":
     )
     print(f"[DEBUG] Anything URL: {ANYTHING_API_URL}")
     print(f"[DEBUG] Anything Model: {MODEL_NAME}")
-    from openai import OpenAI
-
-    client = OpenAI(api_key=ANYTHING_API_KEY, base_url=ANYTHING_API_URL, timeout=60)
+    client = llm_gateway.get_openai_client("anything").with_options(timeout=60)
 
 elif ENGINE == "claude":
     # Bezpośrednia integracja Claude
-    try:
-        from anthropic import Anthropic
-    except ImportError:
-        print(
-            "❌ Musisz zainstalować anthropic: pip install anthropic", file=sys.stderr
-        )
-        sys.exit(1)
-
     CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
     if not CLAUDE_API_KEY:
         print("❌ Brak CLAUDE_API_KEY lub ANTHROPIC_API_KEY w .env", file=sys.stderr)
@@ -153,11 +141,9 @@ elif ENGINE == "claude":
         "MODEL_NAME_CLAUDE", "claude-sonnet-4-20250514"
     )
     print(f"[DEBUG] Claude Model: {MODEL_NAME}")
-    claude_client = Anthropic(api_key=CLAUDE_API_KEY)
+    claude_client = llm_gateway.get_anthropic_client()
 
 elif ENGINE == "gemini":
-    import google.generativeai as genai
-
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     if not GEMINI_API_KEY:
         print(
@@ -169,8 +155,7 @@ elif ENGINE == "gemini":
         "MODEL_NAME_GEMINI", "gemini-2.5-pro-latest"
     )
     print(f"[DEBUG] Gemini Model: {MODEL_NAME}")
-    genai.configure(api_key=GEMINI_API_KEY)
-    model_gemini = genai.GenerativeModel(MODEL_NAME)
+    model_gemini = llm_gateway.get_gemini_model(MODEL_NAME)
 else:
     print("❌ Nieobsługiwany silnik:", ENGINE, file=sys.stderr)
     sys.exit(1)
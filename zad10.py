@@ -5,18 +5,19 @@ Multi-engine: openai, lmstudio, anything, claude, gemini
 Przygotowanie metadanych (słów kluczowych) dla raportów fabryki - chunking, contextual retrieval, cache, analiza faktów.
 """
 import argparse
-import hashlib
 import json
 import os
 import re
 import sys
-import zipfile
 from pathlib import Path
 from typing import Optional, Dict, Set, Tuple, List
 
 import requests
 from dotenv import load_dotenv
 
+import artifact_fetcher
+import llm_cache
+import llm_gateway
 from zad9 import chunk_text
 
 # POPRAWKA SONARA: Linia 242 - CRITICAL - stała zamiast duplikacji literału
@@ -74,13 +75,6 @@ if ENGINE == "openai":
         sys.exit(1)
 
 elif ENGINE == "claude":
-    try:
-        from anthropic import Anthropic
-    except ImportError:
-        print(
-            "❌ Musisz zainstalować anthropic: pip install anthropic", file=sys.stderr
-        )
-        sys.exit(1)
     CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
     if not CLAUDE_API_KEY:
         print("❌ Brak CLAUDE_API_KEY lub ANTHROPIC_API_KEY", file=sys.stderr)
@@ -88,11 +82,8 @@ elif ENGINE == "claude":
     MODEL_NAME = os.getenv("MODEL_NAME") or os.getenv(
         "MODEL_NAME_CLAUDE", "claude-sonnet-4-20250514"
     )
-    claude_client = Anthropic(api_key=CLAUDE_API_KEY)
 
 elif ENGINE == "gemini":
-    import google.generativeai as genai
-
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     if not GEMINI_API_KEY:
         print("❌ Brak GEMINI_API_KEY", file=sys.stderr)
@@ -100,8 +91,6 @@ elif ENGINE == "gemini":
     MODEL_NAME = os.getenv("MODEL_NAME") or os.getenv(
         "MODEL_NAME_GEMINI", "gemini-2.5-pro-latest"
     )
-    genai.configure(api_key=GEMINI_API_KEY)
-    model_gemini = genai.GenerativeModel(MODEL_NAME)
 
 elif ENGINE == "lmstudio":
     MODEL_NAME = os.getenv("MODEL_NAME") or os.getenv("MODEL_NAME_LM", "qwen3-14b-128k")
@@ -118,52 +107,7 @@ print(f"✅ Zainicjalizowano silnik: {ENGINE} z modelem: {MODEL_NAME}")
 
 # 3. Uniwersalna funkcja do LLM – pewna obsługa operatora
 def llm_request(prompt: str) -> str:
-    if ENGINE == "openai":
-        import openai
-
-        resp = openai.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-        )
-        return resp.choices[0].message.content.strip()
-    elif ENGINE == "claude":
-        resp = claude_client.messages.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=1000,
-        )
-        return resp.content[0].text.strip()
-    elif ENGINE == "gemini":
-        response = model_gemini.generate_content(
-            [prompt], generation_config={"temperature": 0, "max_output_tokens": 1000}
-        )
-        return response.text.strip()
-    elif ENGINE == "lmstudio":
-        url = LMSTUDIO_API_URL.rstrip("/") + "/chat/completions"
-        headers = {"Content-Type": "application/json"}
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0,
-        }
-        resp = requests.post(url, json=payload, headers=headers)
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"].strip()
-    elif ENGINE == "anything":
-        url = ANYTHING_API_URL.rstrip("/") + "/chat/completions"
-        headers = {"Content-Type": "application/json"}
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0,
-        }
-        resp = requests.post(url, json=payload, headers=headers)
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"].strip()
-    else:
-        raise RuntimeError(f"Nieobsługiwany ENGINE: {ENGINE}")
+    return llm_gateway.complete(prompt, model=MODEL_NAME, engine=ENGINE, temperature=0)
 
 
 # 4. Reszta logiki zadania – jak wcześniej
@@ -173,20 +117,13 @@ CENTRALA_API_KEY = os.getenv("CENTRALA_API_KEY")
 if not REPORT_URL or not CENTRALA_API_KEY:
     raise RuntimeError("Brak REPORT_URL lub CENTRALA_API_KEY w .env")
 
-CACHE_PATH = Path(".cache_context.json")
-CACHE_PATH.parent.mkdir(exist_ok=True)
+# Słowa kluczowe z LLM trzymane we wspólnym cache SQLite (llm_cache.py) -
+# pojedynczy wpis na raport zamiast przepisywania całego pliku JSON
+CACHE_NAMESPACE = "zad10-keywords"
 
 
-def load_cache():
-    if CACHE_PATH.exists():
-        return json.loads(CACHE_PATH.read_text(encoding="utf-8"))
-    return {}
-
-
-def save_cache(cache):
-    CACHE_PATH.write_text(
-        json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+def load_cache() -> llm_cache.LLMCache:
+    return llm_cache.get_cache()
 
 
 EVENT_KEYWORDS = [
@@ -284,10 +221,11 @@ def contextualize_report_with_facts(report_text: str, facts_map: Dict[str, str])
     return context, person_professions
 
 
-def extract_keywords_with_context(full_context: str, filename: str, cache: dict) -> set:
-    context_hash = hashlib.sha256((full_context + filename).encode("utf-8")).hexdigest()
-    if context_hash in cache:
-        return set(cache[context_hash])
+def extract_keywords_with_context(full_context: str, filename: str, cache: llm_cache.LLMCache) -> set:
+    context_key = llm_cache.make_key(CACHE_NAMESPACE, ENGINE, MODEL_NAME, full_context, filename)
+    cached = cache.get(context_key)
+    if cached is not None:
+        return set(json.loads(cached))
     sector = extract_sector_from_filename(filename)
     prompt = f"""Przeanalizuj poniższy raport wraz z powiązanymi faktami.
 Zwróć WSZYSTKIE istotne słowa kluczowe w języku polskim, w mianowniku, oddzielone przecinkami.
@@ -309,8 +247,7 @@ WAŻNE ZASADY:
 Słowa kluczowe:"""
     keywords_text = llm_request(prompt)
     keywords = [w.strip().lower() for w in keywords_text.split(",") if w.strip()]
-    cache[context_hash] = keywords
-    save_cache(cache)
+    cache.set(context_key, json.dumps(keywords, ensure_ascii=False))
     return set(keywords)
 
 
@@ -397,7 +334,7 @@ def _add_person_specific_keywords(kws: Set[str], people_found: List[str]) -> Non
             kws.update(["nauczyciel", "ruch oporu"])
 
 
-def extract_keywords(report_text: str, filename: str, facts_map: Dict[str, str], cache: dict) -> Set[str]:
+def extract_keywords(report_text: str, filename: str, facts_map: Dict[str, str], cache: llm_cache.LLMCache) -> Set[str]:
     """POPRAWKA SONARA: Linia 283 - zredukowano cognitive complexity przez wydzielenie helper functions"""
     kws = set()
     
@@ -422,21 +359,10 @@ def extract_keywords(report_text: str, filename: str, facts_map: Dict[str, str],
 
 
 def download_and_extract(dest: Path):
-    dest.mkdir(parents=True, exist_ok=True)
-    zip_path = dest / "fabryka.zip"
     print(f"📥 Pobieranie plików z {FABRYKA_URL}...")
-    resp = requests.get(FABRYKA_URL, stream=True)
-    resp.raise_for_status()
-    with open(zip_path, "wb") as f:
-        for chunk in resp.iter_content(8192):
-            f.write(chunk)
-    print("📦 Rozpakowywanie archiwum...")
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        for member in zf.infolist():
-            if member.filename.endswith("weapons_tests.zip"):
-                continue
-            zf.extract(member, dest)
-    zip_path.unlink()
+    artifact_fetcher.fetch_and_extract(
+        FABRYKA_URL, dest, members=lambda name: not name.endswith("weapons_tests.zip")
+    )
     print("✅ Pliki rozpakowane")
 
 
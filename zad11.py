@@ -3,6 +3,9 @@
 S03E02 - Wektorowe wyszukiwanie raportów z testów broni
 Multi-engine: openai, lmstudio, anything, gemini, claude
 Wykorzystuje Qdrant do indeksowania i wyszukiwania semantycznego
+Embeddingi liczone wsadowo (wiele tekstów na zapytanie, kilka wsadów równolegle),
+punkty wysyłane do Qdrant strumieniowo w paczkach
+Indeksowanie przyrostowe: id punktu = hash treści raportu, manifest pomija niezmienione pliki
 
 Przykładowa konfiguracja .env:
 # ...
@@ -12,14 +15,16 @@ import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 import argparse
+import hashlib
 import json
 import os
 import re
 import sys
+import tempfile
 import uuid
-import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Optional, TypedDict
+from typing import Any, Iterator, Optional, TypedDict
 
 import requests
 from dotenv import load_dotenv
@@ -27,12 +32,23 @@ from langgraph.graph import END, START, StateGraph
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 
+import artifact_fetcher
+import llm_gateway
+
 # POPRAWKA SONARA: Linia 194 - CRITICAL - stała zamiast duplikacji literału
 MEMORY_MODE = ":memory:"
 
 # Wyłącz ostrzeżenia o embedding
 embedding_warning_emitted = False
 
+# Indeksowanie wsadowe: teksty na jedno zapytanie embeddings, równoległe wsady, paczki upsert
+DEFAULT_EMBEDDING_BATCH_SIZE = 64
+DEFAULT_EMBEDDING_WORKERS = 4
+DEFAULT_UPSERT_BATCH_SIZE = 256
+
+# Manifest indeksu: plik -> hash treści zaindeksowanej w Qdrant
+MANIFEST_PATH = Path(".qdrant_manifest.json")
+
 # 1. Konfiguracja i wykrywanie silnika
 load_dotenv(override=True)
 
@@ -141,25 +157,28 @@ else:
     EMBEDDING_MODEL: str = ""
     VECTOR_SIZE: int = 1536
 
-import os
+EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", DEFAULT_EMBEDDING_BATCH_SIZE))
+EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", DEFAULT_EMBEDDING_WORKERS))
+UPSERT_BATCH_SIZE: int = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", DEFAULT_UPSERT_BATCH_SIZE))
 
-import requests
+# Jedna sesja HTTP (keep-alive) dla endpointu /embeddings LM Studio
+embedding_session = requests.Session()
 
 
-def get_embedding(text: str) -> Optional[list[float]]:
+def get_embeddings(texts: list[str]) -> list[Optional[list[float]]]:
+    """Embeddingi dla listy tekstów w jednym zapytaniu (OpenAI i LM Studio przyjmują listę)"""
     global embedding_warning_emitted
+    if not texts:
+        return []
     if ENGINE == "openai":
-        from openai import OpenAI
-
-        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         try:
-            response = openai_client.embeddings.create(
-                model=EMBEDDING_MODEL, input=text
+            response = llm_gateway.get_openai_client("openai").embeddings.create(
+                model=EMBEDDING_MODEL, input=texts
             )
-            return response.data[0].embedding
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
         except Exception as e:
             print(f"❌ Błąd generowania embeddingu: {e}")
-            return None
+            return [None] * len(texts)
     elif ENGINE in {"lmstudio", "anything"}:
         # Składanie URL z końcówką /embeddings
         base_url = os.getenv("LMSTUDIO_API_URL")
@@ -171,14 +190,14 @@ def get_embedding(text: str) -> Optional[list[float]]:
             api_key = os.getenv("LMSTUDIO_API_KEY", "local")
             if api_key:
                 headers["Authorization"] = f"Bearer {api_key}"
-            data = {"model": model_name, "input": text}
-            response = requests.post(url, json=data, headers=headers, timeout=30)
+            data = {"model": model_name, "input": texts}
+            response = embedding_session.post(url, json=data, headers=headers, timeout=120)
             response.raise_for_status()
-            emb = response.json()
-            return emb["data"][0]["embedding"]
+            items = sorted(response.json()["data"], key=lambda d: d.get("index", 0))
+            return [item["embedding"] for item in items]
         except Exception as e:
             print(f"❌ Błąd embeddingu LM Studio: {e}")
-            return None
+            return [None] * len(texts)
     else:
         if not embedding_warning_emitted:
             # POPRAWKA SONARA: Linia 199 - MAJOR - usunięto niepotrzebny f-string
@@ -186,7 +205,11 @@ def get_embedding(text: str) -> Optional[list[float]]:
                 "⚠️  Wybrany silnik nie obsługuje embeddingów (albo nie zaimplementowano obsługi). Użyj OpenAI lub LM Studio."
             )
             embedding_warning_emitted = True
-        return None
+        return [None] * len(texts)
+
+
+def get_embedding(text: str) -> Optional[list[float]]:
+    return get_embeddings([text])[0]
 
 
 # 3. Inicjalizacja Qdrant
@@ -217,20 +240,6 @@ else:
         print(f"   - Lub ustaw QDRANT_HOST={MEMORY_MODE} w .env dla trybu in-memory")
         sys.exit(1)
 
-# === USUWANIE KOLEKCJI JEŚLI ISTNIEJE (dowolny tryb, także Cloud/In-Memory) ===
-try:
-    collections = qdrant_client.get_collections()
-    collection_names = [c.name for c in collections.collections]
-    if COLLECTION_NAME in collection_names:
-        print(
-            f"⚠️  Usuwam istniejącą kolekcję Qdrant '{COLLECTION_NAME}' (konflikt wymiarów embeddingu)..."
-        )
-        qdrant_client.delete_collection(COLLECTION_NAME)
-        print(f"✅ Kolekcja '{COLLECTION_NAME}' została usunięta.")
-except Exception as e:
-    print(f"❌ Błąd podczas usuwania kolekcji '{COLLECTION_NAME}': {e}")
-
-
 # 4. Typowanie stanu pipeline
 class PipelineState(TypedDict, total=False):
     weapons_dir: Path
@@ -239,26 +248,12 @@ class PipelineState(TypedDict, total=False):
 
 # 5. Funkcje pomocnicze z typowaniem
 def download_and_extract(dest: Path) -> Path:
-    """Pobiera i rozpakowuje archiwum z fabryki"""
-    dest.mkdir(parents=True, exist_ok=True)
-
+    """Pobiera archiwum z fabryki (wspólny cache artefaktów) i rozpakowuje tylko weapons_tests.zip"""
     print(f"📥 Pobieranie plików z {FABRYKA_URL}...")
-    main_zip = dest / "fabryka.zip"
-    resp = requests.get(FABRYKA_URL, stream=True)
-    resp.raise_for_status()
-
-    with open(main_zip, "wb") as f:
-        for chunk in resp.iter_content(8192):
-            f.write(chunk)
-
-    print("📦 Rozpakowywanie głównego archiwum...")
-    with zipfile.ZipFile(main_zip, "r") as zf:
-        zf.extractall(dest)
-
-    weapons_zip: Optional[Path] = None
-    for file in dest.rglob("weapons_tests.zip"):
-        weapons_zip = file
-        break
+    extracted = artifact_fetcher.fetch_and_extract(
+        FABRYKA_URL, dest, members=["weapons_tests.zip"]
+    )
+    weapons_zip: Optional[Path] = extracted[0] if extracted else None
 
     if not weapons_zip:
         print("❌ Nie znaleziono weapons_tests.zip")
@@ -267,8 +262,7 @@ def download_and_extract(dest: Path) -> Path:
     print("🔓 Rozpakowywanie weapons_tests.zip z hasłem...")
     weapons_dir = weapons_zip.parent / "weapons_tests"
 
-    with zipfile.ZipFile(weapons_zip, "r") as zf:
-        zf.extractall(weapons_dir, pwd=WEAPONS_PASSWORD.encode())
+    artifact_fetcher.extract(weapons_zip, weapons_dir, pwd=WEAPONS_PASSWORD)
 
     print("✅ Pliki rozpakowane")
     return weapons_dir
@@ -282,12 +276,30 @@ def extract_date_from_filename(filename: str) -> Optional[str]:
     return None
 
 
-def create_collection() -> None:
-    """Tworzy kolekcję w Qdrant"""
-    try:
+def collection_vector_size() -> Optional[int]:
+    """Wymiar wektorów istniejącej kolekcji albo None, jeśli kolekcji nie ma"""
+    existing = [c.name for c in qdrant_client.get_collections().collections]
+    if COLLECTION_NAME not in existing:
+        return None
+    vectors = qdrant_client.get_collection(COLLECTION_NAME).config.params.vectors
+    if isinstance(vectors, dict):
+        vectors = next(iter(vectors.values()))
+    return vectors.size
+
+
+def create_collection() -> bool:
+    """Zapewnia kolekcję w Qdrant; usuwa ją tylko przy konflikcie wymiarów embeddingu.
+    Zwraca True, jeśli kolekcja została utworzona od nowa (manifest jest wtedy nieaktualny)."""
+    size = collection_vector_size()
+    if size == VECTOR_SIZE:
+        print(f"♻️  Używam istniejącej kolekcji '{COLLECTION_NAME}' (wymiar {size})")
+        return False
+
+    if size is not None:
+        print(
+            f"⚠️  Usuwam kolekcję Qdrant '{COLLECTION_NAME}' (konflikt wymiarów embeddingu: {size} != {VECTOR_SIZE})..."
+        )
         qdrant_client.delete_collection(COLLECTION_NAME)
-    except Exception:
-        pass
 
     qdrant_client.create_collection(
         collection_name=COLLECTION_NAME,
@@ -296,40 +308,174 @@ def create_collection() -> None:
         ),
     )
     print(f"✅ Utworzono kolekcję '{COLLECTION_NAME}' w Qdrant")
+    return True
 
 
-def index_reports(weapons_dir: Path) -> None:
-    """Indeksuje raporty w Qdrant"""
-    print("🔍 Indeksowanie raportów...")
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
-    points: list[Any] = []
-    for file_path in weapons_dir.rglob("*.txt"):
-        content: str = file_path.read_text(encoding="utf-8", errors="ignore")
+
+def point_id(report_hash: str) -> str:
+    """Deterministyczne id punktu: ta sama treść i model embeddingu -> ten sam punkt"""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{EMBEDDING_MODEL}:{report_hash}"))
+
+
+def manifest_scope() -> dict[str, Any]:
+    return {"collection": COLLECTION_NAME, "embedding_model": EMBEDDING_MODEL, "vector_size": VECTOR_SIZE}
+
+
+def load_manifest() -> dict[str, str]:
+    """Manifest ważny tylko dla tej samej kolekcji i modelu embeddingu"""
+    if not MANIFEST_PATH.exists():
+        return {}
+    try:
+        data = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if data.get("scope") != manifest_scope():
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(files: dict[str, str]) -> None:
+    """Zapis atomowy - przerwane indeksowanie nie zostawi uszkodzonego manifestu"""
+    payload = json.dumps({"scope": manifest_scope(), "files": files}, ensure_ascii=False, indent=2)
+    fd, tmp_path = tempfile.mkstemp(dir=MANIFEST_PATH.resolve().parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(payload)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def existing_point_ids(ids: list[str]) -> set[str]:
+    """Które z punktów faktycznie są w kolekcji (manifest mógł przeżyć kolekcję)"""
+    if not ids:
+        return set()
+    points = qdrant_client.retrieve(
+        collection_name=COLLECTION_NAME, ids=ids, with_payload=False, with_vectors=False
+    )
+    return {str(p.id) for p in points}
+
+
+def collect_reports(weapons_dir: Path) -> list[dict[str, str]]:
+    """Wczytuje raporty z datą w nazwie pliku"""
+    reports: list[dict[str, str]] = []
+    for file_path in sorted(weapons_dir.rglob("*.txt")):
         date: Optional[str] = extract_date_from_filename(file_path.name)
         if not date:
             print(f"⚠️  Nie udało się wyekstraktować daty z: {file_path.name}")
             continue
+        content: str = file_path.read_text(encoding="utf-8", errors="ignore")
+        reports.append({
+            "filename": file_path.name,
+            "date": date,
+            "content": content,
+            "hash": content_hash(content),
+        })
+    return reports
+
 
-        embedding: Optional[list[float]] = get_embedding(content)
+def iter_batches(items: list[Any], size: int) -> Iterator[list[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def embed_batch(batch: list[dict[str, str]]) -> list[Any]:
+    """Jedno zapytanie embeddings dla całego wsadu -> punkty Qdrant"""
+    embeddings = get_embeddings([report["content"] for report in batch])
+    points: list[Any] = []
+    for report, embedding in zip(batch, embeddings):
         if not embedding:
-            print(f"⚠️  Nie udało się wygenerować embeddingu dla: {file_path.name}")
+            print(f"⚠️  Nie udało się wygenerować embeddingu dla: {report['filename']}")
             continue
+        points.append(
+            models.PointStruct(
+                id=point_id(report["hash"]),
+                vector=embedding,
+                payload={
+                    "date": report["date"],
+                    "filename": report["filename"],
+                    "content_preview": report["content"][:200],
+                    "content_hash": report["hash"],
+                },
+            )
+        )
+        print(f"   ✅ Zaindeksowano: {report['filename']} (data: {report['date']})")
+    return points
+
+
+def upsert_points(points: list[Any]) -> None:
+    qdrant_client.upsert(collection_name=COLLECTION_NAME, points=points)
+
+
+def select_changed_reports(
+    reports: list[dict[str, str]], manifest: dict[str, str]
+) -> tuple[list[dict[str, str]], list[str]]:
+    """Raporty do (re)indeksowania oraz id nieaktualnych punktów do usunięcia"""
+    unchanged = [r for r in reports if manifest.get(r["filename"]) == r["hash"]]
+    present = existing_point_ids([point_id(r["hash"]) for r in unchanged])
+    to_index = [r for r in reports if point_id(r["hash"]) not in present]
+
+    current = {r["filename"]: r["hash"] for r in reports}
+    current_ids = {point_id(h) for h in current.values()}
+    stale = {
+        point_id(old_hash)
+        for filename, old_hash in manifest.items()
+        if current.get(filename) != old_hash
+    }
+    # Ta sama treść w innym pliku dzieli punkt - takiego nie usuwamy
+    return to_index, sorted(stale - current_ids)
+
 
-        point = models.PointStruct(
-            id=str(uuid.uuid4()),
-            vector=embedding,
-            payload={
-                "date": date,
-                "filename": file_path.name,
-                "content_preview": content[:200],
-            },
+def index_reports(weapons_dir: Path, fresh_collection: bool = False) -> None:
+    """Indeksuje przyrostowo: tylko nowe/zmienione raporty, wsady embeddingów równolegle, upsert w paczkach"""
+    print("🔍 Indeksowanie raportów...")
+
+    reports = collect_reports(weapons_dir)
+    manifest = {} if fresh_collection else load_manifest()
+    to_index, stale = select_changed_reports(reports, manifest)
+
+    if stale:
+        qdrant_client.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=models.PointIdsList(points=stale),
         )
-        points.append(point)
-        print(f"   ✅ Zaindeksowano: {file_path.name} (data: {date})")
+        print(f"   🗑️  Usunięto {len(stale)} nieaktualnych punktów")
+
+    skipped = len(reports) - len(to_index)
+    if skipped:
+        print(f"   ⏭️  Pominięto {skipped} niezmienionych raportów")
+
+    batches = list(iter_batches(to_index, EMBEDDING_BATCH_SIZE))
+    print(
+        f"   📦 {len(to_index)} raportów do zaindeksowania w {len(batches)} wsadach "
+        f"(po {EMBEDDING_BATCH_SIZE}, równolegle {EMBEDDING_WORKERS})"
+    )
 
-    if points:
-        qdrant_client.upsert(collection_name=COLLECTION_NAME, points=points)
-        print(f"✅ Zaindeksowano {len(points)} raportów")
+    pending: list[Any] = []
+    indexed_ids: set[str] = set()
+    with ThreadPoolExecutor(max_workers=max(1, EMBEDDING_WORKERS)) as pool:
+        futures = [pool.submit(embed_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            pending.extend(future.result())
+            while len(pending) >= UPSERT_BATCH_SIZE:
+                chunk, pending = pending[:UPSERT_BATCH_SIZE], pending[UPSERT_BATCH_SIZE:]
+                upsert_points(chunk)
+                indexed_ids.update(str(p.id) for p in chunk)
+
+    if pending:
+        upsert_points(pending)
+        indexed_ids.update(str(p.id) for p in pending)
+
+    # Do manifestu trafiają tylko raporty, które faktycznie są w kolekcji
+    attempted = {r["filename"] for r in to_index}
+    save_manifest({
+        r["filename"]: r["hash"]
+        for r in reports
+        if r["filename"] not in attempted or point_id(r["hash"]) in indexed_ids
+    })
+
+    if indexed_ids or skipped:
+        print(f"✅ Zaindeksowano {len(indexed_ids)} raportów, {skipped} bez zmian")
     else:
         print("❌ Brak raportów do zaindeksowania")
 
@@ -380,8 +526,8 @@ def download_node(state: PipelineState) -> PipelineState:
 
 def index_node(state: PipelineState) -> PipelineState:
     """Node do indeksowania raportów"""
-    create_collection()
-    index_reports(state["weapons_dir"])
+    fresh = create_collection()
+    index_reports(state["weapons_dir"], fresh_collection=fresh)
     return state
 
 
@@ -15,6 +15,8 @@ import requests
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 
+import llm_gateway
+
 # Stałe do poprawki duplikacji literałów
 HTML_PARSER = "html.parser"
 DIGIT_REGEX = r"(\d{1,4})"
@@ -109,75 +111,10 @@ elif ENGINE == "gemini" and not os.getenv("GEMINI_API_KEY"):
 
 # 2. Inicjalizacja klienta LLM
 def call_llm(prompt: str, temperature: float = 0) -> str:
-    """Uniwersalna funkcja wywołania LLM"""
-
-    if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_URL") or None,
-        )
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
-        resp = client.messages.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=1000,
-        )
-        return resp.content[0].text.strip()
-
-    elif ENGINE in {"lmstudio", "anything"}:
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(
-            [prompt],
-            generation_config={"temperature": temperature, "max_output_tokens": 1000},
-        )
-        return response.text.strip()
+    """Uniwersalna funkcja wywołania LLM (wspólna pula połączeń z llm_gateway)"""
+    return llm_gateway.complete(
+        prompt, model=MODEL_NAME, engine=ENGINE, temperature=temperature
+    )
 
 
 # 3. Typowanie stanu pipeline
@@ -5,26 +5,34 @@ Multi-engine: openai, lmstudio, anything, gemini, claude
 Wykorzystuje iteracyjne przeszukiwanie API people/places
 """
 import argparse
+import asyncio
 import json
 import logging
 import os
 import re
 import sys
 import unicodedata
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, TypedDict
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple, TypedDict
 
+import aiohttp
 import requests
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 
+import llm_gateway
+
 # Constants to avoid string duplication (S1192)
-DEFAULT_LMSTUDIO_URL = "http://localhost:1234/v1"
-DEFAULT_API_KEY_LOCAL = "local"
 CONTENT_TYPE_JSON = "application/json"
 API_KEY_HIDDEN = "***HIDDEN***"
-ERROR_ANTHROPIC_MISSING = "❌ Musisz zainstalować anthropic: pip install anthropic"
-DEFAULT_MAX_TOKENS = 1000
+
+API_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+# Normalizacja nazw: cache LRU (nazwa -> forma znormalizowana)
+NORMALIZE_CACHE_SIZE = 4096
+# Lematyzacja pojedynczych słów nie potrzebuje parsera zależności ani NER
+SPACY_LEMMA_DISABLE = ["parser", "ner"]
 
 # Konfiguracja loggera
 logging.basicConfig(
@@ -47,6 +55,9 @@ logger.addFilter(URLMaskingFilter())
 # 1. Konfiguracja i wykrywanie silnika
 load_dotenv(override=True)
 
+# Przeszukiwanie people/places: zapytania jednego poziomu BFS idą równolegle
+API_CONCURRENCY = int(os.getenv("API_CONCURRENCY", "8"))
+
 parser = argparse.ArgumentParser(
     description="Znajdowanie Barbary Zawadzkiej (multi-engine)"
 )
@@ -148,72 +159,10 @@ except (ImportError, OSError) as e:
 
 # 3. Inicjalizacja klienta LLM
 def call_llm(prompt: str, temperature: float = 0) -> str:
-    """Uniwersalna funkcja wywołania LLM"""
-
-    if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_URL") or None,
-        )
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(ERROR_ANTHROPIC_MISSING, file=sys.stderr)
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
-        resp = client.messages.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=DEFAULT_MAX_TOKENS,
-        )
-        return resp.content[0].text.strip()
-
-    elif ENGINE in {"lmstudio", "anything"}:
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", DEFAULT_LMSTUDIO_URL)
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", DEFAULT_LMSTUDIO_URL)
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", DEFAULT_API_KEY_LOCAL)
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", DEFAULT_API_KEY_LOCAL)
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(
-            [prompt],
-            generation_config={"temperature": temperature, "max_output_tokens": DEFAULT_MAX_TOKENS},
-        )
-        return response.text.strip()
+    """Uniwersalna funkcja wywołania LLM (wspólna pula połączeń z llm_gateway)"""
+    return llm_gateway.complete(
+        prompt, model=MODEL_NAME, engine=ENGINE, temperature=temperature
+    )
 
 
 # 4. Typowanie stanu pipeline
@@ -228,63 +177,102 @@ class PipelineState(TypedDict, total=False):
 
 
 # 5. Funkcje pomocnicze
-def normalize_query(query: str) -> str:
-    """Normalizuje zapytanie do formy mianownikowej i usuwa polskie znaki"""
+_normalized: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _ascii_letters(text: str) -> str:
+    """Usuwa polskie znaki diakrytyczne i wszystko poza literami A-Z"""
+    normalized_ascii = (
+        unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    )
+    return "".join([char for char in normalized_ascii if char.isalpha()])
+
+
+def _lemmatize(queries: List[str]) -> List[str]:
+    """Forma mianownikowa (uppercase) dla listy słów - jeden przebieg nlp.pipe"""
     if USE_SPACY:
         try:
-            doc = nlp(query)
-            normalized_tokens = [
-                token.lemma_.upper() for token in doc if token.is_alpha
-            ]
-            if normalized_tokens:
-                normalized = normalized_tokens[0]
-            else:
-                normalized = query.upper()
+            lemmas = []
+            for query, doc in zip(queries, nlp.pipe(queries, disable=SPACY_LEMMA_DISABLE)):
+                normalized_tokens = [
+                    token.lemma_.upper() for token in doc if token.is_alpha
+                ]
+                lemmas.append(normalized_tokens[0] if normalized_tokens else query.upper())
+            return lemmas
         except (AttributeError, ValueError) as e:
             logger.debug(f"Błąd normalizacji spaCy: {e}")
-            normalized = query.upper()
-    else:
-        # Fallback - tylko uppercase
-        normalized = query.upper()
 
-    # Usunięcie polskich znaków diakrytycznych
-    normalized_ascii = (
-        unicodedata.normalize("NFKD", normalized)
-        .encode("ascii", "ignore")
-        .decode("ascii")
-    )
+    # Fallback - tylko uppercase
+    return [query.upper() for query in queries]
+
+
+def normalize_queries(queries: Iterable[str]) -> List[str]:
+    """Normalizuje wiele zapytań naraz: trafienia z cache LRU, brakujące wsadowo przez spaCy"""
+    queries = list(queries)
+    found: Dict[str, str] = {}
+    missing: List[str] = []
+    for query in dict.fromkeys(queries):
+        if query in _normalized:
+            _normalized.move_to_end(query)
+            found[query] = _normalized[query]
+        else:
+            missing.append(query)
+
+    if missing:
+        for query, lemma in zip(missing, _lemmatize(missing)):
+            normalized = _ascii_letters(lemma)
+            logger.debug(f"Znormalizowane słowo: '{query}' -> '{normalized}'")
+            found[query] = _normalized[query] = normalized
+        while len(_normalized) > NORMALIZE_CACHE_SIZE:
+            _normalized.popitem(last=False)
 
-    # Usunięcie znaków innych niż litery A-Z
-    normalized_ascii = "".join([char for char in normalized_ascii if char.isalpha()])
+    return [found[query] for query in queries]
+
+
+def normalize_query(query: str) -> str:
+    """Normalizuje zapytanie do formy mianownikowej i usuwa polskie znaki"""
+    return normalize_queries([query])[0]
 
-    logger.debug(f"Znormalizowane słowo: '{query}' -> '{normalized_ascii}'")
-    return normalized_ascii
 
+# Zapamiętane odpowiedzi API: (url, zapytanie) -> odpowiedź
+_api_responses: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+async def query_api(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    url: str,
+    query: str,
+) -> Dict[str, Any]:
+    """Wysyła zapytanie do API (odpowiedź zapamiętywana dla pary url + zapytanie)"""
+    key = (url, query)
+    if key in _api_responses:
+        logger.debug(f"Odpowiedź z pamięci dla '{query}'")
+        return _api_responses[key]
 
-def query_api(url: str, query: str) -> Optional[Dict[str, Any]]:
-    """Wysyła zapytanie do API"""
     payload = {"apikey": CENTRALA_API_KEY, "query": query}
+    safe_payload = payload.copy()
+    safe_payload["apikey"] = API_KEY_HIDDEN
+    logger.info(f"Payload wysyłany do {url}: {safe_payload}")
 
     try:
-        safe_payload = payload.copy()
-        safe_payload["apikey"] = API_KEY_HIDDEN
-        logger.info(f"Payload wysyłany do {url}: {safe_payload}")
-
         headers = {"Content-Type": CONTENT_TYPE_JSON}
-        response = requests.post(url, json=payload, headers=headers)
-        logger.info(f"Odpowiedź serwera dla '{query}': {response.text}")
-        response.raise_for_status()
-        result = response.json()
-
-        if isinstance(result, dict) and result.get("code") == 0:
-            return result
-        else:
-            logger.error(f"API zwróciło błąd: {result}")
-            return {}
-    except requests.exceptions.RequestException as e:
+        async with semaphore, session.post(url, json=payload, headers=headers) as response:
+            text = await response.text()
+            logger.info(f"Odpowiedź serwera dla '{query}': {text}")
+            response.raise_for_status()
+            result = json.loads(text)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        # Błędy sieci nie są zapamiętywane - kolejne zapytanie spróbuje ponownie
         logger.error(f"Błąd podczas zapytania do API {url} z query '{query}': {e}")
         return {}
 
+    if not (isinstance(result, dict) and result.get("code") == 0):
+        logger.error(f"API zwróciło błąd: {result}")
+        result = {}
+    _api_responses[key] = result
+    return result
+
 
 def extract_keywords(text: str) -> tuple[Set[str], Set[str]]:
     """Wydobywa potencjalne imiona i nazwy miast z notatki"""
@@ -378,8 +366,8 @@ def extract_keywords_node(state: PipelineState) -> PipelineState:
     people, places = extract_keywords(note)
 
     # Normalizuj
-    normalized_people = {normalize_query(p) for p in people}
-    normalized_places = {normalize_query(p) for p in places}
+    normalized_people = set(normalize_queries(people))
+    normalized_places = set(normalize_queries(places))
 
     # Usuń puste i zbyt krótkie
     normalized_people = {p for p in normalized_people if len(p) > 2}
@@ -397,74 +385,96 @@ def extract_keywords_node(state: PipelineState) -> PipelineState:
     return state
 
 
-def _process_people_queue(people_queue: List[str], checked_people: Set[str], 
-                         places_queue: List[str], checked_places: Set[str]) -> None:
-    """Przetwarza kolejkę osób"""
-    if people_queue:
-        person = people_queue.pop(0)
-        if person not in checked_people:
-            logger.debug(f"Sprawdzam: {person}")
-            response = query_api(PEOPLE_URL, person)
-            checked_people.add(person)
-
-            if response and response.get("code") == 0:
-                message = response.get("message", "")
-                places = message.split()
-                for place in places:
-                    normalized_place = normalize_query(place)
-                    if (
-                        normalized_place not in checked_places
-                        and normalized_place not in places_queue
-                    ):
-                        places_queue.append(normalized_place)
-
-
-def _process_places_queue(places_queue: List[str], checked_places: Set[str],
-                         people_queue: List[str], checked_people: Set[str],
-                         barbara_locations: List[str], known_barbara_locations: Set[str]) -> Optional[str]:
-    """Przetwarza kolejkę miejsc"""
+def _enqueue(names: List[str], queue: Deque[str], seen: Set[str]) -> None:
+    """Dodaje znormalizowane nazwy do kolejki; seen = sprawdzone lub oczekujące"""
+    for normalized in normalize_queries(names):
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            queue.append(normalized)
+
+
+async def _query_level(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    people_queue: Deque[str],
+    places_queue: Deque[str],
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Tuple[str, Dict[str, Any]]]]:
+    """Opróżnia obie kolejki i odpytuje API o cały poziom BFS naraz"""
+    people = [people_queue.popleft() for _ in range(len(people_queue))]
+    places = [places_queue.popleft() for _ in range(len(places_queue))]
+    logger.debug(f"Sprawdzam poziom: osoby {people}, miejsca {places}")
+
+    responses = await asyncio.gather(
+        *(query_api(session, semaphore, PEOPLE_URL, person) for person in people),
+        *(query_api(session, semaphore, PLACES_URL, place) for place in places),
+    )
+    return (
+        list(zip(people, responses[: len(people)])),
+        list(zip(places, responses[len(people) :])),
+    )
+
+
+def _check_barbara(place: str, people: List[str], barbara_locations: List[str],
+                   known_barbara_locations: Set[str]) -> Optional[str]:
+    """Zwraca miejsce, jeśli to NOWA lokalizacja Barbary"""
+    if "BARBARA" not in people:
+        return None
+
+    logger.info(f"Znaleziono Barbarę w miejscu: {place}")
+    barbara_locations.append(place)
+
+    # Sprawdź czy to NOWE miejsce (nie z notatki)
+    if place in known_barbara_locations:
+        logger.info(f"ℹ️ {place} to znana lokalizacja z notatki")
+        return None
+    logger.info(f"🎯 To jest NOWA lokalizacja Barbary: {place}")
+    return place
+
+
+async def search_graph(people_queue: Deque[str], places_queue: Deque[str],
+                       checked_people: Set[str], checked_places: Set[str],
+                       barbara_locations: List[str],
+                       known_barbara_locations: Set[str]) -> Optional[str]:
+    """BFS po grafie osoby ↔ miejsca: jeden poziom = jedna runda równoległych zapytań"""
+    seen_people = checked_people | set(people_queue)
+    seen_places = checked_places | set(places_queue)
+    semaphore = asyncio.Semaphore(API_CONCURRENCY)
     new_barbara_location = None
-    
-    if places_queue:
-        place = places_queue.pop(0)
-        if place not in checked_places:
-            logger.debug(f"Sprawdzam: {place}")
-            response = query_api(PLACES_URL, place)
-            checked_places.add(place)
-
-            if response and response.get("code") == 0:
-                message = response.get("message", "")
-                people = message.split()
-
-                # Sprawdź czy Barbara jest w tym miejscu
-                if "BARBARA" in people:
-                    logger.info(f"Znaleziono Barbarę w miejscu: {place}")
-                    barbara_locations.append(place)
-
-                    # Sprawdź czy to NOWE miejsce (nie z notatki)
-                    if place not in known_barbara_locations:
-                        new_barbara_location = place
-                        logger.info(f"🎯 To jest NOWA lokalizacja Barbary: {place}")
-                        # Kontynuuj przeszukiwanie, może być więcej miejsc
-                    else:
-                        logger.info(f"ℹ️ {place} to znana lokalizacja z notatki")
-
-                # Dodaj nowe osoby do kolejki
-                for person_name in people:
-                    normalized_person = normalize_query(person_name)
-                    if (
-                        normalized_person not in checked_people
-                        and normalized_person not in people_queue
-                    ):
-                        people_queue.append(normalized_person)
-    
+    depth = 0
+
+    async with aiohttp.ClientSession(timeout=API_TIMEOUT) as session:
+        while people_queue or places_queue:
+            depth += 1
+            logger.info(
+                f"🔎 Poziom {depth}: {len(people_queue)} osób, {len(places_queue)} miejsc"
+            )
+            people_results, place_results = await _query_level(
+                session, semaphore, people_queue, places_queue
+            )
+
+            for person, response in people_results:
+                checked_people.add(person)
+                if response:
+                    _enqueue(response.get("message", "").split(), places_queue, seen_places)
+
+            for place, response in place_results:
+                checked_places.add(place)
+                if not response:
+                    continue
+                people = response.get("message", "").split()
+                # Kontynuuj przeszukiwanie, może być więcej miejsc
+                new_barbara_location = _check_barbara(
+                    place, people, barbara_locations, known_barbara_locations
+                ) or new_barbara_location
+                _enqueue(people, people_queue, seen_people)
+
     return new_barbara_location
 
 
 def search_loop_node(state: PipelineState) -> PipelineState:
     """Główna pętla wyszukiwania - refaktoryzowana dla niższej złożoności"""
-    people_queue = state.get("people_to_check", [])
-    places_queue = state.get("places_to_check", [])
+    people_queue = deque(state.get("people_to_check", []))
+    places_queue = deque(state.get("places_to_check", []))
     checked_people = state.get("checked_people", set())
     checked_places = state.get("checked_places", set())
     barbara_locations = state.get("barbara_locations", [])
@@ -472,20 +482,13 @@ def search_loop_node(state: PipelineState) -> PipelineState:
     # Określ znane lokalizacje Barbary z notatki
     # Na podstawie analizy: Barbara była widziana w Warszawie i Krakowie (z notatki)
     known_barbara_locations = {"WARSZAWA", "KRAKOW"}
-    new_barbara_location = None
 
-    while people_queue or places_queue:
-        # Sprawdź osoby
-        _process_people_queue(people_queue, checked_people, places_queue, checked_places)
-
-        # Sprawdź miejsca
-        current_new_location = _process_places_queue(
-            places_queue, checked_places, people_queue, checked_people,
-            barbara_locations, known_barbara_locations
+    new_barbara_location = asyncio.run(
+        search_graph(
+            people_queue, places_queue, checked_people, checked_places,
+            barbara_locations, known_barbara_locations,
         )
-        
-        if current_new_location:
-            new_barbara_location = current_new_location
+    )
 
     logger.info("Zakończono przeszukiwanie.")
 
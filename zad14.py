@@ -35,6 +35,7 @@ Każdy krok jest niezależny i testowalny.
 ## Co się dzieje "pod maską":
 1. **MySQL** → dostarcza surowe dane (users + connections)
 2. **Neo4j** → buduje graf i znajduje optymalną ścieżkę
+   (albo **GRAPH_BACKEND=memory** → graf w pamięci i dwukierunkowy BFS, bez bazy)
 3. **Python** → tylko orkiestruje proces
 
 **Fun fact**: Neo4j jest tak dobry w grafach, że `shortestPath()` to dla niego podstawowa operacja - jak `SELECT` dla SQL.
@@ -44,13 +45,18 @@ import json
 import logging
 import os
 import sys
+from array import array
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
 import requests
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
-from neo4j import GraphDatabase
+
+try:
+    from neo4j import GraphDatabase
+except ImportError:  # Neo4j opcjonalny - wtedy graf w pamięci
+    GraphDatabase = None
 
 # Konfiguracja loggera
 logging.basicConfig(
@@ -116,6 +122,14 @@ if not all([APIDB_URL, REPORT_URL, CENTRALA_API_KEY]):
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+# Liczba wierszy na jedno UNWIND (jedna transakcja zapisu na paczkę)
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "5000"))
+
+# Silnik grafu: neo4j, memory (w procesie) albo auto (Neo4j, jeśli dostępny)
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "auto").lower()
+if GRAPH_BACKEND not in {"auto", "neo4j", "memory"}:
+    print(f"❌ Nieobsługiwany GRAPH_BACKEND: {GRAPH_BACKEND}", file=sys.stderr)
+    sys.exit(1)
 
 
 # 2. Typowanie stanu pipeline
@@ -124,6 +138,7 @@ class PipelineState(TypedDict, total=False):
     connections: List[Dict[str, Any]]
     shortest_path: List[str]
     result: str
+    graph_backend: str
     fetch_error: Optional[str]
     graph_error: Optional[str]
 
@@ -185,27 +200,54 @@ class Neo4jConnection:
             session.run("MATCH (n) DETACH DELETE n")
             logger.info("🧹 Wyczyszczono bazę Neo4j")
 
-    def create_user_node(self, user_id: int, username: str):
-        """Tworzy węzeł użytkownika"""
+    def ensure_schema(self):
+        """Ograniczenie unikalności na userId i indeks na name - MATCH bez skanowania etykiety"""
         with self.driver.session() as session:
             session.run(
-                "CREATE (u:User {userId: $user_id, name: $username})",
-                user_id=user_id,
-                username=username,
+                "CREATE CONSTRAINT user_id_unique IF NOT EXISTS "
+                "FOR (u:User) REQUIRE u.userId IS UNIQUE"
             )
+            session.run("CREATE INDEX user_name IF NOT EXISTS FOR (u:User) ON (u.name)")
 
-    def create_connection(self, user1_id: int, user2_id: int):
-        """Tworzy relację KNOWS między użytkownikami"""
+    @staticmethod
+    def _write_rows(tx, query: str, rows: List[Dict[str, Any]]):
+        tx.run(query, rows=rows).consume()
+
+    def _write_batches(self, query: str, rows: List[Dict[str, Any]]):
+        """Zapisuje wiersze paczkami UNWIND $rows, każda paczka w zarządzanej transakcji"""
         with self.driver.session() as session:
-            session.run(
-                """
-                MATCH (u1:User {userId: $user1_id})
-                MATCH (u2:User {userId: $user2_id})
-                CREATE (u1)-[:KNOWS]->(u2)
-                """,
-                user1_id=user1_id,
-                user2_id=user2_id,
-            )
+            for start in range(0, len(rows), NEO4J_BATCH_SIZE):
+                session.execute_write(
+                    self._write_rows, query, rows[start : start + NEO4J_BATCH_SIZE]
+                )
+
+    def create_user_nodes(self, users: List[Dict[str, Any]]):
+        """Tworzy węzły użytkowników"""
+        rows = [{"user_id": user["id"], "username": user["username"]} for user in users]
+        self._write_batches(
+            """
+            UNWIND $rows AS row
+            MERGE (u:User {userId: row.user_id})
+            SET u.name = row.username
+            """,
+            rows,
+        )
+
+    def create_connections(self, connections: List[Dict[str, Any]]):
+        """Tworzy relacje KNOWS między użytkownikami"""
+        rows = [
+            {"user1_id": conn["user1_id"], "user2_id": conn["user2_id"]}
+            for conn in connections
+        ]
+        self._write_batches(
+            """
+            UNWIND $rows AS row
+            MATCH (u1:User {userId: row.user1_id})
+            MATCH (u2:User {userId: row.user2_id})
+            CREATE (u1)-[:KNOWS]->(u2)
+            """,
+            rows,
+        )
 
     def find_shortest_path(self, start_name: str, end_name: str) -> Optional[List[str]]:
         """Znajduje najkrótszą ścieżkę między dwoma użytkownikami"""
@@ -225,6 +267,122 @@ class Neo4jConnection:
             return None
 
 
+class InMemoryGraph:
+    """Skierowany graf w pamięci: tablice sąsiedztwa (CSR) z wierszy users/connections"""
+
+    def __init__(self, users: List[Dict[str, Any]], connections: List[Dict[str, Any]]):
+        index = {user["id"]: i for i, user in enumerate(users)}
+        self.names = [user["username"] for user in users]
+        edges = [
+            (index[conn["user1_id"]], index[conn["user2_id"]])
+            for conn in connections
+            if conn["user1_id"] in index and conn["user2_id"] in index
+        ]
+        self._out = self._adjacency(len(users), edges)
+        self._in = self._adjacency(len(users), [(dst, src) for src, dst in edges])
+
+    @staticmethod
+    def _adjacency(size: int, edges: List[Tuple[int, int]]) -> Tuple[array, array]:
+        """Sąsiedzi węzła i to targets[offsets[i]:offsets[i + 1]]"""
+        offsets = array("i", [0]) * (size + 1)
+        for src, _ in edges:
+            offsets[src + 1] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+
+        targets = array("i", [0]) * len(edges)
+        fill = offsets[:-1]
+        for src, dst in edges:
+            targets[fill[src]] = dst
+            fill[src] += 1
+        return offsets, targets
+
+    @staticmethod
+    def _expand(
+        frontier: List[int],
+        adjacency: Tuple[array, array],
+        parents: Dict[int, int],
+        depth: Dict[int, int],
+        other_depth: Dict[int, int],
+    ) -> Tuple[List[int], Optional[int]]:
+        """Rozwija cały poziom BFS; zwraca nowy poziom i najlepszy węzeł spotkania"""
+        offsets, targets = adjacency
+        next_frontier = []
+        meet = None
+        for node in frontier:
+            for neighbor in targets[offsets[node] : offsets[node + 1]]:
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = node
+                depth[neighbor] = depth[node] + 1
+                next_frontier.append(neighbor)
+                if neighbor in other_depth and (
+                    meet is None or other_depth[neighbor] < other_depth[meet]
+                ):
+                    meet = neighbor
+        return next_frontier, meet
+
+    def find_shortest_path(self, start_name: str, end_name: str) -> Optional[List[str]]:
+        """Dwukierunkowy BFS: w przód po krawędziach wychodzących, wstecz po wchodzących"""
+        sources = [i for i, name in enumerate(self.names) if name == start_name]
+        goals = [i for i, name in enumerate(self.names) if name == end_name]
+        if not sources or not goals:
+            return None
+
+        forward_parents = {node: -1 for node in sources}
+        backward_parents = {node: -1 for node in goals}
+        forward_depth = dict.fromkeys(sources, 0)
+        backward_depth = dict.fromkeys(goals, 0)
+        meet = next((node for node in sources if node in backward_depth), None)
+
+        forward, backward = sources, goals
+        while meet is None and forward and backward:
+            # Zawsze rozwijamy mniejszy front
+            if len(forward) <= len(backward):
+                forward, meet = self._expand(
+                    forward, self._out, forward_parents, forward_depth, backward_depth
+                )
+            else:
+                backward, meet = self._expand(
+                    backward, self._in, backward_parents, backward_depth, forward_depth
+                )
+
+        if meet is None:
+            return None
+
+        path = []
+        node = meet
+        while node != -1:
+            path.append(node)
+            node = forward_parents[node]
+        path.reverse()
+        node = backward_parents[meet]
+        while node != -1:
+            path.append(node)
+            node = backward_parents[node]
+        return [self.names[node] for node in path]
+
+
+def select_graph_backend() -> str:
+    """Rozstrzyga GRAPH_BACKEND=auto: Neo4j, jeśli sterownik jest zainstalowany i baza odpowiada"""
+    if GRAPH_BACKEND != "auto":
+        return GRAPH_BACKEND
+    if GraphDatabase is None:
+        logger.info("ℹ️  Brak pakietu neo4j - graf w pamięci")
+        return "memory"
+
+    try:
+        neo4j = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        try:
+            neo4j.driver.verify_connectivity()
+        finally:
+            neo4j.close()
+    except Exception as e:
+        logger.warning(f"⚠️  Neo4j niedostępny ({e}) - graf w pamięci")
+        return "memory"
+    return "neo4j"
+
+
 # 4. Nodes dla LangGraph
 def fetch_users_node(state: PipelineState) -> PipelineState:
     """Pobiera listę użytkowników z bazy MySQL"""
@@ -318,21 +476,25 @@ def create_graph_node(state: PipelineState) -> PipelineState:
         state["graph_error"] = error_msg
         return state
 
+    if state.get("graph_backend") == "memory":
+        logger.info("🧠 Graf w pamięci - budowany przy szukaniu ścieżki, pomijam Neo4j")
+        state["graph_error"] = None
+        return state
+
     neo4j = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
 
     try:
         # Wyczyść bazę
         neo4j.clear_database()
+        neo4j.ensure_schema()
 
         # Stwórz węzły użytkowników
-        logger.info("📍 Tworzę węzły użytkowników...")
-        for user in users:
-            neo4j.create_user_node(user["id"], user["username"])
+        logger.info(f"📍 Tworzę {len(users)} węzłów użytkowników...")
+        neo4j.create_user_nodes(users)
 
         # Stwórz relacje
-        logger.info("🔗 Tworzę relacje między użytkownikami...")
-        for conn in connections:
-            neo4j.create_connection(conn["user1_id"], conn["user2_id"])
+        logger.info(f"🔗 Tworzę {len(connections)} relacji między użytkownikami...")
+        neo4j.create_connections(connections)
 
         state["graph_error"] = None
         logger.info("✅ Graf utworzony pomyślnie")
@@ -358,10 +520,13 @@ def find_path_node(state: PipelineState) -> PipelineState:
         state["result"] = ""
         return state
 
-    neo4j = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+    if state.get("graph_backend") == "memory":
+        graph = InMemoryGraph(state.get("users", []), state.get("connections", []))
+    else:
+        graph = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
 
     try:
-        path = neo4j.find_shortest_path("Rafał", "Barbara")
+        path = graph.find_shortest_path("Rafał", "Barbara")
 
         if path:
             state["shortest_path"] = path
@@ -377,7 +542,8 @@ def find_path_node(state: PipelineState) -> PipelineState:
         state["shortest_path"] = []
         state["result"] = ""
     finally:
-        neo4j.close()
+        if isinstance(graph, Neo4jConnection):
+            graph.close()
 
     return state
 
@@ -450,21 +616,25 @@ def main() -> None:
     print(f"🚀 Używam silnika: {ENGINE}")
     print(f"🌐 API URL: {APIDB_URL}")
     print(f"🔗 Neo4j URI: {NEO4J_URI}")
+
+    graph_backend = select_graph_backend()
+    print(f"🕸️  Silnik grafu: {graph_backend}")
     print("Startuje pipeline...\n")
 
-    try:
-        # Sprawdź połączenie z Neo4j
-        neo4j = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
-        neo4j.close()
-        logger.info("✅ Połączono z Neo4j")
-    except Exception as e:
-        logger.error(f"❌ Nie można połączyć się z Neo4j: {e}")
-        logger.error("Upewnij się, że Neo4j jest uruchomiony")
-        sys.exit(1)
+    if graph_backend == "neo4j":
+        try:
+            # Sprawdź połączenie z Neo4j
+            neo4j = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+            neo4j.close()
+            logger.info("✅ Połączono z Neo4j")
+        except Exception as e:
+            logger.error(f"❌ Nie można połączyć się z Neo4j: {e}")
+            logger.error("Upewnij się, że Neo4j jest uruchomiony")
+            sys.exit(1)
 
     try:
         graph = build_graph()
-        result: PipelineState = graph.invoke({})
+        result: PipelineState = graph.invoke({"graph_backend": graph_backend})
 
         if result.get("result"):
             print(f"\n🎉 Zadanie zakończone! Najkrótsza ścieżka: {result['result']}")
@@ -18,6 +18,8 @@ import requests
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 
+import llm_gateway
+
 # Konfiguracja loggera
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -249,9 +251,7 @@ Be biased towards suggesting an action rather than SKIP.
 Return ONLY one word: REPAIR, BRIGHTEN, DARKEN, or SKIP"""
 
     if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = llm_gateway.get_openai_client("openai")
 
         messages = [
             {
@@ -269,24 +269,13 @@ Return ONLY one word: REPAIR, BRIGHTEN, DARKEN, or SKIP"""
         action = response.choices[0].message.content.strip().upper()
 
     elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
         # Claude może wymagać base64
         if not image_base64:
             image_base64 = download_image_as_base64(image_url)
             if not image_base64:
                 return "SKIP"
 
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
+        client = llm_gateway.get_anthropic_client()
 
         messages = [
             {
@@ -311,17 +300,13 @@ Return ONLY one word: REPAIR, BRIGHTEN, DARKEN, or SKIP"""
         action = response.content[0].text.strip().upper()
 
     elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
         # Pobierz zdjęcie
         if not image_base64:
             image_base64 = download_image_as_base64(image_url)
             if not image_base64:
                 return "SKIP"
 
-        model = genai.GenerativeModel(VISION_MODEL)
+        model = llm_gateway.get_gemini_model(VISION_MODEL)
 
         # Konwertuj base64 na bytes
         import base64
@@ -335,20 +320,7 @@ Return ONLY one word: REPAIR, BRIGHTEN, DARKEN, or SKIP"""
 
     else:  # lmstudio, anything
         # Dla modeli lokalnych zakładamy że obsługują format OpenAI
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
+        client = llm_gateway.get_openai_client(ENGINE)
 
         # Pobierz obraz jako base64
         if not image_base64:
@@ -404,9 +376,7 @@ Only return 'SKIP' if there is absolutely NO person visible in the image.
 Be thorough and descriptive even if the image quality is not perfect."""
 
     if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = llm_gateway.get_openai_client("openai")
 
         messages = [
             {
@@ -424,23 +394,12 @@ Be thorough and descriptive even if the image quality is not perfect."""
         description = response.choices[0].message.content.strip()
 
     elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
         if not image_base64:
             image_base64 = download_image_as_base64(image_url)
             if not image_base64:
                 return None
 
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
+        client = llm_gateway.get_anthropic_client()
 
         messages = [
             {
@@ -465,16 +424,12 @@ Be thorough and descriptive even if the image quality is not perfect."""
         description = response.content[0].text.strip()
 
     elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
         if not image_base64:
             image_base64 = download_image_as_base64(image_url)
             if not image_base64:
                 return None
 
-        model = genai.GenerativeModel(VISION_MODEL)
+        model = llm_gateway.get_gemini_model(VISION_MODEL)
 
         import base64
 
@@ -486,19 +441,7 @@ Be thorough and descriptive even if the image quality is not perfect."""
         description = response.text.strip()
 
     else:  # lmstudio, anything
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-        client = OpenAI(api_key=api_key, base_url=base_url)
+        client = llm_gateway.get_openai_client(ENGINE)
 
         # Pobierz obraz jako base64
         if not image_base64:
@@ -540,9 +483,7 @@ def translate_to_polish(text: str) -> str:
     prompt = f"Translate the following description to Polish, maintaining all details:\n\n{text}"
 
     if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = llm_gateway.get_openai_client("openai")
         response = client.chat.completions.create(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
@@ -551,18 +492,7 @@ def translate_to_polish(text: str) -> str:
         return response.choices[0].message.content.strip()
 
     elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
+        client = llm_gateway.get_anthropic_client()
         response = client.messages.create(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
@@ -572,28 +502,12 @@ def translate_to_polish(text: str) -> str:
         return response.content[0].text.strip()
 
     elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
+        model = llm_gateway.get_gemini_model(MODEL_NAME)
         response = model.generate_content([prompt])
         return response.text.strip()
 
     else:  # lmstudio, anything
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
+        client = llm_gateway.get_openai_client(ENGINE)
         response = client.chat.completions.create(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
@@ -621,9 +535,7 @@ Stwórz rysopis w formie ciągłego tekstu (nie punktów), skupiając się na:
 Rysopis:"""
 
     if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = llm_gateway.get_openai_client("openai")
         response = client.chat.completions.create(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
@@ -632,18 +544,7 @@ Rysopis:"""
         return response.choices[0].message.content.strip()
 
     elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
+        client = llm_gateway.get_anthropic_client()
         response = client.messages.create(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
@@ -653,28 +554,12 @@ Rysopis:"""
         return response.content[0].text.strip()
 
     elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
+        model = llm_gateway.get_gemini_model(MODEL_NAME)
         response = model.generate_content([prompt])
         return response.text.strip()
 
     else:  # lmstudio, anything
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
+        client = llm_gateway.get_openai_client(ENGINE)
         response = client.chat.completions.create(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
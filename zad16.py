@@ -10,7 +10,6 @@ import logging
 import os
 import sys
 import time
-import zipfile
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
@@ -18,6 +17,8 @@ import requests
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 
+import artifact_fetcher
+
 # Konfiguracja loggera
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -138,28 +139,15 @@ def download_and_extract_data(dest_dir: Path) -> None:
                 logger.info(f"   ✅ Skopiowano {filename}")
         return
 
-    # Jeśli nie ma lokalnych plików, pobierz z URL
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    zip_path = dest_dir / "lab_data.zip"
-
+    # Jeśli nie ma lokalnych plików, pobierz z URL (wspólny cache artefaktów)
     logger.info(f"📥 Pobieranie danych z {LAB_DATA_URL}...")
 
     try:
-        response = requests.get(LAB_DATA_URL, stream=True)
-        response.raise_for_status()
-
-        with open(zip_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        logger.info("📦 Rozpakowywanie archiwum...")
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            # Sprawdź zawartość archiwum
-            file_list = zf.namelist()
-            logger.info(f"   Pliki w archiwum: {file_list}")
-
-            # Rozpakuj wszystko
-            zf.extractall(dest_dir)
+        # Rozpakuj tylko potrzebne pliki (także wariant z literówką incorect.txt)
+        extracted = artifact_fetcher.fetch_and_extract(
+            LAB_DATA_URL, dest_dir, members=expected_files + ["incorect.txt"]
+        )
+        logger.info(f"   Pliki z archiwum: {[str(p.relative_to(dest_dir)) for p in extracted]}")
 
         # Sprawdź czy pliki są w podkatalogu i przenieś je do głównego katalogu
         for subdir in dest_dir.iterdir():
@@ -170,9 +158,6 @@ def download_and_extract_data(dest_dir: Path) -> None:
                         file.rename(target)
                         logger.info(f"   ✅ Przeniesiono {file.name} z {subdir.name}")
 
-        # Usuń archiwum
-        zip_path.unlink()
-
         # Po rozpakowaniu, jeśli brakuje incorrect.txt, a jest incorect.txt, kopiuj/pliku
         incorrect_path = dest_dir / "incorrect.txt"
         incorect_path = dest_dir / "incorect.txt"
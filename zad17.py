@@ -4,22 +4,28 @@ S04E03 - Uniwersalny mechanizm przeszukiwania stron internetowych
 Zadanie: Odpowiedz na pytania centrali przeszukując stronę firmy SoftoAI
 """
 import argparse
+import asyncio
+import heapq
 import json
 import logging
+import math
 import os
 import re
 import sys
-import time
+from collections import Counter
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, TypedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypedDict
 from urllib.parse import urljoin, urlparse
 
+import aiohttp
 import html2text
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 
+import llm_gateway
+
 # Konfiguracja loggera
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -81,6 +87,46 @@ if not all([REPORT_URL, CENTRALA_API_KEY, QUESTIONS_URL, SOFTO_URL]):
     )
     sys.exit(1)
 
+# Crawler: maksymalna głębokość od strony startowej, limit stron na uruchomienie,
+# liczba stron pobieranych równolegle i minimalny odstęp między żądaniami do hosta
+SEARCH_MAX_DEPTH = 10
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "100"))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+CRAWL_HOST_INTERVAL = float(os.getenv("CRAWL_HOST_INTERVAL", "0.25"))
+CRAWL_TIMEOUT = aiohttp.ClientTimeout(total=10)
+PAGE_CONTENT_LIMIT = 4000
+
+# Priorytet linku: głosy select_best_link, kara za głębokość i za wygląd pułapki
+BEST_LINK_BONUS = 10.0
+TRAP_PENALTY = 100.0
+TRAP_PATTERN = re.compile(r"loop|endless|czescizamienne", re.IGNORECASE)
+
+# Lokalny filtr przed LLM: strona trafia do modelu tylko, jeśli ekstraktor
+# znalazł na niej dane typu, o który pyta pytanie, albo BM25 >= progu
+RELEVANCE_FILTER = os.getenv("RELEVANCE_FILTER", "true").lower() in {"1", "true", "yes", "tak"}
+RELEVANCE_MIN_SCORE = float(os.getenv("RELEVANCE_MIN_SCORE", "0.5"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+STEM_LENGTH = 5  # prosty "stemming" polskich odmian: pierwsze litery słowa
+WORD_PATTERN = re.compile(r"[a-ząćęłńóśźż0-9]{3,}", re.IGNORECASE)
+STOPWORDS = {
+    "jaki", "jaka", "jakie", "jakiej", "jest", "podaj", "oraz", "które", "który",
+    "firma", "firmy", "dla", "się", "czy", "jak",
+}
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+URL_PATTERN = re.compile(r"https?://[^\s)\]\"'<>]+")
+ISO_PATTERN = re.compile(r"\bISO(?:/IEC)?[\s/-]*\d{3,5}", re.IGNORECASE)
+
+# Lokalny ranking linków: LLM tylko, gdy przewaga najlepszego linku < LINK_MIN_MARGIN.
+# Wagi (rdzeń pytania : rdzeń linku) uczone z udanych ścieżek i zapisywane na dysku.
+LINK_WEIGHTS_PATH = Path(os.getenv("LINK_WEIGHTS_PATH", ".cache/zad17_link_weights.json"))
+LINK_MIN_MARGIN = float(os.getenv("LINK_MIN_MARGIN", "0.3"))
+LEARNED_WEIGHT = 0.5
+# Wskazówki startowe - te same, które prompt select_best_link podaje modelowi.
+# Waga 0.5 daje LEARNED_WEIGHT * log1p(0.5) ≈ 0.2 < LINK_MIN_MARGIN: sama wskazówka
+# tylko rozstrzyga remisy, nie wybiera linku. Bez "adres" - pytania o adres to nie Kontakt.
+LINK_HINTS = {"mailo:konta": 0.5, "email:konta": 0.5}
+
 
 # Konfiguracja modelu
 if ENGINE == "openai":
@@ -108,76 +154,11 @@ print(f"✅ Model: {MODEL_NAME}")
 
 
 # 2. Inicjalizacja klienta LLM
-def call_llm(prompt: str, temperature: float = 0) -> str:
-    """Uniwersalna funkcja wywołania LLM"""
-
-    if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_URL") or None,
-        )
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
-        resp = client.messages.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=1000,
-        )
-        return resp.content[0].text.strip()
-
-    elif ENGINE in {"lmstudio", "anything"}:
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(
-            [prompt],
-            generation_config={"temperature": temperature, "max_output_tokens": 1000},
-        )
-        return response.text.strip()
+async def call_llm(prompt: str, temperature: float = 0) -> str:
+    """Uniwersalna funkcja wywołania LLM (wspólna pula połączeń z llm_gateway)"""
+    return await llm_gateway.acomplete(
+        prompt, model=MODEL_NAME, engine=ENGINE, temperature=temperature
+    )
 
 
 # 3. Typowanie stanu pipeline
@@ -186,13 +167,21 @@ class SearchState(TypedDict):
 
     question_id: str
     question_text: str
-    current_url: str
-    visited_urls: Set[str]
-    search_depth: int
+    visited_urls: Set[str]  # strony sprawdzone, gdy pytanie było otwarte
     answer: Optional[str]
     found: bool
 
 
+class Page(TypedDict):
+    """Strona pobrana w tym uruchomieniu"""
+
+    url: str
+    html: str
+    markdown: str
+    links: List[Dict[str, str]]
+    etag: Optional[str]
+
+
 class PipelineState(TypedDict, total=False):
     questions: Dict[str, str]
     search_states: Dict[str, SearchState]
@@ -216,17 +205,6 @@ def fetch_questions() -> Optional[Dict[str, str]]:
         return None
 
 
-def fetch_webpage(url: str) -> Optional[str]:
-    """Pobiera zawartość strony internetowej"""
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.text
-    except Exception as e:
-        logger.error(f"❌ Błąd pobierania strony {url}: {e}")
-        return None
-
-
 def html_to_markdown(html_content: str) -> str:
     """Konwertuje HTML na Markdown"""
     h = html2text.HTML2Text()
@@ -262,30 +240,65 @@ def extract_links(html_content: str, base_url: str) -> List[Dict[str, str]]:
     return links
 
 
-def check_for_answer(content: str, question: str) -> Optional[str]:
-    """Sprawdza czy strona zawiera odpowiedź na pytanie"""
-    prompt = f"""Przeanalizuj poniższą treść strony i odpowiedz czy zawiera ona odpowiedź na pytanie.
+class HostRateLimiter:
+    """Minimalny odstęp między kolejnymi żądaniami do tego samego hosta"""
 
-Pytanie: {question}
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
 
-Treść strony:
-{content[:4000]}  # Ograniczenie długości
+    async def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        await asyncio.sleep(slot - now)
 
-Instrukcje:
-1. Jeśli strona zawiera konkretną odpowiedź na pytanie, zwróć TYLKO tę odpowiedź (bez dodatkowych wyjaśnień).
-2. Jeśli strona nie zawiera odpowiedzi, zwróć dokładnie: "BRAK ODPOWIEDZI"
 
-Odpowiedź:"""
+class PageStore:
+    """Strony pobrane w tym uruchomieniu: URL -> HTML, Markdown, linki, ETag.
+    Każda strona jest pobierana i parsowana raz, niezależnie od liczby pytań."""
 
-    response = call_llm(prompt)
+    def __init__(self, session: aiohttp.ClientSession, limiter: HostRateLimiter) -> None:
+        self._pages: Dict[str, Optional[Page]] = {}
+        self._session = session
+        self._limiter = limiter
 
-    if "BRAK ODPOWIEDZI" in response.upper():
-        return None
+    def __len__(self) -> int:
+        return len(self._pages)
 
-    # Oczyść odpowiedź z niepotrzebnych elementów
-    answer = response.strip()
+    async def get(self, url: str) -> Optional[Page]:
+        if url not in self._pages:
+            self._pages[url] = await self._fetch(url)
+        return self._pages[url]
 
-    # Usuń typowe prefiksy
+    async def _fetch(self, url: str) -> Optional[Page]:
+        await self._limiter.wait(url)
+        logger.info(f"📄 Pobieram stronę: {url}")
+        try:
+            async with self._session.get(url) as response:
+                response.raise_for_status()
+                html_content = await response.text()
+                etag = response.headers.get("ETag")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"❌ Błąd pobierania strony {url}: {e}")
+            return None
+
+        # Parsowanie w wątku - nie blokuje pozostałych pobrań
+        markdown, links = await asyncio.gather(
+            asyncio.to_thread(html_to_markdown, html_content),
+            asyncio.to_thread(extract_links, html_content, url),
+        )
+        logger.info(f"🔗 Znaleziono {len(links)} linków na {url}")
+        return Page(url=url, html=html_content, markdown=markdown, links=links, etag=etag)
+
+
+def _clean_answer(answer: str) -> str:
+    """Usuwa typowe prefiksy z odpowiedzi modelu"""
+    answer = answer.strip()
     prefixes_to_remove = [
         "Odpowiedź na pytanie to:",
         "Odpowiedź:",
@@ -302,8 +315,79 @@ Odpowiedź:"""
     return answer
 
 
-def select_best_link(
-    links: List[Dict[str, str]], question: str, visited_urls: Set[str]
+async def check_for_answer(content: str, question: str) -> Optional[str]:
+    """Sprawdza czy strona zawiera odpowiedź na pytanie"""
+    prompt = f"""Przeanalizuj poniższą treść strony i odpowiedz czy zawiera ona odpowiedź na pytanie.
+
+Pytanie: {question}
+
+Treść strony:
+{content[:PAGE_CONTENT_LIMIT]}
+
+Instrukcje:
+1. Jeśli strona zawiera konkretną odpowiedź na pytanie, zwróć TYLKO tę odpowiedź (bez dodatkowych wyjaśnień).
+2. Jeśli strona nie zawiera odpowiedzi, zwróć dokładnie: "BRAK ODPOWIEDZI"
+
+Odpowiedź:"""
+
+    response = await call_llm(prompt)
+
+    if "BRAK ODPOWIEDZI" in response.upper():
+        return None
+
+    # Oczyść odpowiedź z niepotrzebnych elementów
+    return _clean_answer(response)
+
+
+async def check_for_answers(content: str, questions: Dict[str, str]) -> Dict[str, str]:
+    """Sprawdza jednym zapytaniem, na które z pytań strona zawiera odpowiedź"""
+    if len(questions) == 1:
+        q_id, question = next(iter(questions.items()))
+        answer = await check_for_answer(content, question)
+        return {q_id: answer} if answer else {}
+
+    prompt = f"""Przeanalizuj poniższą treść strony i sprawdź, na które z pytań zawiera ona odpowiedź.
+
+Pytania (identyfikator: pytanie):
+{json.dumps(questions, ensure_ascii=False, indent=2)}
+
+Treść strony:
+{content[:PAGE_CONTENT_LIMIT]}
+
+Instrukcje:
+1. Zwróć TYLKO obiekt JSON, którego kluczami są identyfikatory pytań.
+2. Jeśli strona zawiera konkretną odpowiedź na pytanie, wartością jest TYLKO ta odpowiedź (bez dodatkowych wyjaśnień).
+3. Jeśli strona nie zawiera odpowiedzi na pytanie, wartością jest null.
+
+JSON:"""
+
+    response = await call_llm(prompt)
+    match = re.search(r"\{.*\}", response, re.DOTALL)
+    try:
+        parsed = json.loads(match.group()) if match else None
+    except json.JSONDecodeError:
+        parsed = None
+    if not isinstance(parsed, dict):
+        # Model nie zwrócił JSON - sprawdzamy pytania pojedynczo
+        logger.warning("⚠️  Niepoprawny JSON z modelu - sprawdzam pytania osobno")
+        found = await asyncio.gather(*(check_for_answer(content, q) for q in questions.values()))
+        return {q_id: answer for q_id, answer in zip(questions, found) if answer}
+
+    answers = {}
+    for q_id in questions:
+        answer = parsed.get(q_id)
+        if isinstance(answer, (str, int, float)) and "BRAK ODPOWIEDZI" not in str(answer).upper():
+            answer = _clean_answer(str(answer))
+            if answer:
+                answers[q_id] = answer
+    return answers
+
+
+async def select_best_link(
+    links: List[Dict[str, str]],
+    question: str,
+    visited_urls: Set[str],
+    scorer: Optional["LinkScorer"] = None,
 ) -> Optional[str]:
     """Wybiera najlepszy link do dalszego przeszukiwania"""
     # Filtruj odwiedzone linki
@@ -312,6 +396,13 @@ def select_best_link(
     if not unvisited_links:
         return None
 
+    # Najpierw lokalny ranking - LLM tylko przy niepewnym wyniku
+    if scorer:
+        choice = scorer.choose(question, unvisited_links)
+        if choice:
+            return choice
+        unvisited_links = [link for link in unvisited_links if not is_trap(link)] or unvisited_links
+
     # Przygotuj listę linków dla LLM
     links_text = "\n".join(
         [
@@ -333,7 +424,7 @@ Który link najprawdopodobniej doprowadzi do odpowiedzi? Rozważ:
 
 Zwróć TYLKO numer linku (np. "3") bez żadnych dodatkowych wyjaśnień."""
 
-    response = call_llm(prompt)
+    response = await call_llm(prompt)
 
     # Wyciągnij numer
     try:
@@ -363,9 +454,7 @@ def fetch_questions_node(state: PipelineState) -> PipelineState:
         search_states[q_id] = SearchState(
             question_id=q_id,
             question_text=q_text,
-            current_url=SOFTO_URL,
             visited_urls=set(),
-            search_depth=0,
             answer=None,
             found=False,
         )
@@ -376,77 +465,363 @@ def fetch_questions_node(state: PipelineState) -> PipelineState:
     return state
 
 
-def search_answers_node(state: PipelineState) -> PipelineState:
-    """Przeszukuje strony w poszukiwaniu odpowiedzi"""
-    search_states = state.get("search_states", {})
-    answers = state.get("answers", {})
-
-    max_depth = 10  # Maksymalna głębokość przeszukiwania
-
-    for q_id, search_state in search_states.items():
-        if search_state["found"]:
-            continue
-
-        logger.info(
-            f"\n🔍 Szukam odpowiedzi na pytanie {q_id}: {search_state['question_text']}"
-        )
+def _stems(text: str) -> List[str]:
+    words = (word.lower() for word in WORD_PATTERN.findall(text))
+    return [word[:STEM_LENGTH] for word in words if word not in STOPWORDS]
+
+
+def _has_external_url(page: Page) -> bool:
+    host = urlparse(page["url"]).netloc
+    return any(urlparse(url).netloc != host for url in URL_PATTERN.findall(page["markdown"]))
+
+
+# Ekstraktory: (wzorzec pytania, czy strona zawiera dane tego typu)
+ANSWER_EXTRACTORS: List[Tuple[re.Pattern, Callable[[Page], bool]]] = [
+    (
+        re.compile(r"e-?mail|mailow", re.IGNORECASE),
+        lambda page: bool(EMAIL_PATTERN.search(page["markdown"])),
+    ),
+    (
+        re.compile(r"\bcertyfikat|\biso\b", re.IGNORECASE),
+        lambda page: bool(ISO_PATTERN.search(page["markdown"])),
+    ),
+    (
+        re.compile(r"\badres\w* (?:www|url|interfejs|stron)|\burl\b|\blink", re.IGNORECASE),
+        _has_external_url,
+    ),
+]
+
+# Etap filtra: True = do LLM, False = pomiń, None = brak zdania (decyduje kolejny etap)
+RelevanceCheck = Callable[[str, Page], Optional[bool]]
+
+
+class RelevanceFilter:
+    """Tani lokalny etap przed check_for_answers: ekstraktory regex, potem BM25
+    pytanie ↔ Markdown strony (statystyki z dotychczas pobranych stron)"""
+
+    def __init__(
+        self,
+        checks: Optional[List[RelevanceCheck]] = None,
+        min_score: float = RELEVANCE_MIN_SCORE,
+    ) -> None:
+        self.checks = checks if checks is not None else [self.extractor_check, self.bm25_check]
+        self.min_score = min_score
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_freq: Counter = Counter()
+        self._total_length = 0
+
+    def add(self, page: Page) -> None:
+        if page["url"] in self._doc_terms:
+            return
+        terms = Counter(_stems(page["markdown"]))
+        self._doc_terms[page["url"]] = terms
+        self._doc_freq.update(terms.keys())
+        self._total_length += sum(terms.values())
+
+    def bm25(self, question: str, page: Page) -> float:
+        self.add(page)
+        terms = self._doc_terms[page["url"]]
+        length = sum(terms.values())
+        count = len(self._doc_terms)
+        avg_length = self._total_length / count or 1
+        score = 0.0
+        for stem in set(_stems(question)):
+            tf = terms.get(stem, 0)
+            if not tf:
+                continue
+            df = self._doc_freq[stem]
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (
+                tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            )
+        return score
+
+    @staticmethod
+    def extractor_check(question: str, page: Page) -> Optional[bool]:
+        """Pytanie o e-mail / certyfikat / adres - strona musi zawierać dane tego typu"""
+        for question_pattern, page_has_data in ANSWER_EXTRACTORS:
+            if question_pattern.search(question):
+                return page_has_data(page)
+        return None
 
-        while search_state["search_depth"] < max_depth and not search_state["found"]:
-            current_url = search_state["current_url"]
+    def bm25_check(self, question: str, page: Page) -> Optional[bool]:
+        return self.bm25(question, page) >= self.min_score
+
+    def candidates(self, questions: Dict[str, str], page: Page) -> Dict[str, str]:
+        """Pytania, dla których strona jest warta sprawdzenia przez LLM"""
+        self.add(page)
+        selected = {}
+        for q_id, question in questions.items():
+            decision = next(
+                (d for d in (check(question, page) for check in self.checks) if d is not None),
+                True,
+            )
+            if decision:
+                selected[q_id] = question
+        return selected
 
-            # Sprawdź czy już odwiedziliśmy tę stronę
-            if current_url in search_state["visited_urls"]:
-                logger.warning(f"⚠️  Strona już odwiedzona: {current_url}")
-                break
 
-            logger.info(f"📄 Pobieram stronę: {current_url}")
+class LinkScorer:
+    """Lokalny ranking linków: podobieństwo anchor/URL do pytania, czarna lista pułapek
+    i wagi par (rdzeń pytania, rdzeń linku) wyuczone z udanych ścieżek"""
 
-            # Pobierz stronę
-            html_content = fetch_webpage(current_url)
-            if not html_content:
-                break
+    def __init__(self, path: Path = LINK_WEIGHTS_PATH, min_margin: float = LINK_MIN_MARGIN) -> None:
+        self.path = path
+        self.min_margin = min_margin
+        self.weights: Dict[str, float] = {**LINK_HINTS, **self._load()}
+        self._learned = False
 
-            # Oznacz jako odwiedzoną
-            search_state["visited_urls"].add(current_url)
+    def _load(self) -> Dict[str, float]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        if not self._learned:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.weights, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+        logger.info(f"💾 Zapisano wagi linków: {self.path}")
+
+    @staticmethod
+    def _link_stems(link: Dict[str, str]) -> Set[str]:
+        return set(_stems(f"{link['text']} {urlparse(link['url']).path}"))
+
+    def score(self, question: str, link: Dict[str, str]) -> float:
+        if is_trap(link):
+            return float("-inf")
+        question_stems = set(_stems(question))
+        link_stems = self._link_stems(link)
+        if not question_stems or not link_stems:
+            return 0.0
+
+        similarity = len(question_stems & link_stems) / math.sqrt(
+            len(question_stems) * len(link_stems)
+        )
+        learned = sum(
+            self.weights.get(f"{question_stem}:{link_stem}", 0.0)
+            for question_stem in question_stems
+            for link_stem in link_stems
+        )
+        return similarity + LEARNED_WEIGHT * math.log1p(learned)
 
-            # Konwertuj na Markdown
-            markdown_content = html_to_markdown(html_content)
+    def choose(self, question: str, links: List[Dict[str, str]]) -> Optional[str]:
+        """Najlepszy link, jeśli wynik jest pewny; None = remis lub brak sygnału (decyduje LLM)"""
+        ranked = sorted(
+            ((self.score(question, link), link["url"]) for link in links), reverse=True
+        )
+        ranked = [(score, url) for score, url in ranked if score != float("-inf")]
+        if not ranked:
+            return None
+        if len(ranked) == 1:
+            return ranked[0][1]
+
+        (best, url), (second, _) = ranked[0], ranked[1]
+        if best > 0 and best - second >= self.min_margin:
+            logger.debug(f"🧭 Link wybrany lokalnie ({best:.2f} vs {second:.2f}): {url}")
+            return url
+        return None
 
-            # Sprawdź czy jest odpowiedź
-            answer = check_for_answer(markdown_content, search_state["question_text"])
+    def learn(self, question: str, path: List[Dict[str, str]]) -> None:
+        """Wzmacnia pary rdzeni dla linków ścieżki, która doprowadziła do odpowiedzi"""
+        question_stems = set(_stems(question))
+        for link in path:
+            for link_stem in self._link_stems(link):
+                for question_stem in question_stems:
+                    key = f"{question_stem}:{link_stem}"
+                    self.weights[key] = self.weights.get(key, 0.0) + 1.0
+        self._learned = self._learned or bool(path)
+
+
+def _open_questions(search_states: Dict[str, SearchState]) -> Dict[str, str]:
+    return {
+        q_id: search_state["question_text"]
+        for q_id, search_state in search_states.items()
+        if not search_state["found"]
+    }
+
+
+def is_trap(link: Dict[str, str]) -> bool:
+    return bool(TRAP_PATTERN.search(link["url"]) or TRAP_PATTERN.search(link["text"]))
+
+
+def link_priority(link: Dict[str, str], depth: int, votes: int) -> float:
+    """Priorytet linku we froncie: wybory select_best_link w górę, głębokość i pułapki w dół"""
+    score = votes * BEST_LINK_BONUS - depth
+    if is_trap(link):
+        score -= TRAP_PENALTY
+    return score
+
+
+class Crawler:
+    """Równoległy crawler z priorytetowym frontem: każda strona pobierana raz
+    i sprawdzana raz pod kątem wszystkich otwartych pytań"""
+
+    def __init__(
+        self,
+        store: PageStore,
+        search_states: Dict[str, SearchState],
+        answers: Dict[str, str],
+        relevance: Optional[RelevanceFilter] = None,
+        scorer: Optional[LinkScorer] = None,
+    ) -> None:
+        self.store = store
+        self.search_states = search_states
+        self.answers = answers
+        self.relevance = relevance
+        self.scorer = scorer
+        self._frontier: List[Tuple[float, int, str, int]] = []
+        self._best: Dict[str, float] = {}
+        self._parents: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        self._scheduled: Set[str] = set()
+        self._counter = 0
+
+    def _push(
+        self, url: str, depth: int, score: float, parent: Optional[Tuple[str, Dict[str, str]]] = None
+    ) -> None:
+        # Link może trafić do frontu ponownie z wyższym priorytetem - stary wpis zostanie pominięty
+        if url in self._scheduled or score <= self._best.get(url, float("-inf")):
+            return
+        self._best[url] = score
+        if parent:
+            self._parents[url] = parent
+        self._counter += 1
+        heapq.heappush(self._frontier, (-score, self._counter, url, depth))
+
+    def _pop(self) -> Optional[Tuple[str, int]]:
+        while self._frontier:
+            _, _, url, depth = heapq.heappop(self._frontier)
+            if url not in self._scheduled:
+                self._scheduled.add(url)
+                return url, depth
+        return None
 
-            if answer:
-                logger.info(f"✅ Znaleziono odpowiedź: {answer}")
-                search_state["answer"] = answer
-                search_state["found"] = True
-                answers[q_id] = answer
+    def _path_to(self, url: str) -> List[Dict[str, str]]:
+        """Linki kliknięte od strony startowej do url"""
+        path = []
+        while url in self._parents and len(path) < SEARCH_MAX_DEPTH:
+            url, link = self._parents[url]
+            path.append(link)
+        return path[::-1]
+
+    async def _check_page(self, page: Page) -> None:
+        """Sprawdza stronę pod kątem wszystkich pytań, które nie mają jeszcze odpowiedzi"""
+        open_questions = _open_questions(self.search_states)
+        if not open_questions:
+            return
+        for q_id in open_questions:
+            self.search_states[q_id]["visited_urls"].add(page["url"])
+
+        candidates = (
+            self.relevance.candidates(open_questions, page) if self.relevance else open_questions
+        )
+        if not candidates:
+            logger.info(f"⏭️  {page['url']}: filtr lokalny - brak kandydatów, pomijam LLM")
+            return
+
+        found = await check_for_answers(page["markdown"], candidates)
+        for q_id, answer in found.items():
+            search_state = self.search_states[q_id]
+            if search_state["found"]:
+                continue  # odpowiedź znaleziona równolegle na innej stronie
+            logger.info(f"✅ Znaleziono odpowiedź na pytanie {q_id}: {answer}")
+            search_state["answer"] = answer
+            search_state["found"] = True
+            self.answers[q_id] = answer
+            if self.scorer:
+                self.scorer.learn(search_state["question_text"], self._path_to(page["url"]))
+        if not found:
+            logger.info(f"❌ Brak odpowiedzi na stronie {page['url']}")
+
+    async def _score_links(
+        self, page: Page, depth: int
+    ) -> List[Tuple[Dict[str, str], float]]:
+        """Ocena linków strony: każde otwarte pytanie głosuje przez select_best_link"""
+        links = [link for link in page["links"] if link["url"] not in self._scheduled]
+        open_questions = _open_questions(self.search_states)
+        if not links or not open_questions:
+            return []
+
+        choices = await asyncio.gather(
+            *(
+                select_best_link(links, question, self._scheduled, self.scorer)
+                for question in open_questions.values()
+            )
+        )
+        scored: Dict[str, Tuple[Dict[str, str], float]] = {}
+        for link in links:
+            score = link_priority(link, depth, choices.count(link["url"]))
+            if link["url"] not in scored or score > scored[link["url"]][1]:
+                scored[link["url"]] = (link, score)
+        return list(scored.values())
+
+    async def _visit(
+        self, url: str, depth: int
+    ) -> Tuple[str, int, List[Tuple[Dict[str, str], float]]]:
+        page = await self.store.get(url)
+        if not page:
+            return url, depth, []
+        await self._check_page(page)
+        if depth + 1 >= SEARCH_MAX_DEPTH:
+            return url, depth, []
+        return url, depth, await self._score_links(page, depth + 1)
+
+    async def run(self, start_url: str) -> None:
+        self._push(start_url, 0, 0.0)
+        in_flight: Set[asyncio.Task] = set()
+
+        while _open_questions(self.search_states):
+            while len(in_flight) < CRAWL_CONCURRENCY and len(self._scheduled) < CRAWL_MAX_PAGES:
+                next_item = self._pop()
+                if next_item is None:
+                    break
+                url, depth = next_item
+                logger.info(f"➡️  Kolejka: {url} (głębokość {depth})")
+                in_flight.add(asyncio.create_task(self._visit(url, depth)))
+
+            if not in_flight:
                 break
 
-            # Jeśli nie ma odpowiedzi, wybierz następny link
-            logger.info("❌ Brak odpowiedzi na tej stronie")
-
-            # Wyciągnij linki
-            links = extract_links(html_content, current_url)
-            logger.info(f"🔗 Znaleziono {len(links)} linków")
-
-            # Wybierz najlepszy link
-            next_url = select_best_link(
-                links, search_state["question_text"], search_state["visited_urls"]
-            )
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, depth, scored = task.result()
+                for link, score in scored:
+                    self._push(link["url"], depth + 1, score, parent=(url, link))
+
+        # Wszystkie pytania mają odpowiedź - pozostałe pobrania są zbędne
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+async def crawl(search_states: Dict[str, SearchState], answers: Dict[str, str]) -> int:
+    """Przeszukuje serwis od SOFTO_URL; zwraca liczbę pobranych stron"""
+    connector = aiohttp.TCPConnector(limit=CRAWL_CONCURRENCY)
+    async with aiohttp.ClientSession(timeout=CRAWL_TIMEOUT, connector=connector) as session:
+        store = PageStore(session, HostRateLimiter(CRAWL_HOST_INTERVAL))
+        relevance = RelevanceFilter() if RELEVANCE_FILTER else None
+        scorer = LinkScorer()
+        try:
+            await Crawler(store, search_states, answers, relevance, scorer).run(SOFTO_URL)
+        finally:
+            scorer.save()
+        return len(store)
 
-            if not next_url:
-                logger.warning("⚠️  Brak więcej linków do sprawdzenia")
-                break
 
-            logger.info(f"➡️  Przechodzę do: {next_url}")
-            search_state["current_url"] = next_url
-            search_state["search_depth"] += 1
+def search_answers_node(state: PipelineState) -> PipelineState:
+    """Przeszukuje strony w poszukiwaniu odpowiedzi"""
+    search_states = state.get("search_states", {})
+    answers = state.get("answers", {})
 
-            # Krótka przerwa aby nie przeciążać serwera
-            time.sleep(0.5)
+    pages = llm_gateway.run(crawl(search_states, answers))
 
+    for q_id, search_state in search_states.items():
         if not search_state["found"]:
             logger.warning(f"⚠️  Nie znaleziono odpowiedzi na pytanie {q_id}")
+    logger.info(f"📦 Pobrano {pages} stron dla {len(search_states)} pytań")
 
     state["answers"] = answers
     return state
@@ -5,6 +5,7 @@ Multi-engine: openai, lmstudio, anything, gemini, claude
 Automatyczne uruchomienie webhook API z ngrok exposure
 """
 import argparse
+import asyncio
 import json
 import logging
 import os
@@ -25,6 +26,8 @@ from fastapi import FastAPI, HTTPException
 from langgraph.graph import END, START, StateGraph
 from pydantic import BaseModel
 
+import llm_gateway
+
 # Konfiguracja loggera
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -107,6 +110,10 @@ elif ENGINE == "anything":
 
 print(f"✅ Model: {MODEL_NAME}")
 
+# Maks. liczba równoległych zapytań LLM z webhooka (chroni lokalne modele przed zalaniem)
+WEBHOOK_LLM_CONCURRENCY = int(os.getenv("WEBHOOK_LLM_CONCURRENCY", "8"))
+_llm_slots = asyncio.Semaphore(WEBHOOK_LLM_CONCURRENCY)
+
 
 # 2. Inicjalizacja klienta LLM
 def clean_llm_response(response: str) -> str:
@@ -158,92 +165,27 @@ def clean_llm_response(response: str) -> str:
     return response.strip()
 
 
-def call_llm(prompt: str, temperature: float = 0) -> str:
-    """Uniwersalna funkcja wywołania LLM"""
-
-    if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_URL") or None,
-        )
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        response = resp.choices[0].message.content.strip()
-
-    elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
+async def call_llm(prompt: str, temperature: float = 0) -> str:
+    """Uniwersalna funkcja wywołania LLM (asynchronicznie - nie blokuje pętli zdarzeń serwera)"""
+    if ENGINE not in {"lmstudio", "anything"}:
+        async with _llm_slots:
+            return await llm_gateway.acomplete(
+                prompt, model=MODEL_NAME, engine=ENGINE, temperature=temperature
             )
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
-        resp = client.messages.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=1000,
-        )
-        response = resp.content[0].text.strip()
-
-    elif ENGINE in {"lmstudio", "anything"}:
-        from openai import OpenAI
 
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
-
-        # Optymalizacje dla modeli lokalnych z większymi tokenami
-        resp = client.chat.completions.create(
+    # Optymalizacje dla modeli lokalnych z większymi tokenami
+    async with _llm_slots:
+        response = await llm_gateway.acomplete(
+            prompt,
             model=MODEL_NAME,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a precise assistant. Give very short, direct answers. No thinking tags.",
-                },
-                {"role": "user", "content": prompt},
-            ],
+            engine=ENGINE,
             temperature=temperature,
             max_tokens=200,  # Więcej tokenów na bezpieczeństwo
+            system="You are a precise assistant. Give very short, direct answers. No thinking tags.",
             timeout=15.0,  # 15 sekund timeout
         )
-        response = resp.choices[0].message.content.strip()
-
-    elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
-        resp = model.generate_content(
-            [prompt],
-            generation_config={"temperature": temperature, "max_output_tokens": 1000},
-        )
-        response = resp.text.strip()
-
     # Wyczyść odpowiedź z tagów myślenia (szczególnie dla modeli lokalnych)
-    if ENGINE in {"lmstudio", "anything"}:
-        response = clean_llm_response(response)
-
-    return response
+    return clean_llm_response(response)
 
 
 # 3. Mapa i logika drona (skopiowane z drone_navigation_langgraph.py)
@@ -276,7 +218,7 @@ class DroneResponse(BaseModel):
 
 
 # LangGraph nodes dla nawigacji drona
-def parse_instruction_node(state: NavigationState) -> NavigationState:
+async def parse_instruction_node(state: NavigationState) -> NavigationState:
     """Parsuje instrukcję na listę ruchów"""
     instruction = state["instruction"].lower()
 
@@ -320,7 +262,7 @@ Jeśli nie ma żadnych ruchów, zwróć: BRAK"""
     logger.info(f"🤖 Wysyłam do {ENGINE}: {instruction[:50]}...")
 
     try:
-        movements_str = call_llm(prompt)
+        movements_str = await call_llm(prompt)
     except Exception as e:
         logger.error(f"❌ Błąd LLM: {e}")
         # Fallback - spróbuj podstawowego parsowania
@@ -473,7 +415,7 @@ async def drone_navigation(data: DroneInstruction):
             thinking="",
         )
 
-        result = navigation_graph.invoke(initial_state)
+        result = await navigation_graph.ainvoke(initial_state)
 
         logger.info(f"🤔 Thinking:\n{result['thinking']}")
         logger.info(f"📍 Końcowa pozycja: {result['final_position']}")
@@ -494,6 +436,12 @@ async def health_check():
     return {"status": "ok", "engine": ENGINE, "model": MODEL_NAME}
 
 
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """Zamyka pule połączeń LLM związane z pętlą serwera"""
+    await llm_gateway.aclose()
+
+
 # 5. Typowanie stanu pipeline webhook
 class WebhookState(TypedDict, total=False):
     server_process: Optional[subprocess.Popen]
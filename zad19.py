@@ -26,6 +26,8 @@ import re
 
 from PIL import Image
 
+import llm_gateway
+
 # Konfiguracja loggera
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -34,7 +36,6 @@ logger = logging.getLogger(__name__)
 
 # Constants for string deduplication
 IMAGE_PNG_MIME = "image/png"
-LOCALHOST_API_URL = "http://localhost:1234/v1"
 
 # 1. Konfiguracja i wykrywanie silnika
 load_dotenv(override=True)
@@ -297,9 +298,7 @@ in Polish. Look especially for names starting with 'L'.""",
 
 def ocr_with_openai(prompt: str, image_base64: str, attempt: int) -> str:
     """OCR using OpenAI Vision API"""
-    from openai import OpenAI
-
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = llm_gateway.get_openai_client("openai")
 
     # Spróbuj JPEG zamiast PNG dla OpenAI przy kolejnych próbach
     if attempt > 2:
@@ -328,18 +327,7 @@ def ocr_with_openai(prompt: str, image_base64: str, attempt: int) -> str:
 
 def ocr_with_claude(prompt: str, image_base64: str) -> str:
     """OCR using Claude Vision API"""
-    try:
-        from anthropic import Anthropic
-    except ImportError:
-        print(
-            "❌ Musisz zainstalować anthropic: pip install anthropic",
-            file=sys.stderr,
-        )
-        sys.exit(1)
-
-    client = Anthropic(
-        api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-    )
+    client = llm_gateway.get_anthropic_client()
 
     response = client.messages.create(
         model=VISION_MODEL,
@@ -367,10 +355,7 @@ def ocr_with_claude(prompt: str, image_base64: str) -> str:
 
 def ocr_with_gemini(prompt: str, image_base64: str) -> str:
     """OCR using Gemini Vision API"""
-    import google.generativeai as genai
-
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    model = genai.GenerativeModel(VISION_MODEL)
+    model = llm_gateway.get_gemini_model(VISION_MODEL)
 
     image_bytes = base64.b64decode(image_base64)
     response = model.generate_content(
@@ -381,20 +366,7 @@ def ocr_with_gemini(prompt: str, image_base64: str) -> str:
 
 def ocr_with_local_api(prompt: str, image_base64: str) -> str:
     """OCR using local API (LMStudio/Anything)"""
-    from openai import OpenAI
-
-    base_url = (
-        os.getenv("LMSTUDIO_API_URL", LOCALHOST_API_URL)
-        if ENGINE == "lmstudio"
-        else os.getenv("ANYTHING_API_URL", LOCALHOST_API_URL)
-    )
-    api_key = (
-        os.getenv("LMSTUDIO_API_KEY", "local")
-        if ENGINE == "lmstudio"
-        else os.getenv("ANYTHING_API_KEY", "local")
-    )
-
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    client = llm_gateway.get_openai_client(ENGINE)
 
     response = client.chat.completions.create(
         model=VISION_MODEL,
@@ -449,94 +421,19 @@ def ocr_image(
         return ocr_with_local_api(prompt, image_base64)
 
 
-def call_openai_llm(prompt: str, temperature: float) -> str:
-    """Call OpenAI LLM"""
-    from openai import OpenAI
-
-    client = OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        base_url=os.getenv("OPENAI_API_URL") or None,
-    )
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=500,
-    )
-    return resp.choices[0].message.content.strip()
-
-
-def call_claude_llm(prompt: str, temperature: float) -> str:
-    """Call Claude LLM"""
-    try:
-        from anthropic import Anthropic
-    except ImportError:
-        print(
-            "❌ Musisz zainstalować anthropic: pip install anthropic",
-            file=sys.stderr,
-        )
-        sys.exit(1)
-
-    client = Anthropic(
-        api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-    )
-    resp = client.messages.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=1000,
-    )
-    return resp.content[0].text.strip()
-
-
-def call_local_llm(prompt: str, temperature: float) -> str:
-    """Call local LLM (LMStudio/Anything)"""
-    from openai import OpenAI
+# Limity tokenów odpowiedzi per silnik (jak w poprzednich wersjach)
+LLM_MAX_TOKENS = {"openai": 500, "gemini": 500, "claude": 1000, "lmstudio": 1000, "anything": 1000}
 
-    base_url = (
-        os.getenv("LMSTUDIO_API_URL", LOCALHOST_API_URL)
-        if ENGINE == "lmstudio"
-        else os.getenv("ANYTHING_API_URL", LOCALHOST_API_URL)
-    )
-    api_key = (
-        os.getenv("LMSTUDIO_API_KEY", "local")
-        if ENGINE == "lmstudio"
-        else os.getenv("ANYTHING_API_KEY", "local")
-    )
 
-    client = OpenAI(api_key=api_key, base_url=base_url)
-    resp = client.chat.completions.create(
+def call_llm(prompt: str, temperature: float = 0) -> str:
+    """Uniwersalna funkcja wywołania LLM (wspólna pula połączeń z llm_gateway)"""
+    return llm_gateway.complete(
+        prompt,
         model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
+        engine=ENGINE,
         temperature=temperature,
-        max_tokens=1000,
+        max_tokens=LLM_MAX_TOKENS[ENGINE],
     )
-    return resp.choices[0].message.content.strip()
-
-
-def call_gemini_llm(prompt: str, temperature: float) -> str:
-    """Call Gemini LLM"""
-    import google.generativeai as genai
-
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    model = genai.GenerativeModel(MODEL_NAME)
-    response = model.generate_content(
-        [prompt],
-        generation_config={"temperature": temperature, "max_output_tokens": 500},
-    )
-    return response.text.strip()
-
-
-def call_llm(prompt: str, temperature: float = 0) -> str:
-    """Uniwersalna funkcja wywołania LLM"""
-    if ENGINE == "openai":
-        return call_openai_llm(prompt, temperature)
-    elif ENGINE == "claude":
-        return call_claude_llm(prompt, temperature)
-    elif ENGINE in {"lmstudio", "anything"}:
-        return call_local_llm(prompt, temperature)
-    elif ENGINE == "gemini":
-        return call_gemini_llm(prompt, temperature)
 
 
 def get_special_instructions(q_id: str) -> str:
@@ -12,7 +12,6 @@ import logging
 import os
 import re
 import sys
-import zipfile
 from collections import defaultdict
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Set, Tuple, TypedDict
@@ -21,6 +20,9 @@ import requests
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 
+import artifact_fetcher
+import llm_gateway
+
 # Konfiguracja loggera
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -138,93 +140,10 @@ class PipelineState(TypedDict, total=False):
 
 # LLM call function - unified dla wszystkich silników
 def call_llm(prompt: str, temperature: float = 0) -> str:
-    """Uniwersalna funkcja wywołania LLM z optymalnymi ustawieniami"""
-    if ENGINE == "openai":
-        return call_openai_llm(prompt, temperature)
-    elif ENGINE == "claude":
-        return call_claude_llm(prompt, temperature)
-    elif ENGINE in {"lmstudio", "anything"}:
-        return call_local_llm(prompt, temperature)
-    elif ENGINE == "gemini":
-        return call_gemini_llm(prompt, temperature)
-
-
-def call_openai_llm(prompt: str, temperature: float) -> str:
-    """OpenAI LLM call"""
-    from openai import OpenAI
-
-    client = OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        base_url=os.getenv("OPENAI_API_URL") or None,
-    )
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=2000,
-    )
-    return resp.choices[0].message.content.strip()
-
-
-def call_claude_llm(prompt: str, temperature: float) -> str:
-    """Claude LLM call"""
-    try:
-        from anthropic import Anthropic
-    except ImportError:
-        print(
-            "❌ Musisz zainstalować anthropic: pip install anthropic",
-            file=sys.stderr,
-        )
-        sys.exit(1)
-
-    client = Anthropic(
-        api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-    )
-    resp = client.messages.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=2000,
-    )
-    return resp.content[0].text.strip()
-
-
-def call_local_llm(prompt: str, temperature: float) -> str:
-    """Local LLM call (LMStudio/Anything)"""
-    from openai import OpenAI
-
-    base_url = (
-        os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-        if ENGINE == "lmstudio"
-        else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-    )
-    api_key = (
-        os.getenv("LMSTUDIO_API_KEY", "local")
-        if ENGINE == "lmstudio"
-        else os.getenv("ANYTHING_API_KEY", "local")
-    )
-
-    client = OpenAI(api_key=api_key, base_url=base_url)
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=2000,
+    """Uniwersalna funkcja wywołania LLM z optymalnymi ustawieniami (wspólna pula z llm_gateway)"""
+    return llm_gateway.complete(
+        prompt, model=MODEL_NAME, engine=ENGINE, temperature=temperature, max_tokens=2000
     )
-    return resp.choices[0].message.content.strip()
-
-
-def call_gemini_llm(prompt: str, temperature: float) -> str:
-    """Gemini LLM call"""
-    import google.generativeai as genai
-
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    model = genai.GenerativeModel(MODEL_NAME)
-    response = model.generate_content(
-        [prompt],
-        generation_config={"temperature": temperature, "max_output_tokens": 2000},
-    )
-    return response.text.strip()
 
 
 # Helper functions
@@ -245,22 +164,9 @@ def download_and_extract_zip(url: str, dest_dir: Path) -> bool:
         return False
 
     try:
-        dest_dir.mkdir(parents=True, exist_ok=True)
-        zip_path = dest_dir / "download.zip"
-
         logger.info(f"📥 Pobieranie z {url}...")
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-
-        with open(zip_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        logger.info(f"📦 Rozpakowywanie do {dest_dir}...")
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            zf.extractall(dest_dir)
-
-        zip_path.unlink()
+        # Wspólny cache artefaktów: archiwum fabryki pobierane raz dla wszystkich zadań
+        artifact_fetcher.fetch_and_extract(url, dest_dir)
         logger.info("✅ Rozpakowano pomyślnie")
         return True
 
@@ -13,9 +13,10 @@ import time
 from pathlib import Path
 
 import aiohttp
-import requests
 from dotenv import load_dotenv
 
+import llm_gateway
+
 # === ŁADOWANIE KONFIGURACJI Z .ENV ===
 load_dotenv(override=True)
 
@@ -110,90 +111,30 @@ ARXIV_URL = os.getenv("ARXIV_URL")
 TIMEOUT_SECONDS = int(os.getenv("TIMEOUT_SECONDS", "5"))
 
 # === UNIWERSALNA FUNKCJA LLM ===
-def call_llm(prompt: str, temperature: float = 0) -> str:
-    """Uniwersalna funkcja wywołania LLM - zoptymalizowana na szybkość"""
-
-    if ENGINE == "openai":
-        from openai import OpenAI
+async def call_llm(prompt: str, temperature: float = 0) -> str:
+    """Uniwersalna funkcja wywołania LLM - asynchroniczna, nie blokuje pętli zdarzeń"""
+    max_tokens = int(os.getenv("MAX_TOKENS", "100"))
 
-        client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_URL") or None,
-        )
-        resp = client.chat.completions.create(
+    if ENGINE in {"lmstudio", "anything"}:
+        return await llm_gateway.acomplete(
+            prompt,
             model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
+            engine=ENGINE,
             temperature=temperature,
-            max_tokens=int(os.getenv("MAX_TOKENS", "100")),
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print("❌ Musisz zainstalować anthropic: pip install anthropic")
-            exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
-        resp = client.messages.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=int(os.getenv("MAX_TOKENS", "100")),
-        )
-        return resp.content[0].text.strip()
-
-    elif ENGINE in {"lmstudio", "anything"}:
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        }
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": temperature,
-            "max_tokens": int(os.getenv("MAX_TOKENS", "100")),
-            "stream": False,
-            "top_p": 0.9,
-            "frequency_penalty": 0,
-            "presence_penalty": 0,
-        }
-        resp = requests.post(
-            f"{base_url.rstrip('/')}/chat/completions",
-            json=payload,
-            headers=headers,
+            max_tokens=max_tokens,
+            top_p=0.9,
+            frequency_penalty=0,
+            presence_penalty=0,
             timeout=TIMEOUT_SECONDS,
         )
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"].strip()
-
-    elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(
-            [prompt],
-            generation_config={
-                "temperature": temperature, 
-                "max_output_tokens": int(os.getenv("MAX_TOKENS", "100"))
-            },
-        )
-        return response.text.strip()
+
+    return await llm_gateway.acomplete(
+        prompt,
+        model=MODEL_NAME,
+        engine=ENGINE,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
 
 
 # === RESZTA KODU ===
@@ -260,7 +201,7 @@ Odpowiedz TYLKO w formacie JSON:
 HTML (fragment):
 {html_content[:8000]}"""
 
-        result_text = call_llm(prompt, temperature=0)
+        result_text = await call_llm(prompt, temperature=0)
         print(f"🤖 LLM ({ENGINE}) odpowiedź: {result_text}")
 
         # Parsuj JSON z odpowiedzi
@@ -437,4 +378,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    llm_gateway.run(main())
\ No newline at end of file
@@ -17,15 +17,12 @@ import sys
 import threading
 import time
 from io import BytesIO
-from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
 import cv2
 import numpy as np
 import requests
 import uvicorn
-# Audio/Vision imports
-import whisper
 from dotenv import load_dotenv
 # FastAPI imports
 from fastapi import FastAPI, HTTPException, Request
@@ -33,6 +30,9 @@ from langgraph.graph import END, START, StateGraph
 from PIL import Image
 from pydantic import BaseModel
 
+import llm_gateway
+import whisper_service
+
 # Konfiguracja loggera
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -121,11 +121,8 @@ elif ENGINE == "anything":
 print(f"✅ Model: {MODEL_NAME}")
 print(f"🔍 Vision model: {VISION_MODEL}")
 
-# Whisper model
+# Whisper model (ładowany raz przy pierwszej transkrypcji, transkrypcje cache'owane po hashu nagrania)
 WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
-print(f"🎧 Ładowanie lokalnego modelu Whisper: '{WHISPER_MODEL}'...")
-whisper_model = whisper.load_model(WHISPER_MODEL)
-print("✅ Model Whisper załadowany.\n")
 
 # Stan globalny dla zachowania kontekstu
 conversation_history: List[Dict[str, str]] = []
@@ -143,12 +140,7 @@ def call_llm(
     """Uniwersalna funkcja wywołania LLM z opcjonalną obsługą obrazów"""
 
     if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_URL") or None,
-        )
+        client = llm_gateway.get_openai_client("openai")
 
         model = VISION_MODEL if with_vision else MODEL_NAME
 
@@ -179,18 +171,7 @@ def call_llm(
         return resp.choices[0].message.content.strip()
 
     elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Musisz zainstalować anthropic: pip install anthropic",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
+        client = llm_gateway.get_anthropic_client()
 
         if with_vision and image_data:
             # Claude obsługuje obrazy natywnie
@@ -228,20 +209,7 @@ def call_llm(
         return resp.content[0].text.strip()
 
     elif ENGINE in {"lmstudio", "anything"}:
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
+        client = llm_gateway.get_openai_client(ENGINE)
 
         model = VISION_MODEL if (with_vision and image_data) else MODEL_NAME
 
@@ -263,10 +231,7 @@ def call_llm(
         return resp.choices[0].message.content.strip()
 
     elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(VISION_MODEL if with_vision else MODEL_NAME)
+        model = llm_gateway.get_gemini_model(VISION_MODEL if with_vision else MODEL_NAME)
 
         if with_vision and image_data:
             # Gemini obsługuje obrazy
@@ -298,17 +263,11 @@ def transcribe_audio(audio_url: str) -> str:
         response = requests.get(audio_url, timeout=30)
         response.raise_for_status()
 
-        # Zapisz tymczasowo
-        audio_path = Path("/tmp/audio_temp.mp3")
-        audio_path.write_bytes(response.content)
-
         # Transkrybuj używając Whisper
         logger.info("🎧 Transkrybuję audio...")
-        result = whisper_model.transcribe(str(audio_path), language="pl")
-        transcription = result.get("text", "").strip()
-
-        # Usuń plik tymczasowy
-        audio_path.unlink(missing_ok=True)
+        transcription = whisper_service.transcribe(
+            response.content, language="pl", model_name=WHISPER_MODEL
+        )
 
         logger.info(f"✅ Transkrypcja: {transcription}")
         return transcription
@@ -4,26 +4,31 @@ Enhanced AI Devs Story Solver - Improved Document Analysis with Better Error Han
 Fixed bugs and enhanced search strategies for better question answering
 """
 import argparse
+import hashlib
+import heapq
 import json
 import logging
+import math
 import os
 import re  # FIXED: Missing import
 import sys
-import tempfile
 import zipfile
+import zlib
+from collections import defaultdict
+from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, TypedDict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, TypedDict
 
 import chromadb
-# Document processing
-import fitz  # PyMuPDF for PDFs
 import requests
-import whisper
 from chromadb.config import Settings
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 from sentence_transformers import SentenceTransformer
 
+import llm_gateway
+import media_extract
+
 # Optional advanced processing
 try:
     import pyzipper
@@ -33,13 +38,9 @@ except ImportError:
     HAS_PYZIPPER = False
     print("⚠️  pyzipper not available - some encrypted ZIPs may not be processable")
 
-try:
-    import pytesseract
-    from PIL import Image
-
-    HAS_OCR = True
-except ImportError:
-    HAS_OCR = False
+# PDF, OCR and Whisper live in media_extract so extraction workers stay lightweight
+HAS_OCR = media_extract.HAS_OCR
+if not HAS_OCR:
     print("⚠️  OCR not available - images won't be processed")
 
 # Constants for repeated strings
@@ -52,6 +53,24 @@ UNKNOWN_ANSWER = "nie wiem"
 RAFAL_DEAD = "Rafał nie żyje"
 DEAD_STATUS = "nie żyje"
 
+# BM25 parameters and proximity bonus window (token positions) for the inverted index
+BM25_K1 = 1.5
+BM25_B = 0.75
+PROXIMITY_WINDOW = 12
+PROXIMITY_BONUS = 0.5
+TOKEN_PATTERN = re.compile(r"\w+")
+# Tokens are cut to this prefix on both the index and query side so Polish inflections
+# ("Rafała", "Rafałem") meet the base form ("Rafał")
+STEM_LENGTH = 5
+
+# ZIP general-purpose flag bit 0: member is encrypted
+ZIP_ENCRYPTED_FLAG = 0x1
+# Per-member read failures: bad password/CRC, corrupt deflate stream, unsupported compression
+ZIP_MEMBER_ERRORS = (RuntimeError, ValueError, NotImplementedError, EOFError, OSError, zlib.error, zipfile.BadZipFile)
+
+# ChromaDB storage
+CHROMA_COLLECTION = "enhanced_story_documents"
+
 # Configuration
 load_dotenv(override=True)
 logging.basicConfig(
@@ -59,6 +78,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Bulk ingestion: SentenceTransformer batch size and max chunks per collection.add call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+CHROMA_ADD_BATCH_SIZE = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "1000"))
+
+# Persistent ChromaDB location
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+
+# Parallel extraction (PDF, OCR, Whisper) in worker processes - small cap, sources are mostly small
+EXTRACT_WORKERS = int(
+    os.getenv("EXTRACT_WORKERS", str(min(media_extract.DEFAULT_WORKERS, os.cpu_count() or 1)))
+)
+
 # CLI arguments
 parser = argparse.ArgumentParser(
     description="Enhanced Story Analysis - Document-based Q&A"
@@ -69,6 +100,12 @@ parser.add_argument(
     help="LLM backend to use",
 )
 parser.add_argument("--debug", action="store_true", help="Enable debug output")
+parser.add_argument(
+    "--persist",
+    action="store_true",
+    default=os.getenv("CHROMA_PERSIST", "").lower() in {"1", "true", "yes"},
+    help="Reuse persistent ChromaDB store and skip already ingested sources",
+)
 args = parser.parse_args()
 
 # Engine detection with fallback
@@ -165,93 +202,20 @@ class StoryState(TypedDict, total=False):
 
 # Universal LLM interface
 def call_llm(prompt: str, temperature: float = 0, max_tokens: int = 500) -> str:
-    """Universal LLM interface with improved error handling"""
-
-    if ENGINE == "openai":
-        from openai import OpenAI
-
-        client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_URL") or None,
-        )
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "claude":
-        try:
-            from anthropic import Anthropic
-        except ImportError:
-            print(
-                "❌ Need to install anthropic: pip install anthropic", file=sys.stderr
-            )
-            sys.exit(1)
-
-        client = Anthropic(
-            api_key=os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        )
-        resp = client.messages.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        return resp.content[0].text.strip()
-
-    elif ENGINE in {"lmstudio", "anything"}:
-        from openai import OpenAI
-
-        base_url = (
-            os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
-        )
-        api_key = (
-            os.getenv("LMSTUDIO_API_KEY", "local")
-            if ENGINE == "lmstudio"
-            else os.getenv("ANYTHING_API_KEY", "local")
-        )
-
-        client = OpenAI(api_key=api_key, base_url=base_url)
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        return resp.choices[0].message.content.strip()
-
-    elif ENGINE == "gemini":
-        import google.generativeai as genai
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(
-            [prompt],
-            generation_config={
-                "temperature": temperature,
-                "max_output_tokens": max_tokens,
-            },
-        )
-        return response.text.strip()
+    """Universal LLM interface (shared connection pool from llm_gateway)"""
+    return llm_gateway.complete(
+        prompt,
+        model=MODEL_NAME,
+        engine=ENGINE,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
 
 
 # Enhanced Document Processor with better parsing
 class EnhancedDocumentProcessor:
     """Enhanced document processor with improved content extraction"""
 
-    def __init__(self):
-        try:
-            self.whisper_model = whisper.load_model("base")
-            logger.info("🎧 Whisper model loaded")
-        except Exception as e:
-            logger.warning(f"⚠️  Whisper not available: {e}")
-            self.whisper_model = None
-
     def extract_text_from_content(
         self, content: bytes, filename: str, source_name: str
     ) -> str:
@@ -267,7 +231,7 @@ class EnhancedDocumentProcessor:
                 return self._process_zip_enhanced(content, source_name)
             elif filename.endswith((".png", ".jpg", ".jpeg")) and HAS_OCR:
                 return self._process_image(content)
-            elif filename.endswith((".mp3", ".wav", ".m4a")) and self.whisper_model:
+            elif filename.endswith(media_extract.AUDIO_EXTENSIONS):
                 return self._process_audio(content)
             else:
                 return content.decode("utf-8", errors="ignore")
@@ -350,152 +314,213 @@ class EnhancedDocumentProcessor:
 
     def _process_zip_enhanced(self, content: bytes, source_name: str) -> str:
         """Enhanced ZIP processing with better password handling"""
-        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
+        parts = [
+            (header, self.extract_text_from_content(data, name, source_name))
+            for header, name, data in self.iter_zip_members(content)
+        ]
+        return format_zip_texts(parts)
+
+    def zip_members(self, content: bytes) -> List[Tuple[str, str, bytes]]:
+        """(header, member name, member bytes) for every readable member"""
+        return list(self.iter_zip_members(content))
+
+    def iter_zip_members(self, content: bytes) -> Iterator[Tuple[str, str, bytes]]:
+        """Single in-memory pass over the archive: plain members are read directly,
+        encrypted ones (detected per member) are decrypted with the known passwords"""
+        # pyzipper reads both AES and ZipCrypto members; zipfile only ZipCrypto
+        archive_cls = pyzipper.AESZipFile if HAS_PYZIPPER else zipfile.ZipFile
+        passwords = [p.encode() for p in (WEAPONS_PASSWORD, "weapons") if p]
 
         try:
-            texts = []
-            texts.extend(self._try_normal_zip_extraction(tmp_path, source_name))
-            texts.extend(self._try_encrypted_zip_extraction(tmp_path, source_name))
-            return "\n".join(texts)
-        finally:
-            os.unlink(tmp_path)
-
-    def _try_normal_zip_extraction(self, tmp_path: str, source_name: str) -> List[str]:
-        """Try normal ZIP extraction"""
-        texts = []
-        try:
-            with zipfile.ZipFile(tmp_path, "r") as zf:
-                texts = self._extract_zip_files(zf, source_name)
-        except Exception as e:
-            logger.debug(f"Normal ZIP extraction failed: {e}")
-        return texts
-
-    def _try_encrypted_zip_extraction(self, tmp_path: str, source_name: str) -> List[str]:
-        """Try encrypted ZIP extraction"""
-        texts = []
-        if HAS_PYZIPPER:
-            passwords_to_try = [WEAPONS_PASSWORD, "weapons"]
-            for password in passwords_to_try:
-                if password:
-                    try:
-                        with pyzipper.AESZipFile(tmp_path, "r") as zf:
-                            zf.setpassword(password.encode())
-                            texts = self._extract_encrypted_zip_files(zf, source_name)
-                            if texts:
-                                break
-                    except Exception as e:
-                        logger.debug(f"PyZipper failed with password {password}: {e}")
-        return texts
-
-    def _extract_zip_files(self, zf: zipfile.ZipFile, source_name: str) -> List[str]:
-        """Extract files from ZIP archive"""
-        texts = []
-        for name in zf.namelist():
-            if not name.endswith("/"):
-                try:
-                    file_content = zf.read(name)
-                    file_text = self.extract_text_from_content(
-                        file_content, name, source_name
-                    )
-                    if file_text.strip():
-                        texts.append(f"\n=== {name} ===\n{file_text}")
-                except RuntimeError as e:
-                    if "encrypted" in str(e).lower():
-                        logger.info(f"  File {name} is encrypted")
-                    else:
-                        logger.error(f"Failed to process {name}: {e}")
-        return texts
-
-    def _extract_encrypted_zip_files(self, zf: pyzipper.AESZipFile, source_name: str) -> List[str]:
-        """Extract files from encrypted ZIP archive"""
-        texts = []
-        for name in zf.namelist():
-            if not name.endswith("/"):
-                try:
-                    file_content = zf.read(name)
-                    file_text = self.extract_text_from_content(
-                        file_content, name, source_name
-                    )
-                    if file_text.strip():
-                        texts.append(f"\n=== {name} (decrypted) ===\n{file_text}")
-                        logger.info(f"  ✅ Decrypted and processed {name}")
-                except Exception as e:
-                    logger.debug(f"Failed to decrypt {name}: {e}")
-        return texts
+            with archive_cls(BytesIO(content), "r") as zf:
+                for info in zf.infolist():
+                    if info.is_dir():
+                        continue
+                    if not info.flag_bits & ZIP_ENCRYPTED_FLAG:
+                        # One corrupt or unsupported member must not end the whole archive
+                        try:
+                            data = zf.read(info)
+                        except ZIP_MEMBER_ERRORS as e:
+                            logger.warning(f"Skipping unreadable ZIP member {info.filename}: {e}")
+                            continue
+                        yield info.filename, info.filename, data
+                        continue
+
+                    data = self._read_encrypted_member(zf, info, passwords)
+                    if data is not None:
+                        yield f"{info.filename} (decrypted)", info.filename, data
+        except (zipfile.BadZipFile, OSError) as e:
+            logger.debug(f"ZIP extraction failed: {e}")
+
+    def _read_encrypted_member(self, zf: zipfile.ZipFile, info: zipfile.ZipInfo, passwords: List[bytes]) -> Optional[bytes]:
+        """Decrypt one member; the password that worked is tried first for the next members"""
+        for password in list(passwords):
+            try:
+                data = zf.read(info, pwd=password)
+            except ZIP_MEMBER_ERRORS as e:
+                logger.debug(f"Failed to decrypt {info.filename}: {e}")
+                continue
+            passwords.remove(password)
+            passwords.insert(0, password)
+            logger.info(f"  ✅ Decrypted {info.filename}")
+            return data
+
+        logger.info(f"  File {info.filename} is encrypted")
+        return None
 
     def _process_pdf(self, content: bytes) -> str:
         """Enhanced PDF processing"""
-        try:
-            doc = fitz.open(stream=content, filetype="pdf")
-            text_parts = []
-
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-
-                if text.strip():
-                    clean_text = re.sub(r"\s+", " ", text).strip()
-                    text_parts.append(f"--- Page {page_num + 1} ---\n{clean_text}")
-                elif HAS_OCR:
-                    ocr_text = self._extract_ocr_from_page(page)
-                    if ocr_text.strip():
-                        text_parts.append(
-                            f"--- Page {page_num + 1} (OCR) ---\n{ocr_text}"
-                        )
-
-            doc.close()
-            return "\n\n".join(text_parts)
-        except Exception as e:
-            logger.error(f"PDF processing error: {e}")
-            return ""
-
-    def _extract_ocr_from_page(self, page) -> str:
-        """Extract text from PDF page using OCR"""
-        pix = page.get_pixmap()
-        img_data = pix.tobytes("png")
-        return self._process_image(img_data)
+        return media_extract.pdf_text(content)
 
     def _process_image(self, content: bytes) -> str:
         """Enhanced image processing with OCR"""
-        if not HAS_OCR:
-            return ""
+        return media_extract.image_text(content)
 
-        try:
-            from io import BytesIO
+    def _process_audio(self, content: bytes) -> str:
+        """Enhanced audio processing with Whisper"""
+        return media_extract.transcribe_audio([content])[0]
 
-            img = Image.open(BytesIO(content))
 
-            # Convert to grayscale for better OCR
-            if img.mode != "L":
-                img = img.convert("L")
+def format_zip_texts(parts: List[Tuple[str, str]]) -> str:
+    """Join extracted ZIP member texts under their headers, skipping empty ones"""
+    return "\n".join(f"\n=== {header} ===\n{text}" for header, text in parts if text.strip())
 
-            # Use Polish and English for better recognition
-            text = pytesseract.image_to_string(img, lang="pol+eng")
-            return text.strip()
-        except Exception as e:
-            logger.error(f"Image OCR failed: {e}")
-            return ""
 
-    def _process_audio(self, content: bytes) -> str:
-        """Enhanced audio processing with Whisper"""
-        if not self.whisper_model:
-            return ""
+def run_extraction_jobs(
+    processor: EnhancedDocumentProcessor, jobs: List[Tuple[str, bytes, str]]
+) -> List[str]:
+    """Extract texts for all jobs; results keep the job order.
+    PDF, image and audio jobs go to media_extract's process pool, text is decoded inline"""
+    media = [i for i, (filename, _, _) in enumerate(jobs) if media_extract.is_media(filename)]
+    media_texts = media_extract.extract_all([jobs[i][:2] for i in media], EXTRACT_WORKERS)
 
-        try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                tmp.write(content)
-                tmp_path = tmp.name
+    texts = dict(zip(media, media_texts))
+    return [
+        texts[i] if i in texts else processor.extract_text_from_content(content, filename, source_name)
+        for i, (filename, content, source_name) in enumerate(jobs)
+    ]
 
-            result = self.whisper_model.transcribe(tmp_path, language="pl")
-            text = result.get("text", "").strip()
 
-            os.unlink(tmp_path)
-            return text
-        except Exception as e:
-            logger.error(f"Audio transcription failed: {e}")
-            return ""
+# In-memory inverted index with BM25 scoring
+class InvertedIndex:
+    """Token -> postings (doc key -> positions) plus entity -> doc keys, updated on every add"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, List[int]]] = defaultdict(dict)
+        self.entities: Dict[str, Set[str]] = defaultdict(set)
+        self.doc_lengths: Dict[str, int] = {}
+        self.docs: Dict[str, Tuple[str, str]] = {}
+        self.total_length = 0
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return [token[:STEM_LENGTH] for token in TOKEN_PATTERN.findall(text.lower())]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, key: str, title: str, content: str, entities: List[str]):
+        """Index one searchable unit (Chroma chunk or fallback document)"""
+        if key in self.docs:
+            self.remove(key)
+
+        tokens = self.tokenize(content)
+        for position, token in enumerate(tokens):
+            self.postings[token].setdefault(key, []).append(position)
+        for entity in entities:
+            self.entities[entity.lower()].add(key)
+
+        self.doc_lengths[key] = len(tokens)
+        self.total_length += len(tokens)
+        self.docs[key] = (title, content)
+
+    def remove(self, key: str):
+        title, content = self.docs.pop(key)
+        for token in set(self.tokenize(content)):
+            self.postings[token].pop(key, None)
+            if not self.postings[token]:
+                del self.postings[token]
+        for entity, keys in list(self.entities.items()):
+            keys.discard(key)
+            if not keys:
+                del self.entities[entity]
+        self.total_length -= self.doc_lengths.pop(key)
+
+    def bm25(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """BM25 over postings of query terms only, with a bonus for query terms close together"""
+        terms = [t for t in set(self.tokenize(query)) if len(t) > 2 and t in self.postings]
+        if not terms:
+            return []
+
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs if n_docs else 0.0
+        scores: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, List[str]] = defaultdict(list)
+
+        for term in terms:
+            postings = self.postings[term]
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, positions in postings.items():
+                tf = len(positions)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[key] / (avg_length or 1))
+                scores[key] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                matched[key].append(term)
+
+        for key, key_terms in matched.items():
+            if len(key_terms) > 1:
+                scores[key] += PROXIMITY_BONUS * self._close_pairs(key, key_terms)
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def _close_pairs(self, key: str, terms: List[str]) -> int:
+        """Number of query-term pairs occurring within PROXIMITY_WINDOW tokens of each other"""
+        close = 0
+        for i, first in enumerate(terms):
+            first_positions = self.postings[first][key]
+            for second in terms[i + 1:]:
+                second_positions = self.postings[second][key]
+                if self._within_window(first_positions, second_positions):
+                    close += 1
+        return close
+
+    @staticmethod
+    def _within_window(first: List[int], second: List[int]) -> bool:
+        i = j = 0
+        while i < len(first) and j < len(second):
+            if abs(first[i] - second[j]) <= PROXIMITY_WINDOW:
+                return True
+            if first[i] < second[j]:
+                i += 1
+            else:
+                j += 1
+        return False
+
+    def phrase_keys(self, phrase: str) -> Set[str]:
+        """Doc keys containing the phrase as consecutive tokens (positional intersection)"""
+        tokens = self.tokenize(phrase)
+        if not tokens or any(t not in self.postings for t in tokens):
+            return set()
+
+        candidates = set(self.postings[tokens[0]])
+        for token in tokens[1:]:
+            candidates &= self.postings[token].keys()
+
+        result = set()
+        for key in candidates:
+            starts = set(self.postings[tokens[0]][key])
+            for offset, token in enumerate(tokens[1:], start=1):
+                starts &= {p - offset for p in self.postings[token][key]}
+            if starts:
+                result.add(key)
+        return result
+
+    def entity_keys(self, entity: str) -> Set[str]:
+        """Doc keys mentioning the entity: entity index first, positional phrase match as fallback"""
+        return self.entities.get(entity.lower(), set()) | self.phrase_keys(entity)
+
+    def format(self, key: str) -> str:
+        title, content = self.docs[key]
+        return f"[{title}]\n{content}"
 
 
 # Enhanced Knowledge Base with better search
@@ -503,6 +528,8 @@ class EnhancedKnowledgeBase:
     """Enhanced knowledge base with improved search capabilities"""
 
     def __init__(self):
+        self.index = InvertedIndex()
+
         try:
             self.embeddings_model = SentenceTransformer("all-MiniLM-L6-v2")
             logger.info("🧠 Embeddings model loaded")
@@ -510,66 +537,206 @@ class EnhancedKnowledgeBase:
             logger.error(f"❌ Failed to load embeddings model: {e}")
             self.embeddings_model = None
 
+        self.persistent = args.persist
+        # source id -> hash of raw source content already stored in Chroma
+        self.source_hashes: Dict[str, str] = {}
+
         try:
-            self.chroma_client = chromadb.Client(
-                Settings(persist_directory="./chroma_db", anonymized_telemetry=False)
-            )
-            self.collection = self.chroma_client.get_or_create_collection(
-                "enhanced_story_documents"
-            )
+            settings = Settings(persist_directory=CHROMA_PATH, anonymized_telemetry=False)
+            if self.persistent and hasattr(chromadb, "PersistentClient"):
+                self.chroma_client = chromadb.PersistentClient(path=CHROMA_PATH, settings=settings)
+            else:
+                self.chroma_client = chromadb.Client(settings)
+            self.collection = self.chroma_client.get_or_create_collection(CHROMA_COLLECTION)
             logger.info("🗃️  ChromaDB initialized")
+            if self.persistent:
+                self._load_existing_chunks()
         except Exception as e:
             logger.error(f"❌ ChromaDB failed, using fallback: {e}")
             self.chroma_client = None
             self.collection = None
             self.documents = []
 
+    def _load_existing_chunks(self):
+        """Rebuild the inverted index and the ingested-source map from a persisted collection"""
+        stored = self.collection.get(include=["documents", "metadatas"])
+        for chunk_id, chunk, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+            self.index.add(
+                chunk_id,
+                metadata.get("title", "Unknown"),
+                chunk,
+                [e for e in metadata.get("key_entities", "").split(",") if e],
+            )
+            self.source_hashes[metadata["source"]] = metadata.get("source_hash", "")
+        logger.info(
+            f"♻️  Reusing {len(stored['ids'])} chunks from {len(self.source_hashes)} sources in {CHROMA_PATH}"
+        )
+
+    def is_ingested(self, doc_id: str, source_hash: str) -> bool:
+        """True when the source with identical content is already in the collection"""
+        return bool(source_hash) and self.source_hashes.get(doc_id) == source_hash
+
+    def _remove_source(self, doc_id: str):
+        """Drop chunks of a source before re-ingesting its changed content"""
+        stale = self.collection.get(where={"source": doc_id}, include=[])["ids"]
+        if stale:
+            self.collection.delete(ids=stale)
+        for chunk_id in stale:
+            if chunk_id in self.index.docs:
+                self.index.remove(chunk_id)
+        self.source_hashes.pop(doc_id, None)
+
     def add_document(
         self, doc_id: str, title: str, content: str, metadata: Dict[str, Any] = None
     ):
         """Add document with enhanced metadata and better chunking"""
-        if not content.strip():
-            return
+        self.add_documents(
+            [{"doc_id": doc_id, "title": title, "content": content, "metadata": metadata}]
+        )
 
-        metadata = metadata or {}
+    def add_documents(self, documents: List[Dict[str, Any]]):
+        """Bulk add: chunks from all documents are encoded in large batches and added in few calls"""
+        documents = [
+            {**doc, "metadata": doc.get("metadata") or {}}
+            for doc in documents
+            if doc.get("content", "").strip()
+        ]
+        if not documents:
+            return
 
         if self.collection and self.embeddings_model:
-            self._add_document_to_chroma(doc_id, title, content, metadata)
+            self._add_documents_to_chroma(documents)
         else:
-            self._add_document_to_fallback(doc_id, title, content, metadata)
+            for doc in documents:
+                self._add_document_to_fallback(
+                    doc["doc_id"], doc["title"], doc["content"], doc["metadata"]
+                )
 
-    def _add_document_to_chroma(self, doc_id: str, title: str, content: str, metadata: Dict[str, Any]):
-        """Add document to ChromaDB"""
+    def _add_documents_to_chroma(self, documents: List[Dict[str, Any]]):
+        """Add documents to ChromaDB - one encode pass and batched collection.add"""
         try:
-            chunks = self._smart_split_text(content, doc_id)
+            # Chunk ids derive from doc_id - a repeated doc_id would make the whole add fail
+            unique_docs: Dict[str, Dict[str, Any]] = {}
+            for doc in documents:
+                if doc["doc_id"] in unique_docs:
+                    logger.warning(f"  Skipping duplicate document id {doc['doc_id']}")
+                    continue
+                unique_docs[doc["doc_id"]] = doc
+            documents = list(unique_docs.values())
+
+            ids, chunks, metadatas = [], [], []
+            for doc in documents:
+                if doc["doc_id"] in self.source_hashes:
+                    self._remove_source(doc["doc_id"])
+                doc_chunks = self._smart_split_text(doc["content"], doc["doc_id"])
+                for i, chunk in enumerate(doc_chunks):
+                    ids.append(f"{doc['doc_id']}_{i}")
+                    chunks.append(chunk)
+                    metadatas.append(
+                        self._create_chunk_metadata(
+                            doc["title"], doc["doc_id"], i, len(doc_chunks), chunk, doc["metadata"]
+                        )
+                    )
 
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{doc_id}_{i}"
-                embedding = self.embeddings_model.encode(chunk).tolist()
+            embeddings = self.embeddings_model.encode(
+                chunks,
+                batch_size=EMBED_BATCH_SIZE,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            ).tolist()
+
+            batch_size = self._chroma_batch_size()
+            added: Set[str] = set()
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                added.update(
+                    self._add_chroma_batch(
+                        embeddings[start:end], chunks[start:end], metadatas[start:end], ids[start:end]
+                    )
+                )
 
-                chunk_metadata = self._create_chunk_metadata(title, doc_id, i, len(chunks), chunk, metadata)
+            # A document counts as ingested only when all of its chunks made it into Chroma
+            failed_docs = {meta["source"] for chunk_id, meta in zip(ids, metadatas) if chunk_id not in added}
+            if failed_docs:
+                partial = [
+                    chunk_id for chunk_id, meta in zip(ids, metadatas)
+                    if chunk_id in added and meta["source"] in failed_docs
+                ]
+                if partial:
+                    self.collection.delete(ids=partial)
+                logger.error(f"Skipped documents with rejected chunks: {sorted(failed_docs)}")
+
+            # Index only what is actually stored, so keyword hits never point at missing chunks
+            stored = 0
+            for chunk_id, chunk, chunk_metadata in zip(ids, chunks, metadatas):
+                if chunk_id not in added or chunk_metadata["source"] in failed_docs:
+                    continue
+                self.index.add(
+                    chunk_id,
+                    chunk_metadata["title"],
+                    chunk,
+                    [e for e in chunk_metadata["key_entities"].split(",") if e],
+                )
+                stored += 1
+            for doc in documents:
+                if doc["doc_id"] not in failed_docs:
+                    self.source_hashes[doc["doc_id"]] = doc["metadata"].get("source_hash", "")
+            logger.info(
+                f"  🧩 Added {stored} chunks from {len(documents) - len(failed_docs)} documents"
+            )
+        except Exception as e:
+            logger.error(f"Failed to add documents to ChromaDB: {e}")
+
+    def _add_chroma_batch(
+        self,
+        embeddings: List[List[float]],
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+    ) -> List[str]:
+        """Add one batch; if Chroma rejects it, retry chunk by chunk so one bad record doesn't lose the rest"""
+        try:
+            self.collection.add(embeddings=embeddings, documents=chunks, metadatas=metadatas, ids=ids)
+            return ids
+        except Exception as e:
+            logger.warning(f"Batch add of {len(ids)} chunks failed ({e}) - retrying one by one")
 
+        added = []
+        for embedding, chunk, chunk_metadata, chunk_id in zip(embeddings, chunks, metadatas, ids):
+            try:
                 self.collection.add(
-                    embeddings=[embedding],
-                    documents=[chunk],
-                    metadatas=[chunk_metadata],
-                    ids=[chunk_id],
+                    embeddings=[embedding], documents=[chunk], metadatas=[chunk_metadata], ids=[chunk_id]
                 )
-        except Exception as e:
-            logger.error(f"Failed to add document to ChromaDB: {e}")
+                added.append(chunk_id)
+            except Exception as e:
+                logger.error(f"  ❌ Chunk {chunk_id} rejected by ChromaDB: {e}")
+        return added
+
+    def _chroma_batch_size(self) -> int:
+        """Chroma limits records per add call - respect the client's limit when it exposes one"""
+        get_max = getattr(self.chroma_client, "get_max_batch_size", None)
+        if callable(get_max):
+            try:
+                return min(CHROMA_ADD_BATCH_SIZE, get_max())
+            except Exception:
+                pass
+        return CHROMA_ADD_BATCH_SIZE
 
     def _add_document_to_fallback(self, doc_id: str, title: str, content: str, metadata: Dict[str, Any]):
         """Add document to fallback storage"""
+        entities = self._extract_entities(content)
         self.documents.append(
             {
                 "id": doc_id,
                 "title": title,
                 "content": content,
                 "metadata": metadata,
-                "entities": self._extract_entities(content),
+                "entities": entities,
                 "key_terms": self._extract_enhanced_key_terms(content),
             }
         )
+        self.index.add(doc_id, title, content, entities)
 
     def _create_chunk_metadata(self, title: str, doc_id: str, chunk_idx: int, total_chunks: int, chunk: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Create metadata for document chunk"""
@@ -579,6 +746,7 @@ class EnhancedKnowledgeBase:
             "chunk": chunk_idx,
             "total_chunks": total_chunks,
             "content_type": metadata.get("type", "general"),
+            "source_hash": metadata.get("source_hash", ""),
             "key_entities": ",".join(self._extract_entities(chunk)),
             "contains_names": self._contains_person_names(chunk),
             "contains_companies": self._contains_company_names(chunk),
@@ -619,7 +787,9 @@ class EnhancedKnowledgeBase:
         """Semantic vector search"""
         if self.collection and self.embeddings_model:
             try:
-                query_embedding = self.embeddings_model.encode(query).tolist()
+                query_embedding = self.embeddings_model.encode(
+                    query, normalize_embeddings=True
+                ).tolist()
                 results = self.collection.query(
                     query_embeddings=[query_embedding], n_results=n_results * 2
                 )
@@ -642,120 +812,33 @@ class EnhancedKnowledgeBase:
         return self._fallback_search(query, n_results)
 
     def _keyword_search(self, query: str, n_results: int) -> List[str]:
-        """Enhanced keyword search"""
-        query_words = set(query.lower().split())
-        documents_to_search = self._get_documents_for_search()
-        
-        relevant_texts = []
-        for doc in documents_to_search:
-            score = self._calculate_keyword_score(doc, query_words)
-            if score > 0:
-                title = self._get_document_title(doc)
-                content = doc.get("content", "")
-                relevant_texts.append((f"[{title}]\n{content}", score, "keyword"))
-
-        return relevant_texts
-
-    def _calculate_keyword_score(self, doc: Dict, query_words: set) -> int:
-        """Calculate keyword matching score for a document"""
-        content = doc.get("content", "")
-        content_lower = content.lower()
-        
-        score = 0
-        for word in query_words:
-            if len(word) > 2:
-                exact_matches = content_lower.count(word)
-                score += exact_matches * len(word) * 2
-                
-                if word in content_lower:
-                    score += len(word)
-
-        # Bonus for multiple query words in same sentence
-        sentences = content.split(".")
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            matches_in_sentence = sum(
-                1 for word in query_words if word in sentence_lower
-            )
-            if matches_in_sentence > 1:
-                score += matches_in_sentence * 10
-
-        return score
+        """BM25 keyword search over the inverted index"""
+        return [
+            (self.index.format(key), score, "keyword")
+            for key, score in self.index.bm25(query, n_results * 2)
+        ]
 
     def _entity_search(self, query: str, n_results: int) -> List[str]:
         """Entity-based search for names, companies, etc."""
         query_entities = self._extract_entities(query)
-        
+
         if not query_entities:
             return []
 
-        documents_to_search = self._get_documents_for_search()
-        relevant_texts = []
-        
-        for doc in documents_to_search:
-            score = self._calculate_entity_score(doc, query_entities)
-            if score > 0:
-                title = self._get_document_title(doc)
-                content = doc.get("content", "")
-                relevant_texts.append((f"[{title}]\n{content}", score, "entity"))
-
-        return relevant_texts
-
-    def _calculate_entity_score(self, doc: Dict, query_entities: List[str]) -> int:
-        """Calculate entity matching score for a document"""
-        content = doc.get("content", "")
-        content_lower = content.lower()
-        
-        score = 0
+        scores: Dict[str, int] = defaultdict(int)
         for entity in query_entities:
-            if entity.lower() in content_lower:
-                score += len(entity) * 5
-        
-        return score
-
-    def _get_documents_for_search(self) -> List[Dict]:
-        """Get documents for search from ChromaDB or fallback"""
-        documents_to_search = []
-        
-        if self.collection:
-            try:
-                all_docs = self.collection.get()
-                for doc, metadata in zip(all_docs["documents"], all_docs["metadatas"]):
-                    documents_to_search.append({
-                        "content": doc,
-                        "metadata": metadata,
-                        "title": metadata.get("title", "Unknown"),
-                    })
-            except:
-                documents_to_search = self.documents
-        else:
-            documents_to_search = self.documents
-            
-        return documents_to_search
+            for key in self.index.entity_keys(entity):
+                scores[key] += len(entity) * 5
 
-    def _get_document_title(self, doc: Dict) -> str:
-        """Get document title from various sources"""
-        return doc.get("title", doc.get("metadata", {}).get("title", "Unknown"))
+        top = heapq.nlargest(n_results * 2, scores.items(), key=lambda item: item[1])
+        return [(self.index.format(key), score, "entity") for key, score in top]
 
     def _fallback_search(self, query: str, n_results: int) -> List[str]:
         """Fallback search without ChromaDB"""
-        relevant_texts = []
-        query_words = set(query.lower().split())
-
-        for doc in self.documents:
-            content_lower = doc["content"].lower()
-
-            score = 0
-            for word in query_words:
-                if len(word) > 2:
-                    score += content_lower.count(word) * len(word)
-
-            if score > 0:
-                relevant_texts.append(
-                    (f"[{doc['title']}]\n{doc['content']}", score, "fallback")
-                )
-
-        return relevant_texts
+        return [
+            (self.index.format(key), score, "fallback")
+            for key, score in self.index.bm25(query, n_results * 2)
+        ]
 
     def _deduplicate_and_rank(self, results: List[Tuple], query: str) -> List[str]:
         """Remove duplicates and rank results"""
@@ -931,71 +1014,107 @@ def download_sources_node(state: StoryState) -> StoryState:
 
 
 def process_documents_node(state: StoryState) -> StoryState:
-    """Process downloaded sources with enhanced processor"""
+    """Process downloaded sources in parallel (sources already in the persistent store are skipped)"""
     logger.info("📄 Processing documents...")
 
+    kb = EnhancedKnowledgeBase()
+    state["knowledge_base"] = kb
     processor = EnhancedDocumentProcessor()
     documents = []
+    reused = 0
 
     sources = state.get("sources", {})
 
+    # 1. Plan: every source (or ZIP member) becomes an independent extraction job
+    plans = []
+    jobs: List[Tuple[str, bytes, str]] = []
     for source_name, content in sources.items():
         try:
-            filename = _detect_filename(source_name, content)
+            source_hash = hashlib.sha256(content).hexdigest()
+            if kb.is_ingested(source_name, source_hash):
+                reused += 1
+                logger.info(f"  ⏭️  {source_name} unchanged - already in knowledge base")
+                continue
 
+            filename = _detect_filename(source_name, content)
             logger.info(f"  Processing {source_name} as {filename}")
-            text = processor.extract_text_from_content(content, filename, source_name)
-
-            if text.strip():
-                doc_info = {
-                    "source": source_name,
-                    "filename": filename,
-                    "content": text,
-                    "length": len(text),
-                    "type": _detect_content_type(source_name, text),
-                    "key_terms": _extract_key_terms(text),
-                }
-
-                documents.append(doc_info)
-                logger.info(
-                    f"  ✅ Processed {source_name}: {len(text)} characters, type: {doc_info['type']}"
-                )
 
+            if filename.endswith(".zip"):
+                members = processor.zip_members(content)
             else:
-                logger.warning(f"  ⚠️  No text extracted from {source_name}")
+                members = [(None, filename, content)]
 
+            plans.append((source_name, source_hash, filename, [header for header, _, _ in members]))
+            jobs.extend((name, data, source_name) for _, name, data in members)
         except Exception as e:
             logger.error(f"  ❌ Failed to process {source_name}: {e}")
 
+    # 2. Extract concurrently - results come back in job order
+    logger.info(f"  ⚙️  Extracting {len(jobs)} files with up to {EXTRACT_WORKERS} workers")
+    texts = iter(run_extraction_jobs(processor, jobs))
+
+    # 3. Reassemble per source in original order
+    for source_name, source_hash, filename, headers in plans:
+        parts = [(header, next(texts)) for header in headers]
+        if headers == [None]:
+            text = parts[0][1]
+        else:
+            text = format_zip_texts(parts)
+
+        if text.strip():
+            doc_info = {
+                "source": source_name,
+                "source_hash": source_hash,
+                "filename": filename,
+                "content": text,
+                "length": len(text),
+                "type": _detect_content_type(source_name, text),
+                "key_terms": _extract_key_terms(text),
+            }
+
+            documents.append(doc_info)
+            logger.info(
+                f"  ✅ Processed {source_name}: {len(text)} characters, type: {doc_info['type']}"
+            )
+
+        else:
+            logger.warning(f"  ⚠️  No text extracted from {source_name}")
+
     state["documents"] = documents
-    logger.info(f"📚 Processed {len(documents)} documents")
+    logger.info(f"📚 Processed {len(documents)} documents, reused {reused}")
 
     return state
 
 
 def build_knowledge_base_node(state: StoryState) -> StoryState:
-    """Build enhanced knowledge base"""
+    """Build enhanced knowledge base (adds only newly processed documents)"""
     logger.info("🧠 Building knowledge base...")
 
-    kb = EnhancedKnowledgeBase()
+    kb = state.get("knowledge_base") or EnhancedKnowledgeBase()
     documents = state.get("documents", [])
 
-    for doc in documents:
-        doc_metadata = {
-            "type": doc.get("type", "general"),
-            "key_terms": doc.get("key_terms", []),
-            "length": doc.get("length", 0),
-        }
-
-        kb.add_document(
-            doc_id=doc["source"],
-            title=doc["filename"],
-            content=doc["content"],
-            metadata=doc_metadata,
-        )
+    kb.add_documents(
+        [
+            {
+                "doc_id": doc["source"],
+                "title": doc["filename"],
+                "content": doc["content"],
+                "metadata": {
+                    "type": doc.get("type", "general"),
+                    "key_terms": doc.get("key_terms", []),
+                    "length": doc.get("length", 0),
+                    "source_hash": doc.get("source_hash", ""),
+                },
+            }
+            for doc in documents
+        ]
+    )
 
     state["knowledge_base"] = kb
-    logger.info(f"✅ Enhanced knowledge base built with {len(documents)} documents")
+    logger.info(
+        f"✅ Enhanced knowledge base built with {len(documents)} new documents "
+        f"({len(kb.source_hashes)} sources in store)"
+    )
 
     return state
 
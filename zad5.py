@@ -5,11 +5,14 @@ Obsługuje: openai, lmstudio, anything, gemini, claude
 DODANO: Obsługę Claude z bezpośrednią integracją (jak zad1.py i zad2.py)
 POPRAWKA: Lepsze wykrywanie silnika z agent.py
 POPRAWKA SONARA: Refaktoryzacja funkcji wysokiej złożoności kognitywnej
+Transkrypcje: wspólny magazyn (whisper_service) po SHA-256 nagrania + model + język,
+współdzielony przez wszystkie silniki - Claude/Gemini korzystają z transkrypcji z wcześniejszych uruchomień
 """
 import argparse
 import os
 import sys
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
@@ -17,6 +20,8 @@ from abc import ABC, abstractmethod
 import requests
 from dotenv import load_dotenv
 
+import whisper_service
+
 # Konfiguracja i helpery
 load_dotenv(override=True)
 
@@ -25,6 +30,9 @@ EXPECTED_AUDIO_EXTENSIONS = [".m4a", ".mp3", ".wav", ".flac"]
 ANTHROPIC_INSTALL_MSG = "❌ Musisz zainstalować anthropic: pip install anthropic"
 OPENAI_INSTALL_MSG = "❌ Musisz zainstalować openai: pip install openai"
 GEMINI_INSTALL_MSG = "❌ Musisz zainstalować google-generativeai: pip install google-generativeai"
+TRANSCRIPTION_MODEL = "whisper-1"
+TRANSCRIPTION_LANGUAGE = "pl"
+DEFAULT_TRANSCRIBE_WORKERS = 4
 
 # POPRAWKA: Dodano argumenty CLI jak w innych zadaniach
 parser = argparse.ArgumentParser(
@@ -109,8 +117,28 @@ class AudioAnalysisClient(ABC):
         """Metoda do wnioskowania odpowiedzi - implementacja w podklasach"""
         pass
     
-    @abstractmethod
     def get_transcript(self, audio_path: Path) -> str:
+        """Transkrypcja z magazynu (hash nagrania + model + język) albo nowa z backendu silnika"""
+        return whisper_service.cached_transcript(
+            audio_path,
+            TRANSCRIPTION_MODEL,
+            TRANSCRIPTION_LANGUAGE,
+            lambda: self._transcript_from_sidecar_or_backend(audio_path),
+        )
+
+    def _transcript_from_sidecar_or_backend(self, audio_path: Path) -> str:
+        """Zapisany obok nagrania plik .txt ma pierwszeństwo przed nową transkrypcją"""
+        txt_path = audio_path.with_suffix(".txt")
+        if txt_path.exists():
+            print(f"   > Używam zapisanej transkrypcji: {txt_path.name}")
+            return txt_path.read_text(encoding="utf-8")
+
+        text = self.transcribe(audio_path)
+        txt_path.write_text(text, encoding="utf-8")
+        return text
+
+    @abstractmethod
+    def transcribe(self, audio_path: Path) -> str:
         """Metoda do transkrypcji audio - implementacja w podklasach"""
         pass
 
@@ -128,22 +156,18 @@ class OpenAIAnalysisClient(AudioAnalysisClient):
         
         self.client = OpenAI(api_key=api_key, base_url=base_url)
     
-    def get_transcript(self, audio_path: Path) -> str:
-        """Pobiera transkrypcję z cache lub generuje nową via Whisper"""
-        txt_path = audio_path.with_suffix(".txt")
-        if txt_path.exists():
-            print(f"   > Używam zapisanej transkrypcji: {txt_path.name}")
-            return txt_path.read_text(encoding="utf-8")
-
+    def transcribe(self, audio_path: Path) -> str:
+        """Generuje transkrypcję via Whisper API"""
         print(f"   > Transkrypcja z API dla: {audio_path.name}")
         with open(audio_path, "rb") as f:
             resp = self.client.audio.transcriptions.create(
-                file=f, model="whisper-1", response_format="text", language="pl"
+                file=f,
+                model=TRANSCRIPTION_MODEL,
+                response_format="text",
+                language=TRANSCRIPTION_LANGUAGE,
             )
 
-        text = getattr(resp, "text", resp)
-        txt_path.write_text(text, encoding="utf-8")
-        return text
+        return getattr(resp, "text", resp)
     
     def infer_answer(self, fragments: str) -> str:
         system_msg, user_msg = self._create_inference_prompts(fragments)
@@ -204,36 +228,27 @@ class LocalAnalysisClient(AudioAnalysisClient):
             sys.exit(1)
         
         self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=120)
+        # Lokalne modele mogą mieć inny endpoint dla audio
+        self.transcribe_client = OpenAI(
+            api_key=api_key,
+            base_url=os.getenv("TRANSCRIBE_API_URL", "http://localhost:1234/v1"),
+        )
         self.engine_name = engine_name
         print(f"[DEBUG] {engine_name} URL: {base_url}")
         print(f"[DEBUG] {engine_name} Model: {model_name}")
     
-    def get_transcript(self, audio_path: Path) -> str:
-        """Pobiera transkrypcję z cache lub generuje nową"""
-        txt_path = audio_path.with_suffix(".txt")
-        if txt_path.exists():
-            print(f"   > Używam zapisanej transkrypcji: {txt_path.name}")
-            return txt_path.read_text(encoding="utf-8")
-
+    def transcribe(self, audio_path: Path) -> str:
+        """Generuje transkrypcję przez lokalny endpoint audio"""
         print(f"   > Transkrypcja z API dla: {audio_path.name}")
-        # Lokalne modele mogą mieć inny endpoint dla audio
-        transcribe_url = os.getenv("TRANSCRIBE_API_URL", "http://localhost:1234/v1")
-        transcribe_client = OpenAI(
-            api_key=self.client.api_key,
-            base_url=transcribe_url,
-        )
-        
         with open(audio_path, "rb") as f:
-            resp = transcribe_client.audio.transcriptions.create(
+            resp = self.transcribe_client.audio.transcriptions.create(
                 file=f,
-                model="whisper-1",  # lub lokalny model
+                model=TRANSCRIPTION_MODEL,  # lub lokalny model
                 response_format="text",
-                language="pl",
+                language=TRANSCRIPTION_LANGUAGE,
             )
 
-        text = getattr(resp, "text", resp)
-        txt_path.write_text(text, encoding="utf-8")
-        return text
+        return getattr(resp, "text", resp)
     
     def infer_answer(self, fragments: str) -> str:
         system_msg, user_msg = self._create_inference_prompts(fragments)
@@ -292,8 +307,8 @@ class ClaudeAnalysisClient(AudioAnalysisClient):
         self.client = Anthropic(api_key=api_key)
         print(f"[DEBUG] Claude Model: {model_name}")
     
-    def get_transcript(self, audio_path: Path) -> str:
-        """Claude nie obsługuje transkrypcji audio"""
+    def transcribe(self, audio_path: Path) -> str:
+        """Claude nie obsługuje transkrypcji audio (transkrypcje z magazynu działają)"""
         print(f"❌ Transkrypcja audio (Whisper) nie jest dostępna dla Claude.")
         print("💡 Użyj --engine openai, lmstudio lub anything dla transkrypcji audio.")
         sys.exit(1)
@@ -353,8 +368,8 @@ class GeminiAnalysisClient(AudioAnalysisClient):
         self.model = genai.GenerativeModel(model_name)
         print(f"[DEBUG] Gemini Model: {model_name}")
     
-    def get_transcript(self, audio_path: Path) -> str:
-        """Gemini nie obsługuje transkrypcji audio"""
+    def transcribe(self, audio_path: Path) -> str:
+        """Gemini nie obsługuje transkrypcji audio (transkrypcje z magazynu działają)"""
         print(f"❌ Transkrypcja audio (Whisper) nie jest dostępna dla Gemini.")
         print("💡 Użyj --engine openai, lmstudio lub anything dla transkrypcji audio.")
         sys.exit(1)
@@ -435,6 +450,11 @@ def create_analysis_client() -> AudioAnalysisClient:
         return GeminiAnalysisClient(model_name, api_key)
 
 
+try:
+    TRANSCRIBE_WORKERS = max(1, int(os.getenv("TRANSCRIBE_WORKERS", DEFAULT_TRANSCRIBE_WORKERS)))
+except ValueError:
+    TRANSCRIBE_WORKERS = DEFAULT_TRANSCRIBE_WORKERS
+
 # Inicjalizacja globalnego klienta
 analysis_client = create_analysis_client()
 print(f"✅ Zainicjalizowano silnik: {ENGINE} z modelem: {analysis_client.model_name}")
@@ -477,14 +497,18 @@ def ensure_audio_files_exist(base_dir: Path) -> List[Path]:
 
 
 def process_transcripts(audio_files: List[Path]) -> str:
-    """Przetwarza transkrypcje audio i łączy je w jeden tekst"""
-    transcripts = []
+    """Przetwarza transkrypcje audio równolegle i łączy je w jeden tekst (w kolejności plików)"""
     for audio in audio_files:
         print(f"2/4 Przetwarzanie: {audio.name}")
-        text = analysis_client.get_transcript(audio)
-        # Pomijamy transkrypcje zawierające "arkadiusz"
-        if "arkadiusz" not in text.lower():
-            transcripts.append(text)
+
+    # Transkrypcja to zapytania HTTP (API / lokalny endpoint) - wątki wystarczą,
+    # czas całości zbliża się do czasu najdłuższego nagrania
+    workers = min(TRANSCRIBE_WORKERS, len(audio_files)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        texts = list(pool.map(analysis_client.get_transcript, audio_files))
+
+    # Pomijamy transkrypcje zawierające "arkadiusz"
+    transcripts = [text for text in texts if "arkadiusz" not in text.lower()]
     return "\n".join(transcripts)
 
 
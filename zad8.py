@@ -4,6 +4,7 @@ S02E04 - Klasyfikacja plików z fabryki: jedna prośba do LLM na plik, detekcja
 • Multiengine: openai / gemini / lmstudio / anything / claude
 • Ekstrakcja: txt→tekst, mp3/wav→Whisper lokalnie, png/jpg→OCR (OpenCV+pytesseract)
 • Orkiestracja: LangGraph
+• Klasyfikacja równoległa: pula wątków (CLASSIFY_WORKERS), backoff przy limitach API (429)
 
 POPRAWKI: Konserwatywna logika klasyfikacji people - tylko potwierdzone schwytania
 POPRAWKA: Lepsze wykrywanie silnika z agent.py
@@ -12,22 +13,28 @@ POPRAWKA SONARA: Refaktoryzacja funkcji wysokiej złożoności kognitywnej, sta
 import argparse
 import json
 import os
+import random
 import sys
-import zipfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 import cv2
 import pytesseract
 import requests
-import whisper
 from dotenv import load_dotenv
 from langdetect import detect, LangDetectException
 from langgraph.graph import END, START, StateGraph
 
+import artifact_fetcher
+import llm_gateway
+import whisper_service
+
 # POPRAWKA SONARA S1192: Stałe dla duplikowanych literałów
 FOUND_ONE_GUY = "found one guy"
-ANTHROPIC_INSTALL_MSG = "❌ Musisz zainstalować anthropic: pip install anthropic"
 CAPTURED_KEYWORD = "captured"
 TRANSMITTER_KEYWORD = "nadajnik"
 FINGERPRINT_KEYWORD = "odcisk"
@@ -64,6 +71,13 @@ SOFTWARE_KEYWORDS = [
     "moduł ai",
 ]
 
+# Równoległa klasyfikacja i backoff przy limitach API
+DEFAULT_CLASSIFY_WORKERS = 8
+RATE_LIMIT_MAX_RETRIES = 5
+RATE_LIMIT_BASE_DELAY = 1.0
+RATE_LIMIT_MAX_DELAY = 30.0
+RETRY_MESSAGE = "Retrying..."
+
 # --- 1. Konfiguracja i inicjalizacja LLM ---
 load_dotenv(override=True)
 
@@ -162,40 +176,30 @@ if not MODEL_NAME:
 validate_api_keys(ENGINE)
 
 # klucze i URL-e
-LMSTUDIO_API_KEY = os.getenv("LMSTUDIO_API_KEY", "local")
-LMSTUDIO_API_URL = os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1")
 ANYTHING_API_KEY = os.getenv("ANYTHING_API_KEY", "local")
 ANYTHING_API_URL = os.getenv("ANYTHING_API_URL", "http://localhost:1234/v1")
 
-# inicjalizacja klienta
+# inicjalizacja klienta (wspólna pula połączeń z llm_gateway)
 if ENGINE == "openai":
-    from openai import OpenAI
-
-    client = OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        base_url=os.getenv("OPENAI_API_URL", "https://api.openai.com/v1"),
-    )
+    client = llm_gateway.get_openai_client("openai")
 
 elif ENGINE == "claude":
-    # Bezpośrednia integracja Claude
-    try:
-        from anthropic import Anthropic
-    except ImportError:
-        print(ANTHROPIC_INSTALL_MSG, file=sys.stderr)
-        sys.exit(1)
-
-    CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-    claude_client = Anthropic(api_key=CLAUDE_API_KEY)
+    claude_client = llm_gateway.get_anthropic_client()
 
-elif ENGINE == "gemini":
-    import google.generativeai as genai
+print(f"✅ Zainicjalizowano silnik: {ENGINE} z modelem: {MODEL_NAME}")
 
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+try:
+    CLASSIFY_WORKERS = max(1, int(os.getenv("CLASSIFY_WORKERS", DEFAULT_CLASSIFY_WORKERS)))
+except ValueError:
+    CLASSIFY_WORKERS = DEFAULT_CLASSIFY_WORKERS
 
-print(f"✅ Zainicjalizowano silnik: {ENGINE} z modelem: {MODEL_NAME}")
+# --- 2. Whisper (wspólny model i cache transkrypcji z whisper_service) ---
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
+AUDIO_SUFFIXES = (".mp3", ".wav")
 
-# --- 2. Init Whisper ---
-audio_model = whisper.load_model(os.getenv("WHISPER_MODEL", "small"))
+# Wspólna pauza dla wszystkich wątków po odpowiedzi 429 (monotonic timestamp)
+_rate_limit_lock = threading.Lock()
+_rate_limit_until = 0.0
 
 
 # --- 3. Funkcje pomocnicze LLM ---
@@ -258,7 +262,7 @@ def call_llm_claude(prompt: str) -> str:
 def call_llm_gemini(prompt: str) -> str:
     """Wywołuje Gemini API"""
     print("[DEBUG] Wysyłam zapytanie do Gemini")
-    response = genai.GenerativeModel(MODEL_NAME).generate_content(
+    response = llm_gateway.get_gemini_model(MODEL_NAME).generate_content(
         prompt, generation_config={"temperature": 0.0, "max_output_tokens": 32}
     )
     print("[📊 Gemini - brak szczegółów tokenów]")
@@ -269,22 +273,15 @@ def call_llm_gemini(prompt: str) -> str:
 def call_llm_lmstudio(prompt: str) -> str:
     """Wywołuje LMStudio API"""
     print("[DEBUG] Wysyłam zapytanie do LMStudio")
-    url = LMSTUDIO_API_URL.rstrip("/") + "/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {LMSTUDIO_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": MODEL_NAME,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0,
-        "max_tokens": 5,
-        "stop": ["\n", ".", " "],
-    }
-    resp = requests.post(url, json=payload, headers=headers, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-    content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+    content = llm_gateway.complete(
+        prompt,
+        model=MODEL_NAME,
+        engine="lmstudio",
+        temperature=0,
+        max_tokens=5,
+        stop=["\n", ".", " "],
+        timeout=30,
+    )
     print("[📊 LMStudio - brak szczegółów tokenów]")
     print("[💰 LMStudio - model lokalny, brak kosztów]")
     return content.strip().lower()
@@ -321,13 +318,52 @@ def call_llm(prompt: str) -> str:
         raise ValueError(f"Nieobsługiwany silnik: {ENGINE}")
 
 
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Rozpoznaje przekroczenie limitu API niezależnie od SDK (openai, anthropic, requests, gemini)"""
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    name = type(exc).__name__
+    return status == 429 or "RateLimit" in name or "ResourceExhausted" in name
+
+
+def rate_limit_delay(exc: Exception, attempt: int) -> float:
+    """Czas oczekiwania: nagłówek Retry-After, a bez niego wykładniczy backoff z jitterem"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), RATE_LIMIT_MAX_DELAY)
+    except ValueError:
+        pass
+    delay = min(RATE_LIMIT_BASE_DELAY * 2 ** attempt, RATE_LIMIT_MAX_DELAY)
+    return delay + random.uniform(0, RATE_LIMIT_BASE_DELAY)
+
+
+def pause_for_rate_limit(delay: float) -> None:
+    """Wstrzymuje wszystkie wątki klasyfikacji - kolejne zapytania i tak dostałyby 429"""
+    global _rate_limit_until
+    with _rate_limit_lock:
+        _rate_limit_until = max(_rate_limit_until, time.monotonic() + delay)
+
+
+def wait_for_rate_limit() -> None:
+    with _rate_limit_lock:
+        remaining = _rate_limit_until - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
 def call_llm_with_retry(prompt: str, max_retries: int = 2) -> str:
     """
     POPRAWKA SONARA S3776: Wywołuje LLM z retry logic - refaktoryzacja funkcji o wysokiej złożoności
+    Odpowiedzi 429 nie zużywają prób - czekamy (Retry-After / backoff) do RATE_LIMIT_MAX_RETRIES razy.
     """
     last_result = ""
-    
-    for attempt in range(max_retries + 1):
+    attempt = 0
+    rate_limit_hits = 0
+
+    while attempt <= max_retries:
+        wait_for_rate_limit()
         try:
             result = call_llm(prompt)
             last_result = result
@@ -339,64 +375,53 @@ def call_llm_with_retry(prompt: str, max_retries: int = 2) -> str:
             # Jeśli nie znaleziono słów kluczowych i to nie ostatnia próba    
             if attempt < max_retries:
                 print(f"[RETRY] Attempt {attempt + 1}/{max_retries + 1} - no valid keywords found, retrying...")
+            attempt += 1
+            continue
+
+        except Exception as e:
+            if is_rate_limit_error(e) and rate_limit_hits < RATE_LIMIT_MAX_RETRIES:
+                delay = rate_limit_delay(e, rate_limit_hits)
+                rate_limit_hits += 1
+                print(f"[RATE LIMIT] {e} - waiting {delay:.1f}s ({rate_limit_hits}/{RATE_LIMIT_MAX_RETRIES})")
+                pause_for_rate_limit(delay)
                 continue
-                
-        except requests.exceptions.RequestException as e:
-            print(f"[RETRY] Attempt {attempt + 1}/{max_retries + 1} - Request failed: {e}")
-            if attempt < max_retries:
-                print("Retrying...")
-                continue
+
+            if isinstance(e, requests.exceptions.RequestException):
+                kind, label = "Request failed", "request errors"
+            elif isinstance(e, (ValueError, KeyError, AttributeError)):
+                kind, label = "API response error", "API errors"
             else:
-                print("[ERROR] All retry attempts failed due to request errors")
-                
-        except (ValueError, KeyError, AttributeError) as e:
-            print(f"[RETRY] Attempt {attempt + 1}/{max_retries + 1} - API response error: {e}")
+                kind, label = "Unexpected error", "unexpected errors"
+
+            print(f"[RETRY] Attempt {attempt + 1}/{max_retries + 1} - {kind}: {e}")
             if attempt < max_retries:
-                print("Retrying...")
-                continue
+                print(RETRY_MESSAGE)
             else:
-                print("[ERROR] All retry attempts failed due to API errors")
-                
-        except Exception as e:
-            print(f"[RETRY] Attempt {attempt + 1}/{max_retries + 1} - Unexpected error: {e}")
-            if attempt < max_retries:
-                print("Retrying...")
-                continue
-            else:
-                print("[ERROR] All retry attempts failed due to unexpected errors")
+                print(f"[ERROR] All retry attempts failed due to {label}")
+            attempt += 1
 
     return last_result  # Zwróć ostatnią odpowiedź nawet jeśli błędną
 
 
 # --- 4. Ekstrakcja zawartości ---
 def download_and_extract(dest: Path) -> None:
-    if (dest / "2024-11-12_report-00-sektor_C4.txt").exists():
-        print("[INFO] Pliki już rozpakowane - pomijam pobieranie.")
-        return
-    dest.mkdir(exist_ok=True)
-    zip_path = dest / "fabryka.zip"
+    """Archiwum fabryki ze wspólnego cache artefaktów (warunkowe GET, rozpakowanie tylko przy zmianie)"""
     print("[INFO] Pobieram dane z fabryki…")
-    resp = requests.get(FABRYKA_URL, stream=True)
-    resp.raise_for_status()
-    with open(zip_path, "wb") as f:
-        for chunk in resp.iter_content(8192):
-            f.write(chunk)
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(dest)
-    zip_path.unlink()
+    artifact_fetcher.fetch_and_extract(FABRYKA_URL, dest)
 
 
 def extract_text(fp: Path) -> str:
     return fp.read_text(encoding="utf-8", errors="ignore")
 
 
-def extract_audio(fp: Path) -> str:
-    result = audio_model.transcribe(str(fp))
-    text = result.get("text", "")
+def extract_audio(files: List[Path]) -> Dict[Path, str]:
+    """Transkrypcje wszystkich nagrań jednym modelem, przed startem puli wątków"""
+    texts = whisper_service.transcribe_many(files, model_name=WHISPER_MODEL)
     Path("debug").mkdir(exist_ok=True)
-    with open(f"debug/{fp.name}.txt", "w", encoding="utf-8") as f:
-        f.write(text)
-    return text
+    for fp, text in zip(files, texts):
+        with open(f"debug/{fp.name}.txt", "w", encoding="utf-8") as f:
+            f.write(text)
+    return dict(zip(files, texts))
 
 
 def extract_image(fp: Path) -> str:
@@ -587,38 +612,53 @@ def download_node(state):
     return state
 
 
+def extract_content(fp: Path, transcripts: Dict[Path, str]) -> str:
+    """Ekstrakcja tekstu według typu pliku (nagrania są już przetranskrybowane)"""
+    if fp.suffix == ".txt":
+        return extract_text(fp)
+    if fp.suffix in AUDIO_SUFFIXES:
+        return transcripts[fp]
+    if fp.suffix in [".png", ".jpg", ".jpeg"]:
+        return extract_image(fp)
+    return ""
+
+
+def process_file(fp: Path, transcripts: Dict[Path, str]) -> str:
+    """Ekstrakcja + klasyfikacja jednego pliku (uruchamiane w puli wątków)"""
+    print(f"\n[CLASSIFY] Processing: {fp.name}")
+    text = extract_content(fp, transcripts)
+
+    # Debug snippet
+    snippet = text.replace("\n", " ")[:100]
+    print(f"[CLASSIFY] {fp.name} snippet: {snippet!r}")
+
+    cat = classify_file(text, fp.name)
+    print(f"[CLASSIFY] {fp.name} result: {cat}")
+    return cat
+
+
 def classify_node(state):
-    """Node funkcja dla klasyfikacji plików"""
+    """Node funkcja dla klasyfikacji plików - pliki przetwarzane równolegle"""
     root = Path("fabryka")
-    files = [
+    files = sorted(
         p
         for p in root.rglob("*")
-        if p.is_file() and "facts" not in p.parts and p.name != "weapons_tests.zip"
-    ]
-    print(f"[CLASSIFY] Found {len(files)} files")
+        if p.is_file()
+        and not p.name.startswith(".")
+        and "facts" not in p.parts
+        and p.name != "weapons_tests.zip"
+    )
+    print(f"[CLASSIFY] Found {len(files)} files, workers: {CLASSIFY_WORKERS}")
     cats = {"people": [], "hardware": [], "other": []}
 
-    for fp in sorted(files):
-        print(f"\n[CLASSIFY] Processing: {fp.name}")
-
-        # Ekstrakcja tekstu
-        if fp.suffix == ".txt":
-            text = extract_text(fp)
-        elif fp.suffix in [".mp3", ".wav"]:
-            text = extract_audio(fp)
-        elif fp.suffix in [".png", ".jpg", ".jpeg"]:
-            text = extract_image(fp)
-        else:
-            text = ""
-
-        # Debug snippet
-        snippet = text.replace("\n", " ")[:100]
-        print(f"[CLASSIFY] Snippet: {snippet!r}")
-
-        # Klasyfikacja
-        cat = classify_file(text, fp.name)
-        print(f"[CLASSIFY] Result: {cat}")
+    started = time.perf_counter()
+    transcripts = extract_audio([fp for fp in files if fp.suffix in AUDIO_SUFFIXES])
+    with ThreadPoolExecutor(max_workers=CLASSIFY_WORKERS) as pool:
+        # map zachowuje kolejność plików - wynik jest deterministyczny
+        results = list(pool.map(partial(process_file, transcripts=transcripts), files))
+    print(f"\n[CLASSIFY] Done in {time.perf_counter() - started:.1f}s")
 
+    for fp, cat in zip(files, results):
         cats[cat].append(fp.name)
 
     # Zapis surowej klasyfikacji do debugowania
@@ -16,10 +16,11 @@ import cv2
 import html2text
 import numpy as np
 import requests
-import whisper
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+import whisper_service
+
 # --- Konfiguracja i cache ---
 load_dotenv(override=True)
 
@@ -169,10 +170,8 @@ print(f"✅ Zainicjalizowano silnik: {ENGINE} z modelem: {MODEL_NAME}")
 print(f"🔍 Vision model: {VISION_MODEL}")
 
 # --- Whisper ---
-model_name = os.getenv("WHISPER_MODEL", "base")
-print(f"🎧 Ładowanie lokalnego modelu Whisper: '{model_name}'...")
-whisper_model = whisper.load_model(model_name)
-print("✅ Model Whisper załadowany.\n")
+# Model ładowany dopiero przy pierwszej transkrypcji (import zad9 przez zad10 go nie ładuje)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
 
 
 # --- Uniwersalna funkcja LLM ---
@@ -387,6 +386,7 @@ def get_audio(html_path: Path) -> dict[str, str]:
         except json.JSONDecodeError:
             aud_map = {}
 
+    pending: list[Path] = []
     soup = BeautifulSoup(html_path.read_text("utf-8"), "html.parser")
     for tag in soup.find_all("audio"):
         src = tag.get("src") or (tag.find("source") and tag.find("source").get("src"))
@@ -399,15 +399,16 @@ def get_audio(html_path: Path) -> dict[str, str]:
             r = requests.get(url)
             r.raise_for_status()
             local.write_bytes(r.content)
-        if local.name not in aud_map:
-            print(f"   🎧 Transkrypcja {local.name} lokalnym Whisper...")
-            txt = (
-                whisper_model.transcribe(str(local), language="pl")
-                .get("text", "")
-                .strip()
-            )
+        if local.name not in aud_map and local not in pending:
+            pending.append(local)
+
+    # Wszystkie brakujące nagrania jednym modelem Whisper
+    if pending:
+        print(f"   🎧 Transkrypcja {len(pending)} plików lokalnym Whisper...")
+        texts = whisper_service.transcribe_many(pending, language="pl", model_name=WHISPER_MODEL)
+        for local, txt in zip(pending, texts):
             aud_map[local.name] = txt
-            print(f"   ✅ Transkrypcja: {txt[:50]}...")
+            print(f"   ✅ {local.name}: {txt[:50]}...")
 
     AUDIO_CACHE_FILE.write_text(
         json.dumps(aud_map, ensure_ascii=False, indent=2), "utf-8"